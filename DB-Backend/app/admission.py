@@ -0,0 +1,201 @@
+"""Admission control for expensive endpoints (the itinerary planners).
+
+Planning runs on the same worker threads as every cheap GET, so an
+unbounded burst of plan requests would raise latency for the whole API.
+Each guarded route gets an ``AdmissionController``:
+
+* at most ``max_concurrent`` requests run at once;
+* up to ``max_queue`` more wait (on the event loop, holding neither a
+  thread nor a database connection) for at most ``queue_timeout`` seconds;
+* one user may have at most ``max_per_user`` requests running or waiting.
+
+Anything beyond that is rejected at once with 503 (429 for the per-user
+cap) and a ``Retry-After`` header. Limits are per worker process. Counters
+are served by ``GET /metrics/admission``.
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict
+
+from fastapi import Depends, HTTPException, status
+
+from .auth import oauth2_scheme, user_id_from_token
+from .config import settings
+
+
+class _Waiter:
+    __slots__ = ("loop", "future", "granted")
+
+    def __init__(self, loop: asyncio.AbstractEventLoop) -> None:
+        self.loop = loop
+        self.future = loop.create_future()
+        self.granted = False  # a released slot was handed to this waiter
+
+
+def _wake(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class AdmissionController:
+    """
+    Counting semaphore with a bounded FIFO of waiting requests. State is
+    guarded by a thread lock and waiters are woken on their own loop, so
+    it works however many event loops (or test clients) share it.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrent: int,
+        max_queue: int,
+        max_per_user: int,
+        queue_timeout: float,
+    ) -> None:
+        self.name = name
+        self.max_concurrent = max(max_concurrent, 1)
+        self.max_queue = max(max_queue, 0)
+        self.max_per_user = max_per_user  # 0 disables the per-user cap
+        self.queue_timeout = queue_timeout
+        self._waiters: Deque[_Waiter] = deque()
+        self._per_user: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self.running = 0
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_user_limit = 0
+        self.rejected_timeout = 0
+        self.peak_waiting = 0
+        self.wait_seconds_total = 0.0
+
+    def _reject(self, status_code: int, detail: str) -> HTTPException:
+        return HTTPException(
+            status_code=status_code,
+            detail=detail,
+            headers={"Retry-After": str(max(int(self.queue_timeout), 1))},
+        )
+
+    async def acquire(self, user_id: int) -> None:
+        """Wait for a slot or raise 429/503; pair with ``release``."""
+        with self._lock:
+            if self.max_per_user and self._per_user.get(user_id, 0) >= self.max_per_user:
+                self.rejected_user_limit += 1
+                raise self._reject(
+                    status.HTTP_429_TOO_MANY_REQUESTS,
+                    "Too many planning requests in progress for this user",
+                )
+            if self.running < self.max_concurrent and not self._waiters:
+                self.running += 1
+                self.admitted += 1
+                self._join(user_id)
+                return
+            if len(self._waiters) >= self.max_queue:
+                self.rejected_queue_full += 1
+                raise self._reject(
+                    status.HTTP_503_SERVICE_UNAVAILABLE, "Planner is busy, please retry shortly"
+                )
+            waiter = _Waiter(asyncio.get_running_loop())
+            self._waiters.append(waiter)
+            self._join(user_id)
+            self.peak_waiting = max(self.peak_waiting, len(self._waiters))
+
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(waiter.future, timeout=self.queue_timeout)
+        except BaseException as exc:
+            timed_out = isinstance(exc, asyncio.TimeoutError)
+            with self._lock:
+                granted = waiter.granted
+                if not granted:
+                    self._waiters.remove(waiter)
+                    self._leave(user_id)
+                    self.rejected_timeout += timed_out
+            if not granted:
+                if timed_out:
+                    raise self._reject(
+                        status.HTTP_503_SERVICE_UNAVAILABLE, "Planner is busy, please retry shortly"
+                    )
+                raise
+            if not timed_out:
+                # Slot arrived as the client went away: pass it on
+                self.release(user_id)
+                raise
+        with self._lock:
+            self.admitted += 1
+            self.wait_seconds_total += time.perf_counter() - started
+
+    def release(self, user_id: int) -> None:
+        with self._lock:
+            self._leave(user_id)
+            if self._waiters:
+                # Hand the slot straight to the longest waiter
+                waiter = self._waiters.popleft()
+                waiter.granted = True
+                waiter.loop.call_soon_threadsafe(_wake, waiter.future)
+            else:
+                self.running -= 1
+
+    def _join(self, user_id: int) -> None:
+        self._per_user[user_id] = self._per_user.get(user_id, 0) + 1
+
+    def _leave(self, user_id: int) -> None:
+        remaining = self._per_user.get(user_id, 0) - 1
+        if remaining > 0:
+            self._per_user[user_id] = remaining
+        else:
+            self._per_user.pop(user_id, None)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "max_per_user": self.max_per_user,
+                "running": self.running,
+                "queue_depth": len(self._waiters),
+                "peak_queue_depth": self.peak_waiting,
+                "admitted": self.admitted,
+                "rejected_queue_full": self.rejected_queue_full,
+                "rejected_user_limit": self.rejected_user_limit,
+                "rejected_timeout": self.rejected_timeout,
+                "mean_wait_seconds": round(self.wait_seconds_total / self.admitted, 4)
+                if self.admitted
+                else 0.0,
+            }
+
+
+controllers: Dict[str, AdmissionController] = {}
+
+
+def controller(name: str) -> AdmissionController:
+    """The controller for ``name``, created with the PLAN_* settings on first use."""
+    if name not in controllers:
+        controllers[name] = AdmissionController(
+            name,
+            max_concurrent=settings.plan_max_concurrent,
+            max_queue=settings.plan_max_queue,
+            max_per_user=settings.plan_max_per_user,
+            queue_timeout=settings.plan_queue_timeout,
+        )
+    return controllers[name]
+
+
+def admission(name: str):
+    """
+    Dependency holding a slot of controller ``name`` for the whole request.
+    Declare it before the database session so queued requests hold no
+    connection.
+    """
+    limiter = controller(name)
+
+    async def dependency(token: str = Depends(oauth2_scheme)):
+        user_id = user_id_from_token(token)
+        await limiter.acquire(user_id)
+        try:
+            yield
+        finally:
+            limiter.release(user_id)
+
+    return dependency
@@ -1,17 +1,19 @@
 from datetime import datetime, timedelta
-from typing import Generator
+from typing import AsyncGenerator, Generator
 
 import jwt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from passlib.context import CryptContext
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from . import models
 from .config import settings
-from .database import SessionLocal
+from .database import AsyncReadSessionLocal, AsyncSessionLocal, ReadSessionLocal, SessionLocal
+from .hashing import password_hasher
+from .principal_cache import principal_cache
 
-pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
 
@@ -24,18 +26,47 @@ def get_db() -> Generator[Session, None, None]:
         db.close()
 
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+def get_read_db() -> Generator[Session, None, None]:
+    """Provide a read-only DB session (replica when configured) per request."""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """Provide an async DB session per request (for async def routes)."""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def get_async_read_db() -> AsyncGenerator[AsyncSession, None]:
+    """Async counterpart of get_read_db."""
+    async with AsyncReadSessionLocal() as db:
+        yield db
+
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    valid, _ = await password_hasher.verify_and_update(plain_password, hashed_password)
+    return valid
 
 
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+async def hash_password(password: str) -> str:
+    return await password_hasher.hash(password)
 
 
-def authenticate_user(db: Session, email: str, password: str) -> models.User | None:
-    user = db.query(models.User).filter(models.User.email == email).first()
-    if not user or not verify_password(password, user.password_hash):
+async def authenticate_user(db: AsyncSession, email: str, password: str) -> models.User | None:
+    user = await db.scalar(select(models.User).where(models.User.email == email))
+    if not user:
         return None
+    valid, new_hash = await password_hasher.verify_and_update(password, user.password_hash)
+    if not valid:
+        return None
+    if new_hash:
+        # Hashing parameters changed since this password was stored
+        user.password_hash = new_hash
+        await db.commit()
     return user
 
 
@@ -50,24 +81,57 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None) -> s
     return jwt.encode(to_encode, settings.secret_key, algorithm=settings.algorithm)
 
 
-def get_current_user(
-    db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)
-) -> models.User:
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+
+def _decode_token(token: str) -> tuple[int, float | None]:
+    """Return the user id and expiry timestamp of a valid access token."""
     try:
         payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
     except jwt.PyJWTError:
-        raise credentials_exception
+        raise _credentials_exception()
     user_id = payload.get("sub")
     if user_id is None:
-        raise credentials_exception
-    user = db.query(models.User).get(int(user_id))
+        raise _credentials_exception()
+    return int(user_id), payload.get("exp")
+
+
+def user_id_from_token(token: str) -> int:
+    """User id of a valid access token, without touching the database."""
+    return _decode_token(token)[0]
+
+
+def get_current_user(
+    db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)
+) -> models.User:
+    cached = principal_cache.get(token)
+    if cached is not None:
+        # Attach to this request's session without a query
+        return db.merge(cached, load=False)
+    user_id, expires_at = _decode_token(token)
+    user = db.query(models.User).get(user_id)
+    if user is None:
+        raise _credentials_exception()
+    principal_cache.put(token, user, expires_at)
+    return user
+
+
+async def get_current_user_async(
+    db: AsyncSession = Depends(get_async_db), token: str = Depends(oauth2_scheme)
+) -> models.User:
+    cached = principal_cache.get(token)
+    if cached is not None:
+        return await db.merge(cached, load=False)
+    user_id, expires_at = _decode_token(token)
+    user = await db.get(models.User, user_id)
     if user is None:
-        raise credentials_exception
+        raise _credentials_exception()
+    principal_cache.put(token, user, expires_at)
     return user
 
 
@@ -75,3 +139,11 @@ def get_current_admin(current_user: models.User = Depends(get_current_user)) ->
     if current_user.user_type != "admin":
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin only")
     return current_user
+
+
+async def get_current_admin_async(
+    current_user: models.User = Depends(get_current_user_async),
+) -> models.User:
+    if current_user.user_type != "admin":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin only")
+    return current_user
@@ -0,0 +1,259 @@
+"""Chunked, resumable backfills over large tables.
+
+A job walks its table in primary-key order, ``chunk_size`` rows at a time
+(one ``pk > :last ORDER BY pk LIMIT :n`` query per chunk), and writes each
+chunk in its own short transaction together with its checkpoint row in
+``backfill_checkpoints``. Row locks are held for one chunk only, memory is
+bounded by the chunk size, and an interrupted run resumes after the last
+committed chunk. ``max_rows_per_second`` throttles
+the walk so a backfill can run next to production traffic.
+
+Jobs are idempotent recomputations: once a run has finished, the next
+one starts again from the beginning.
+"""
+from __future__ import annotations
+
+import random
+import sys
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Type
+
+from sqlalchemy import Row, Select, bindparam, func, or_, select, update
+from sqlalchemy.orm import Session
+
+from . import models
+from .budget import rebuild_totals
+from .climatology import refresh_climatology
+from .geo import coordinates
+from .ratings import rebuild_summaries
+
+BACKFILL_CHUNK_SIZE = 1000
+
+
+class BackfillJob(ABC):
+    """Set ``name`` and ``pk``; implement ``process`` and optionally ``query`` (pk first)."""
+
+    name: str
+    pk = None  # primary-key Column (table.c.<name>) walked in order
+    description = ""
+
+    def query(self) -> Select:
+        """Rows to visit; the range, order and limit are added per chunk."""
+        return select(self.pk)
+
+    @abstractmethod
+    def process(self, db: Session, rows: List[Row]) -> int:
+        """Write one chunk (not committed); returns how many rows were changed."""
+
+
+@dataclass
+class BackfillProgress:
+    job: str
+    total: int  # rows left to visit when this run started
+    scanned: int = 0
+    changed: int = 0
+    started: float = 0.0
+    resumed_from: Optional[int] = None
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.scanned / self.elapsed if self.elapsed else 0.0
+
+    def line(self) -> str:
+        percent = 100.0 * self.scanned / self.total if self.total else 100.0
+        rate = self.rows_per_second
+        eta = (self.total - self.scanned) / rate if rate else 0.0
+        return (
+            f"[{self.job}] {self.scanned:,}/{self.total:,} ({percent:.1f}%) "
+            f"changed {self.changed:,}, {rate:,.0f} rows/s, ETA {eta:.0f}s"
+        )
+
+
+def _checkpoint(db: Session, name: str) -> models.BackfillCheckpoint:
+    checkpoint = db.get(models.BackfillCheckpoint, name)
+    if checkpoint is None:
+        checkpoint = models.BackfillCheckpoint(name=name, rows_done=0, rows_changed=0)
+        db.add(checkpoint)
+    return checkpoint
+
+
+def _report(progress: BackfillProgress, final: bool = False) -> None:
+    # Rewrite one line on a terminal; one line per chunk in logs
+    if sys.stdout.isatty():
+        print("\r" + progress.line(), end="\n" if final else "", flush=True)
+    else:
+        print(progress.line() + (" - done" if final else ""), flush=True)
+
+
+def run_backfill(
+    db: Session,
+    job: BackfillJob,
+    chunk_size: int = BACKFILL_CHUNK_SIZE,
+    max_rows_per_second: Optional[float] = None,
+    restart: bool = False,
+    report: Callable[..., None] = _report,
+) -> BackfillProgress:
+    """Run ``job`` to completion, resuming an interrupted run unless ``restart``."""
+    checkpoint = _checkpoint(db, job.name)
+    if restart or checkpoint.finished_at is not None or checkpoint.last_key is None:
+        checkpoint.last_key = None
+        checkpoint.rows_done = checkpoint.rows_changed = 0
+        checkpoint.started_at = datetime.utcnow()
+        checkpoint.finished_at = None
+    resumed_from = checkpoint.last_key
+    db.commit()
+
+    def remaining(query: Select) -> Select:
+        return query if resumed_from is None else query.where(job.pk > resumed_from)
+
+    total = db.scalar(select(func.count()).select_from(remaining(job.query()).subquery()))
+    progress = BackfillProgress(
+        job=job.name, total=total or 0, started=time.perf_counter(), resumed_from=resumed_from
+    )
+    if resumed_from is not None:
+        print(f"[{job.name}] resuming after {job.pk.key} {resumed_from}")
+
+    last = resumed_from
+    while True:
+        query = job.query()
+        if last is not None:
+            query = query.where(job.pk > last)
+        query = query.order_by(job.pk).limit(chunk_size)
+        rows = db.execute(query).all()
+        if not rows:
+            break
+        changed = job.process(db, rows)
+        last = rows[-1][0]
+
+        checkpoint = _checkpoint(db, job.name)
+        checkpoint.last_key = last
+        checkpoint.rows_done += len(rows)
+        checkpoint.rows_changed += changed
+        checkpoint.updated_at = datetime.utcnow()
+        db.commit()
+
+        progress.scanned += len(rows)
+        progress.changed += changed
+        report(progress)
+        if max_rows_per_second:
+            behind = progress.scanned / max_rows_per_second - progress.elapsed
+            if behind > 0:
+                time.sleep(behind)
+
+    checkpoint = _checkpoint(db, job.name)
+    checkpoint.finished_at = checkpoint.updated_at = datetime.utcnow()
+    db.commit()
+    report(progress, final=True)
+    return progress
+
+
+# ---------------------------------------------------------------- jobs
+
+
+class ActivityCostBackfill(BackfillJob):
+    name = "activity_costs"
+    pk = models.Activity.__table__.c.activity_id
+    description = "fill missing activity costs from the place's entry fee (else a random estimate)"
+
+    def query(self) -> Select:
+        Activity, Place = models.Activity, models.Place
+        return (
+            select(Activity.activity_id, Activity.itinerary_id, Place.entry_fee)
+            .outerjoin(Place, Place.place_id == Activity.place_id)
+            .where(or_(Activity.estimated_cost.is_(None), Activity.estimated_cost == 0))
+        )
+
+    def process(self, db: Session, rows: List[Row]) -> int:
+        table = models.Activity.__table__
+        stmt = (
+            update(table)
+            .where(table.c.activity_id == bindparam("_id"))
+            .values(estimated_cost=bindparam("_cost"))
+        )
+        db.execute(
+            stmt,
+            [
+                {
+                    "_id": row.activity_id,
+                    "_cost": float(row.entry_fee) if row.entry_fee else float(random.randint(500, 5000)),
+                }
+                for row in rows
+            ],
+        )
+        # Planned-cost totals are maintained incrementally by the API only
+        rebuild_totals(db, {row.itinerary_id for row in rows if row.itinerary_id is not None})
+        return len(rows)
+
+
+class BudgetTotalsBackfill(BackfillJob):
+    name = "budget_totals"
+    pk = models.Itinerary.__table__.c.itinerary_id
+    description = "recompute itinerary expense and planned-cost totals"
+
+    def process(self, db: Session, rows: List[Row]) -> int:
+        rebuild_totals(db, [row.itinerary_id for row in rows])
+        return len(rows)
+
+
+class ClimatologyBackfill(BackfillJob):
+    name = "weather_climatology"
+    pk = models.City.__table__.c.city_id
+    description = "rebuild weekly weather normals per city"
+
+    def process(self, db: Session, rows: List[Row]) -> int:
+        refresh_climatology(db, [row.city_id for row in rows])
+        return len(rows)
+
+
+class PlaceCoordinatesBackfill(BackfillJob):
+    name = "place_coordinates"
+    pk = models.Place.__table__.c.place_id
+    description = "copy lat/lon out of the location JSON into latitude/longitude"
+
+    def query(self) -> Select:
+        Place = models.Place
+        return select(Place.place_id, Place.location, Place.latitude, Place.longitude).where(
+            Place.location.isnot(None)
+        )
+
+    def process(self, db: Session, rows: List[Row]) -> int:
+        params = []
+        for row in rows:
+            lat, lon = coordinates(row.location)
+            if (lat, lon) != (row.latitude, row.longitude):
+                params.append({"_id": row.place_id, "_lat": lat, "_lon": lon})
+        if params:
+            table = models.Place.__table__
+            db.execute(
+                update(table)
+                .where(table.c.place_id == bindparam("_id"))
+                .values(latitude=bindparam("_lat"), longitude=bindparam("_lon")),
+                params,
+            )
+        return len(params)
+
+
+class ReviewSummaryBackfill(BackfillJob):
+    name = "review_summaries"
+    pk = models.Place.__table__.c.place_id
+    description = "recompute per-place review counts, averages and star histograms"
+
+    def process(self, db: Session, rows: List[Row]) -> int:
+        rebuild_summaries(db, [row.place_id for row in rows])
+        return len(rows)
+
+
+JOBS: Dict[str, Type[BackfillJob]] = {
+    "activity-costs": ActivityCostBackfill,
+    "budget-totals": BudgetTotalsBackfill,
+    "climatology": ClimatologyBackfill,
+    "place-coordinates": PlaceCoordinatesBackfill,
+    "review-summaries": ReviewSummaryBackfill,
+}
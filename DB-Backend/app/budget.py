@@ -0,0 +1,166 @@
+"""Incrementally maintained expense and planned-cost totals per itinerary.
+
+Routes that write expenses or activities report the change here inside
+their own transaction, as an atomic ``total = total + :delta`` upsert, so
+budget views read one row per itinerary (plus one per expense category)
+instead of summing every expense. ``rebuild_totals`` recomputes the rows
+from the base tables after data is changed outside the API.
+"""
+from decimal import Decimal
+from typing import Iterable, Optional
+
+from sqlalchemy import and_, delete, func, insert, select
+from sqlalchemy.orm import Session
+
+from . import models, schemas
+from .database import upsert_insert
+
+UNCATEGORIZED = "Other"
+
+
+def money(value) -> Decimal:
+    """Exact amount for a float or Numeric value; None counts as 0."""
+    return Decimal(str(value or 0))
+
+
+def _add(db: Session, model, key: dict, deltas: dict) -> None:
+    table = model.__table__
+    stmt = upsert_insert(db.get_bind().dialect.name, table).values(**key, **deltas)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(key),
+        set_={name: table.c[name] + stmt.excluded[name] for name in deltas},
+    )
+    db.execute(stmt)
+
+
+def record_expense(
+    db: Session, itinerary_id: int, category: Optional[str], amount, count: int = 1
+) -> None:
+    """Add an expense to the totals (see remove_expense for the reverse)."""
+    amount = money(amount)
+    _add(
+        db,
+        models.ItineraryTotals,
+        {"itinerary_id": itinerary_id},
+        {"expense_total": amount, "expense_count": count},
+    )
+    _add(
+        db,
+        models.ItineraryCategoryTotal,
+        {"itinerary_id": itinerary_id, "category": category or UNCATEGORIZED},
+        {"total": amount, "count": count},
+    )
+
+
+def remove_expense(db: Session, itinerary_id: int, category: Optional[str], amount) -> None:
+    record_expense(db, itinerary_id, category, -money(amount), count=-1)
+
+
+def record_activity_cost(db: Session, itinerary_id: int, cost, count: int = 1) -> None:
+    """Add the planned cost of ``count`` activities to the totals."""
+    cost = money(cost)
+    if not cost and not count:
+        return
+    _add(
+        db,
+        models.ItineraryTotals,
+        {"itinerary_id": itinerary_id},
+        {"planned_activity_cost": cost, "activity_count": count},
+    )
+
+
+def remove_activity_cost(db: Session, itinerary_id: int, cost, count: int = 1) -> None:
+    record_activity_cost(db, itinerary_id, -money(cost), count=-count)
+
+
+def rebuild_totals(db: Session, itinerary_ids: Optional[Iterable[int]] = None) -> None:
+    """Recompute the totals of some (default: all) itineraries from the base tables."""
+    Itinerary, Expense, Activity = models.Itinerary, models.Expense, models.Activity
+    ids = list(itinerary_ids) if itinerary_ids is not None else None
+    db.flush()
+
+    for model in (models.ItineraryTotals, models.ItineraryCategoryTotal):
+        stmt = delete(model)
+        if ids is not None:
+            stmt = stmt.where(model.itinerary_id.in_(ids))
+        db.execute(stmt)
+
+    def aggregate(*columns, where):
+        return select(*columns).where(where).scalar_subquery()
+
+    expense_of = Expense.itinerary_id == Itinerary.itinerary_id
+    activity_of = Activity.itinerary_id == Itinerary.itinerary_id
+    totals = select(
+        Itinerary.itinerary_id,
+        aggregate(func.coalesce(func.sum(Expense.amount), 0), where=expense_of),
+        aggregate(func.count(Expense.expense_id), where=expense_of),
+        aggregate(func.coalesce(func.sum(Activity.estimated_cost), 0), where=activity_of),
+        aggregate(func.count(Activity.activity_id), where=activity_of),
+    )
+    category = func.coalesce(Expense.category, UNCATEGORIZED)
+    categories = (
+        select(
+            Expense.itinerary_id,
+            category,
+            func.coalesce(func.sum(Expense.amount), 0),
+            func.count(Expense.expense_id),
+        )
+        .where(Expense.itinerary_id.isnot(None))
+        .group_by(Expense.itinerary_id, category)
+    )
+    if ids is not None:
+        totals = totals.where(Itinerary.itinerary_id.in_(ids))
+        categories = categories.where(Expense.itinerary_id.in_(ids))
+
+    db.execute(
+        insert(models.ItineraryTotals).from_select(
+            ["itinerary_id", "expense_total", "expense_count", "planned_activity_cost", "activity_count"],
+            totals,
+        )
+    )
+    db.execute(
+        insert(models.ItineraryCategoryTotal).from_select(
+            ["itinerary_id", "category", "total", "count"], categories
+        )
+    )
+
+
+def load_budget(db: Session, itinerary_id: int, scope) -> Optional[schemas.ItineraryBudget]:
+    """The itinerary's budget and totals in one query; None if not found within ``scope``."""
+    Itinerary, Totals, Category = (
+        models.Itinerary,
+        models.ItineraryTotals,
+        models.ItineraryCategoryTotal,
+    )
+    rows = db.execute(
+        select(
+            Itinerary.total_budget,
+            Totals.expense_total,
+            Totals.expense_count,
+            Totals.planned_activity_cost,
+            Totals.activity_count,
+            Category.category,
+            Category.total,
+        )
+        .select_from(Itinerary)
+        .outerjoin(Totals, Totals.itinerary_id == Itinerary.itinerary_id)
+        .outerjoin(
+            Category, and_(Category.itinerary_id == Itinerary.itinerary_id, Category.count > 0)
+        )
+        .where(Itinerary.itinerary_id == itinerary_id, scope)
+    ).all()
+    if not rows:
+        return None
+    first = rows[0]
+    expense_total = float(first.expense_total or 0)
+    total_budget = float(first.total_budget) if first.total_budget is not None else None
+    return schemas.ItineraryBudget(
+        itinerary_id=itinerary_id,
+        total_budget=total_budget,
+        expense_total=expense_total,
+        expense_count=first.expense_count or 0,
+        planned_activity_cost=float(first.planned_activity_cost or 0),
+        activity_count=first.activity_count or 0,
+        remaining=total_budget - expense_total if total_budget is not None else None,
+        by_category={row.category: float(row.total) for row in rows if row.category is not None},
+    )
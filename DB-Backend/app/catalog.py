@@ -0,0 +1,334 @@
+"""Process-wide cache of catalog reads with cross-worker invalidation.
+
+Cities, places and categories change rarely (admin writes only), so each
+worker keeps recent catalog responses in memory. Writers call
+``catalog.changed(*tables)``, which bumps the shared HTTP table versions,
+drops the local entries and publishes the change on an invalidation bus so
+every other worker does the same:
+
+* ``postgres``: LISTEN/NOTIFY on the main database (production);
+* ``file``: a shared counter file polled by each worker (one host, tests);
+* ``local``: no cross-process delivery (single worker).
+
+Entries also expire after ``CATALOG_CACHE_TTL_SECONDS``, which bounds
+staleness if a notification is ever missed.
+"""
+import asyncio
+import json
+import select
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+from sqlalchemy.engine import make_url
+
+from .config import settings
+from .http_cache import table_versions
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+NOTIFY_CHANNEL = "catalog_changes"
+
+Listener = Callable[[Iterable[str]], None]
+
+# Tells requests waiting on a load that was abandoned to load it themselves
+_RETRY = object()
+
+
+class LocalBus:
+    """Delivers nothing to other processes."""
+
+    def publish(self, tables: Tuple[str, ...]) -> None:
+        pass
+
+    def start(self, on_change: Listener, on_reset: Callable[[], None]) -> None:
+        pass
+
+    def stop(self) -> None:
+        pass
+
+
+class _PollingThread:
+    def __init__(self) -> None:
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _start_thread(self, target: Callable[[], None], name: str) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(target=target, name=name, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+@contextmanager
+def _file_lock(f, exclusive: bool):
+    """flock on POSIX; on Windows an exclusive lock on the file's first byte."""
+    if fcntl is not None:
+        fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+        return
+    # msvcrt has no shared locks, and LK_LOCK gives up after ten one-second tries
+    f.seek(0)
+    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+    try:
+        yield
+    finally:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class FileBus(_PollingThread):
+    """Per-table change counters in a shared JSON file, polled by every worker."""
+
+    def __init__(self, path: str, poll_seconds: float) -> None:
+        super().__init__()
+        self.path = path
+        self.poll_seconds = poll_seconds
+        self._seen: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _locked(self, update: Optional[Tuple[str, ...]] = None) -> Dict[str, int]:
+        with open(self.path, "a+") as f, _file_lock(f, exclusive=bool(update)):
+            f.seek(0)
+            raw = f.read()
+            counters = json.loads(raw) if raw else {}
+            if update:
+                for table in update:
+                    counters[table] = counters.get(table, 0) + 1
+                f.seek(0)
+                f.truncate()
+                json.dump(counters, f)
+                f.flush()
+            return counters
+
+    def publish(self, tables: Tuple[str, ...]) -> None:
+        counters = self._locked(update=tables)
+        with self._lock:
+            # Our own change is already applied locally
+            for table in tables:
+                self._seen[table] = counters[table]
+
+    def start(self, on_change: Listener, on_reset: Callable[[], None]) -> None:
+        self._seen = self._locked()
+
+        def run() -> None:
+            while not self._stop.wait(self.poll_seconds):
+                try:
+                    counters = self._locked()
+                except (OSError, ValueError) as e:
+                    print(f"Catalog bus: could not read {self.path}: {e}")
+                    continue
+                with self._lock:
+                    changed = [t for t, v in counters.items() if self._seen.get(t) != v]
+                    self._seen = counters
+                if changed:
+                    on_change(changed)
+
+        self._start_thread(run, "catalog-file-bus")
+
+
+class PostgresBus(_PollingThread):
+    """NOTIFY on publish; a dedicated connection LISTENs in a background thread."""
+
+    def __init__(self, database_url: str, channel: str = NOTIFY_CHANNEL) -> None:
+        super().__init__()
+        self.dsn = make_url(database_url).set(drivername="postgresql").render_as_string(
+            hide_password=False
+        )
+        self.channel = channel
+        self.origin = uuid.uuid4().hex
+
+    def _connect(self):
+        import psycopg2
+
+        conn = psycopg2.connect(self.dsn)
+        conn.autocommit = True
+        return conn
+
+    def publish(self, tables: Tuple[str, ...]) -> None:
+        conn = self._connect()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "SELECT pg_notify(%s, %s)",
+                    (self.channel, json.dumps({"origin": self.origin, "tables": list(tables)})),
+                )
+        finally:
+            conn.close()
+
+    def start(self, on_change: Listener, on_reset: Callable[[], None]) -> None:
+        def run() -> None:
+            while not self._stop.is_set():
+                try:
+                    conn = self._connect()
+                except Exception as e:
+                    print(f"Catalog bus: LISTEN connection failed: {e}")
+                    self._stop.wait(5)
+                    continue
+                try:
+                    with conn.cursor() as cur:
+                        cur.execute(f'LISTEN "{self.channel}"')
+                    # Anything published while we were disconnected was missed
+                    on_reset()
+                    while not self._stop.is_set():
+                        if select.select([conn], [], [], 1.0) == ([], [], []):
+                            continue
+                        conn.poll()
+                        while conn.notifies:
+                            message = json.loads(conn.notifies.pop(0).payload)
+                            if message.get("origin") != self.origin:
+                                on_change(message.get("tables", []))
+                except Exception as e:
+                    print(f"Catalog bus: LISTEN connection lost: {e}")
+                finally:
+                    conn.close()
+
+        self._start_thread(run, "catalog-pg-bus")
+
+
+def _make_bus():
+    kind = settings.catalog_bus
+    if kind == "auto":
+        backend = make_url(settings.database_url).get_backend_name()
+        kind = "postgres" if backend == "postgresql" else "local"
+    if kind == "postgres":
+        return PostgresBus(settings.database_url)
+    if kind == "file":
+        return FileBus(settings.catalog_bus_file, settings.catalog_bus_poll_seconds)
+    if kind == "local":
+        return LocalBus()
+    raise ValueError(f"Unknown CATALOG_BUS '{kind}'")
+
+
+class CatalogCache:
+    """LRU of loaded catalog values, each tagged with the tables it was built from."""
+
+    def __init__(self, bus, max_entries: int, ttl_seconds: float) -> None:
+        self.bus = bus
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, Tuple[float, Tuple[str, ...], Any]]" = OrderedDict()
+        # Bumped on invalidation so a load that raced a write is not stored
+        self._generations: Dict[str, int] = {}
+        self._epoch = 0
+        # key -> future resolved by the request currently loading it
+        self._loading: Dict[Hashable, "asyncio.Future"] = {}
+        self._lock = threading.Lock()
+
+    async def get_or_load(
+        self, key: Hashable, tables: Tuple[str, ...], load: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """
+        Cached value for ``key``, or ``await load()`` and remember it.
+        Concurrent misses for the same key share one load (single flight).
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            now = time.monotonic()
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] > now:
+                    self._entries.move_to_end(key)
+                    return entry[2]
+                pending = self._loading.get(key)
+                # A future can only be awaited on its own loop
+                if pending is None or pending.get_loop() is not loop:
+                    flight = loop.create_future()
+                    self._loading[key] = flight
+                    generation = self._generation(tables)
+                    break
+            outcome = await asyncio.shield(pending)
+            if outcome is not _RETRY:
+                ok, result = outcome
+                if ok:
+                    return result
+                raise result
+            # The loading request went away before finishing: load it here
+
+        try:
+            value = await load()
+        except Exception as exc:
+            self._land(key, flight, (False, exc))
+            raise
+        except BaseException:
+            self._land(key, flight, _RETRY)
+            raise
+        with self._lock:
+            if generation == self._generation(tables):
+                self._entries[key] = (now + self.ttl_seconds, tables, value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        self._land(key, flight, (True, value))
+        return value
+
+    def _land(self, key: Hashable, flight: "asyncio.Future", outcome: Any) -> None:
+        with self._lock:
+            if self._loading.get(key) is flight:
+                del self._loading[key]
+        flight.set_result(outcome)
+
+    def _generation(self, tables: Tuple[str, ...]) -> Tuple[int, ...]:
+        return (self._epoch, *(self._generations.get(t, 0) for t in tables))
+
+    def invalidate(self, tables: Iterable[str]) -> None:
+        """Drop entries built from ``tables`` in this process."""
+        tables = set(tables)
+        if not tables:
+            return
+        with self._lock:
+            for table in tables:
+                self._generations[table] = self._generations.get(table, 0) + 1
+            stale = [k for k, (_, deps, _) in self._entries.items() if tables.intersection(deps)]
+            for key in stale:
+                del self._entries[key]
+        table_versions.refresh()
+
+    def clear(self) -> None:
+        """Drop everything, e.g. after notifications may have been missed."""
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
+        table_versions.refresh()
+
+    def changed(self, *tables: str) -> None:
+        """Call after committing a write to ``tables``: invalidates every worker."""
+        try:
+            table_versions.bump(*tables)
+        except Exception as e:
+            # Validators still expire with the cache TTL window
+            print(f"HTTP cache: could not bump versions of {tables}: {e}")
+        self.invalidate(tables)
+        try:
+            self.bus.publish(tables)
+        except Exception as e:
+            # Other workers catch up when their entries expire
+            print(f"Catalog bus: could not publish change to {tables}: {e}")
+
+    def start(self) -> None:
+        self.bus.start(self.invalidate, self.clear)
+
+    def stop(self) -> None:
+        self.bus.stop()
+
+
+catalog = CatalogCache(
+    _make_bus(),
+    max_entries=settings.catalog_cache_max_entries,
+    ttl_seconds=settings.catalog_cache_ttl_seconds,
+)
@@ -0,0 +1,507 @@
+"""Bulk import of cities and places from CSV, JSON or NDJSON files.
+
+Records are deduplicated on their natural keys (a city's name and
+province; a place's city and name) and matched in batches against what
+is already stored, then written as new rows and updates:
+
+* PostgreSQL: new rows are COPYed into the table; updates are COPYed into
+  a temporary staging table and applied with one ``UPDATE ... FROM``;
+* other databases (SQLite): executemany INSERT / UPDATE statements.
+
+Only the fields present in a record are written, so a file of just
+``city, place_name, duration`` fixes durations without touching anything
+else. With ``fill_only`` existing rows only receive values for columns
+that are still NULL, so a seed file can be re-run without overwriting
+edits made since (new rows are inserted as usual). Places may name a city
+that does not exist yet; it is created. Bad records are counted and
+reported rather than aborting the load. The caller commits.
+"""
+from __future__ import annotations
+
+import csv
+import io
+import json
+import time
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import Table, bindparam, insert, select, tuple_, update
+from sqlalchemy.orm import Session
+
+from . import models
+from .geo import coordinates
+
+IMPORT_BATCH_SIZE = 5000
+MAX_REPORTED_ERRORS = 20
+
+CityKey = Tuple[str, Optional[str]]  # (name, province)
+
+
+class CatalogFormat(str, Enum):
+    csv = "csv"
+    json = "json"
+    ndjson = "ndjson"
+
+    @classmethod
+    def for_path(cls, path: str) -> "CatalogFormat":
+        ext = path.rsplit(".", 1)[-1].lower()
+        if ext == "jsonl":
+            return cls.ndjson
+        try:
+            return cls(ext)
+        except ValueError:
+            raise ValueError(f"{path}: cannot tell the format from the extension; pass --format")
+
+
+def read_records(path: str, fmt: CatalogFormat) -> Iterator[Tuple[str, Any]]:
+    """Yield ``(position, record)`` pairs; positions are used in error reports."""
+    with open(path, encoding="utf-8", newline="") as f:
+        if fmt == CatalogFormat.csv:
+            for line_no, row in enumerate(csv.DictReader(f), start=2):
+                yield f"line {line_no}", {k.strip(): v for k, v in row.items() if k and v not in ("", None)}
+        elif fmt == CatalogFormat.json:
+            data = json.load(f)
+            if not isinstance(data, list):
+                raise ValueError(f"{path}: expected a JSON array of objects")
+            for index, record in enumerate(data):
+                yield f"item {index}", record
+        else:
+            for line_no, line in enumerate(f, start=1):
+                if line.strip():
+                    try:
+                        yield f"line {line_no}", json.loads(line)
+                    except json.JSONDecodeError as e:
+                        yield f"line {line_no}", ValueError(f"invalid JSON ({e.msg})")
+
+
+@dataclass
+class ImportStats:
+    kind: str
+    read: int = 0
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    rejected: int = 0
+    cities_created: int = 0
+    errors: List[str] = field(default_factory=list)
+    seconds: float = 0.0
+
+    def reject(self, where: str, message: str) -> None:
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(f"{where}: {message}")
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.read / self.seconds if self.seconds else 0.0
+
+    def summary(self) -> str:
+        text = (
+            f"{self.kind}: {self.read} read, {self.inserted} inserted, {self.updated} updated, "
+            f"{self.unchanged} unchanged, {self.rejected} rejected"
+        )
+        if self.cities_created:
+            text += f", {self.cities_created} cities created"
+        return text + f" in {self.seconds:.1f}s ({self.rows_per_second:,.0f} rows/s)"
+
+
+# ---------------------------------------------------------------- values
+
+
+def _text(record: dict, *names: str) -> Optional[str]:
+    for name in names:
+        value = record.get(name)
+        if value is not None and str(value).strip():
+            return str(value).strip()
+    return None
+
+
+def _number(record: dict, *names: str) -> Optional[float]:
+    for name in names:
+        if record.get(name) is not None:
+            try:
+                return float(record[name])
+            except (TypeError, ValueError):
+                raise ValueError(f"{name} must be a number")
+    return None
+
+
+def city_values(record: dict) -> dict:
+    name = _text(record, "name", "city")
+    if not name:
+        raise ValueError("name is required")
+    values = {"name": name, "province": _text(record, "province")}
+    description = _text(record, "description")
+    if description is not None:
+        values["description"] = description
+    return values
+
+
+def place_values(record: dict) -> Tuple[dict, Optional[CityKey]]:
+    """Column values for a place record plus the city it names (if by name)."""
+    name = _text(record, "place_name", "name")
+    if not name:
+        raise ValueError("place_name is required")
+    values: Dict[str, Any] = {"place_name": name}
+
+    city_ref: Optional[CityKey] = None
+    if record.get("city_id") is not None:
+        try:
+            values["city_id"] = int(record["city_id"])
+        except (TypeError, ValueError):
+            raise ValueError("city_id must be an integer")
+    else:
+        city = _text(record, "city")
+        if not city:
+            raise ValueError("city or city_id is required")
+        city_ref = (city, _text(record, "province"))
+
+    for column in ("category", "description"):
+        value = _text(record, column)
+        if value is not None:
+            values[column] = value
+    duration = _number(record, "duration")
+    if duration is not None:
+        if not 0 < duration < 100:
+            raise ValueError("duration must be between 0 and 100 hours")
+        values["duration"] = duration
+    fee = _number(record, "entry_fee", "cost")
+    if fee is not None:
+        if fee < 0:
+            raise ValueError("entry_fee must not be negative")
+        values["entry_fee"] = fee
+
+    location = record.get("location")
+    if isinstance(location, str):
+        try:
+            location = json.loads(location)
+        except json.JSONDecodeError:
+            raise ValueError("location must be a JSON object")
+    lat = _number(record, "lat", "latitude")
+    lon = _number(record, "lon", "lng", "longitude")
+    if (lat is None) != (lon is None):
+        raise ValueError("lat and lon must be given together")
+    if lat is not None:
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            raise ValueError("lat/lon out of range")
+        location = {**(location if isinstance(location, dict) else {}), "lat": lat, "lon": lon}
+    if location is not None:
+        if not isinstance(location, dict):
+            raise ValueError("location must be a JSON object")
+        values["location"] = location
+        values["latitude"], values["longitude"] = coordinates(location)
+    return values, city_ref
+
+
+# ---------------------------------------------------------------- writing
+
+
+class RowWriter:
+    """INSERTs and primary-key UPDATEs in batches, using COPY on PostgreSQL."""
+
+    def __init__(self, db: Session) -> None:
+        self.db = db
+        self.copy = db.get_bind().dialect.name == "postgresql"
+
+    def insert(self, table: Table, rows: List[dict]) -> None:
+        if not rows:
+            return
+        for columns, group in _by_columns(rows):
+            if self.copy:
+                self._copy(table.name, columns, group)
+            else:
+                self.db.execute(insert(table), group)
+
+    def update(self, table: Table, rows: List[dict]) -> None:
+        """Apply ``rows``, each holding the primary key plus the columns to set."""
+        if not rows:
+            return
+        pk = table.primary_key.columns.values()[0]
+        for columns, group in _by_columns(rows):
+            columns = [c for c in columns if c != pk.name]
+            if not columns:
+                continue
+            if self.copy:
+                self._copy_update(table, pk.name, columns, group)
+            else:
+                stmt = (
+                    update(table)
+                    .where(pk == bindparam("_pk"))
+                    .values({c: bindparam(f"_v_{c}") for c in columns})
+                )
+                self.db.execute(
+                    stmt,
+                    [{"_pk": r[pk.name], **{f"_v_{c}": r[c] for c in columns}} for r in group],
+                )
+
+    def _copy(self, table_name: str, columns: List[str], rows: List[dict]) -> None:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow([_copy_value(row[c]) for c in columns])
+        buffer.seek(0)
+        cursor = self.db.connection().connection.driver_connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY {table_name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer
+            )
+        finally:
+            cursor.close()
+
+    def _copy_update(self, table: Table, pk: str, columns: List[str], rows: List[dict]) -> None:
+        stage = f"_import_{table.name}"
+        conn = self.db.connection()
+        conn.exec_driver_sql(
+            f"CREATE TEMP TABLE {stage} AS SELECT {pk}, {', '.join(columns)} "
+            f"FROM {table.name} WITH NO DATA"
+        )
+        try:
+            self._copy(stage, [pk, *columns], rows)
+            assignments = ", ".join(f"{c} = s.{c}" for c in columns)
+            conn.exec_driver_sql(
+                f"UPDATE {table.name} AS t SET {assignments} FROM {stage} AS s WHERE t.{pk} = s.{pk}"
+            )
+        finally:
+            conn.exec_driver_sql(f"DROP TABLE {stage}")
+
+
+def _copy_value(value: Any) -> Any:
+    # COPY ... (FORMAT csv) reads an unquoted empty field as NULL
+    if value is None:
+        return ""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return value
+
+
+def _by_columns(rows: List[dict]) -> Iterator[Tuple[List[str], List[dict]]]:
+    groups: Dict[Tuple[str, ...], List[dict]] = {}
+    for row in rows:
+        groups.setdefault(tuple(sorted(row)), []).append(row)
+    for columns, group in groups.items():
+        yield list(columns), group
+
+
+def _changes(values: dict, key_columns: Iterable[str]) -> dict:
+    return {k: v for k, v in values.items() if k not in key_columns}
+
+
+def _fill_only(db: Session, table: Table, updates: List[dict]) -> List[dict]:
+    """Restrict ``updates`` to the columns that are still NULL on the stored rows."""
+    if not updates:
+        return updates
+    pk = table.primary_key.columns.values()[0]
+    columns = sorted({c for row in updates for c in row} - {pk.name})
+    stored = {
+        row[0]: row._mapping
+        for row in db.execute(
+            select(pk, *(table.c[c] for c in columns)).where(pk.in_([r[pk.name] for r in updates]))
+        )
+    }
+    filled = []
+    for row in updates:
+        gaps = {c: v for c, v in row.items() if c != pk.name and stored[row[pk.name]][c] is None}
+        if gaps:
+            filled.append({pk.name: row[pk.name], **gaps})
+    return filled
+
+
+# ---------------------------------------------------------------- cities
+
+
+def _existing_cities(db: Session, names: Iterable[str]) -> Dict[CityKey, int]:
+    City = models.City
+    existing: Dict[CityKey, int] = {}
+    rows = db.execute(
+        select(City.city_id, City.name, City.province)
+        .where(City.name.in_(set(names)))
+        .order_by(City.city_id)
+    )
+    for city_id, name, province in rows:
+        existing.setdefault((name, province), city_id)
+    return existing
+
+
+def _write_cities(
+    db: Session,
+    writer: RowWriter,
+    batch: Dict[CityKey, dict],
+    stats: ImportStats,
+    fill_only: bool,
+) -> None:
+    existing = _existing_cities(db, (name for name, _ in batch))
+    inserts, updates = [], []
+    for key, values in batch.items():
+        city_id = existing.get(key)
+        if city_id is None:
+            inserts.append(values)
+        elif _changes(values, ("name", "province")):
+            updates.append({"city_id": city_id, **_changes(values, ("name", "province"))})
+        else:
+            stats.unchanged += 1
+    if fill_only:
+        filled = _fill_only(db, models.City.__table__, updates)
+        stats.unchanged += len(updates) - len(filled)
+        updates = filled
+    writer.insert(models.City.__table__, inserts)
+    writer.update(models.City.__table__, updates)
+    stats.inserted += len(inserts)
+    stats.updated += len(updates)
+
+
+def import_cities(
+    db: Session,
+    records: Iterable[Tuple[str, Any]],
+    batch_size: int = IMPORT_BATCH_SIZE,
+    fill_only: bool = False,
+) -> ImportStats:
+    stats = ImportStats("cities")
+    started = time.perf_counter()
+    writer = RowWriter(db)
+    batch: Dict[CityKey, dict] = {}
+    for where, record in records:
+        stats.read += 1
+        try:
+            if isinstance(record, Exception):
+                raise record
+            if not isinstance(record, dict):
+                raise ValueError("expected an object")
+            values = city_values(record)
+        except ValueError as e:
+            stats.reject(where, str(e))
+            continue
+        key = (values["name"], values["province"])
+        batch[key] = {**batch.get(key, {}), **values}
+        if len(batch) >= batch_size:
+            _write_cities(db, writer, batch, stats, fill_only)
+            batch = {}
+    if batch:
+        _write_cities(db, writer, batch, stats, fill_only)
+    stats.seconds = time.perf_counter() - started
+    return stats
+
+
+# ---------------------------------------------------------------- places
+
+
+def _resolve_cities(
+    db: Session, writer: RowWriter, refs: Iterable[CityKey], stats: ImportStats
+) -> Dict[CityKey, Optional[int]]:
+    """City id for each (name, province) reference, creating missing cities.
+
+    A reference without a province matches a city of that name if there is
+    exactly one; None marks an ambiguous reference.
+    """
+    refs = set(refs)
+    existing = _existing_cities(db, (name for name, _ in refs))
+    by_name: Dict[str, List[int]] = {}
+    for (name, _), city_id in existing.items():
+        by_name.setdefault(name, []).append(city_id)
+
+    resolved: Dict[CityKey, Optional[int]] = {}
+    missing = []
+    for name, province in refs:
+        if (name, province) in existing:
+            resolved[(name, province)] = existing[(name, province)]
+        elif province is None and name in by_name:
+            ids = by_name[name]
+            resolved[(name, province)] = ids[0] if len(ids) == 1 else None
+        else:
+            missing.append({"name": name, "province": province})
+    if missing:
+        writer.insert(models.City.__table__, missing)
+        stats.cities_created += len(missing)
+        created = _existing_cities(db, (c["name"] for c in missing))
+        for city in missing:
+            resolved[(city["name"], city["province"])] = created[(city["name"], city["province"])]
+    return resolved
+
+
+def _write_places(
+    db: Session,
+    writer: RowWriter,
+    batch: List[Tuple[str, dict, Optional[CityKey]]],
+    stats: ImportStats,
+    fill_only: bool,
+) -> None:
+    city_ids = _resolve_cities(db, writer, (ref for _, _, ref in batch if ref), stats)
+
+    # Deduplicate on (city_id, place_name); later records win field by field
+    places: Dict[Tuple[int, str], dict] = {}
+    for where, values, ref in batch:
+        if ref is not None:
+            if city_ids[ref] is None:
+                stats.reject(where, f"city '{ref[0]}' is ambiguous; add its province")
+                continue
+            values = {**values, "city_id": city_ids[ref]}
+        key = (values["city_id"], values["place_name"])
+        places[key] = {**places.get(key, {}), **values}
+    if not places:
+        return
+
+    Place = models.Place
+    existing: Dict[Tuple[int, str], int] = {}
+    rows = db.execute(
+        select(Place.place_id, Place.city_id, Place.place_name)
+        # Row-value IN: two separate IN lists make SQLite probe their cross product
+        .where(tuple_(Place.city_id, Place.place_name).in_(list(places)))
+        .order_by(Place.place_id)
+    )
+    for place_id, city_id, name in rows:
+        existing.setdefault((city_id, name), place_id)
+
+    known_city_ids = set(
+        db.scalars(select(models.City.city_id).where(models.City.city_id.in_({c for c, _ in places})))
+    )
+    inserts, updates = [], []
+    for key, values in places.items():
+        if key[0] not in known_city_ids:
+            stats.reject(f"place '{key[1]}'", f"unknown city_id {key[0]}")
+            continue
+        place_id = existing.get(key)
+        if place_id is None:
+            inserts.append(values)
+        elif _changes(values, ("city_id", "place_name")):
+            updates.append({"place_id": place_id, **_changes(values, ("city_id", "place_name"))})
+        else:
+            stats.unchanged += 1
+    if fill_only:
+        filled = _fill_only(db, Place.__table__, updates)
+        stats.unchanged += len(updates) - len(filled)
+        updates = filled
+    writer.insert(Place.__table__, inserts)
+    writer.update(Place.__table__, updates)
+    stats.inserted += len(inserts)
+    stats.updated += len(updates)
+
+
+def import_places(
+    db: Session,
+    records: Iterable[Tuple[str, Any]],
+    batch_size: int = IMPORT_BATCH_SIZE,
+    fill_only: bool = False,
+) -> ImportStats:
+    stats = ImportStats("places")
+    started = time.perf_counter()
+    writer = RowWriter(db)
+    batch: List[Tuple[str, dict, Optional[CityKey]]] = []
+    for where, record in records:
+        stats.read += 1
+        try:
+            if isinstance(record, Exception):
+                raise record
+            if not isinstance(record, dict):
+                raise ValueError("expected an object")
+            values, city_ref = place_values(record)
+        except ValueError as e:
+            stats.reject(where, str(e))
+            continue
+        batch.append((where, values, city_ref))
+        if len(batch) >= batch_size:
+            _write_places(db, writer, batch, stats, fill_only)
+            batch = []
+    if batch:
+        _write_places(db, writer, batch, stats, fill_only)
+    stats.seconds = time.perf_counter() - started
+    return stats
@@ -0,0 +1,208 @@
+"""Per-city, per-week-of-year weather normals for long-range planning.
+
+Trips are usually planned before any forecast exists, so
+``refresh_climatology`` condenses the historical ``weather`` rows into at
+most 53 rows per city (ISO week of year): mean min/max temperature in
+Celsius and the share of days with bad conditions. Readers then need one
+indexed lookup per trip instead of aggregating raw history.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import Session
+
+from . import models
+
+# Matched case-insensitively against Weather.conditions
+BAD_CONDITION_WORDS = ("rain", "storm", "thunder", "snow", "sleet", "hail", "shower", "drizzle", "fog")
+# Days at or above this probability are planned as bad-weather days
+BAD_WEATHER_THRESHOLD = 0.5
+
+
+def is_bad_conditions(conditions: Optional[str]) -> bool:
+    text = (conditions or "").lower()
+    return any(word in text for word in BAD_CONDITION_WORDS)
+
+
+def week_of_year(day: date) -> int:
+    return day.isocalendar()[1]
+
+
+def _celsius(value, unit: Optional[str]) -> Optional[float]:
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    if (unit or "C").upper().startswith("F"):
+        return (value - 32) * 5 / 9
+    return value
+
+
+def temperature_range(temperature) -> Tuple[Optional[float], Optional[float]]:
+    """(min, max) in Celsius from a ``{min, max, unit}`` reading; a single ``avg`` fills both."""
+    if not isinstance(temperature, dict):
+        return None, None
+    unit = temperature.get("unit")
+    single = temperature.get("avg", temperature.get("mean"))
+    low = _celsius(temperature.get("min", single), unit)
+    high = _celsius(temperature.get("max", single), unit)
+    return low, high
+
+
+class _WeekAccumulator:
+    __slots__ = ("days", "bad_days", "min_sum", "min_count", "max_sum", "max_count")
+
+    def __init__(self) -> None:
+        self.days = self.bad_days = self.min_count = self.max_count = 0
+        self.min_sum = self.max_sum = 0.0
+
+    def add(self, temperature, conditions: Optional[str]) -> None:
+        self.days += 1
+        if is_bad_conditions(conditions):
+            self.bad_days += 1
+        low, high = temperature_range(temperature)
+        if low is not None:
+            self.min_sum += low
+            self.min_count += 1
+        if high is not None:
+            self.max_sum += high
+            self.max_count += 1
+
+    def row(self, city_id: int, week: int, computed_at: datetime) -> dict:
+        return {
+            "city_id": city_id,
+            "week": week,
+            "sample_days": self.days,
+            "mean_min_temp": round(self.min_sum / self.min_count, 2) if self.min_count else None,
+            "mean_max_temp": round(self.max_sum / self.max_count, 2) if self.max_count else None,
+            "bad_weather_probability": round(self.bad_days / self.days, 4),
+            "computed_at": computed_at,
+        }
+
+
+def refresh_climatology(
+    db: Session, city_ids: Optional[Iterable[int]] = None, batch_size: int = 5000
+) -> int:
+    """
+    Recompute the normals of some (default: all) cities from the weather
+    table in one transaction; readers see either the old or the new set.
+    Returns the number of rows written. The caller commits.
+    """
+    Weather, Climate = models.Weather, models.WeatherClimatology
+    ids = list(city_ids) if city_ids is not None else None
+
+    query = select(Weather.city_id, Weather.date, Weather.temperature, Weather.conditions).where(
+        Weather.city_id.isnot(None), Weather.date.isnot(None)
+    )
+    if ids is not None:
+        query = query.where(Weather.city_id.in_(ids))
+
+    weeks: Dict[Tuple[int, int], _WeekAccumulator] = {}
+    for row in db.execute(query.execution_options(yield_per=batch_size)):
+        key = (row.city_id, week_of_year(row.date))
+        acc = weeks.get(key)
+        if acc is None:
+            acc = weeks[key] = _WeekAccumulator()
+        acc.add(row.temperature, row.conditions)
+
+    stmt = delete(Climate)
+    if ids is not None:
+        stmt = stmt.where(Climate.city_id.in_(ids))
+    db.execute(stmt)
+
+    computed_at = datetime.utcnow()
+    rows = [acc.row(city_id, week, computed_at) for (city_id, week), acc in sorted(weeks.items())]
+    if rows:
+        db.execute(insert(Climate), rows)
+    return len(rows)
+
+
+@dataclass
+class DayOutlook:
+    """Expected weather for one trip day, from a forecast or the normals."""
+    date: date
+    source: str  # "forecast" or "climatology"
+    bad_weather_probability: float
+    min_temp: Optional[float] = None
+    max_temp: Optional[float] = None
+
+    @property
+    def bad_weather(self) -> bool:
+        return self.bad_weather_probability >= BAD_WEATHER_THRESHOLD
+
+
+def climatology_for(
+    db: Session, city_ids: List[int], weeks: Iterable[int]
+) -> List[models.WeatherClimatology]:
+    """Normals for ``city_ids`` x ``weeks`` in one primary-key lookup."""
+    Climate = models.WeatherClimatology
+    return (
+        db.query(Climate)
+        .filter(Climate.city_id.in_(city_ids), Climate.week.in_(set(weeks)))
+        .order_by(Climate.city_id, Climate.week)
+        .all()
+    )
+
+
+def _mean(values: List[Optional[float]]) -> Optional[float]:
+    values = [v for v in values if v is not None]
+    return round(sum(values) / len(values), 2) if values else None
+
+
+def trip_outlook(
+    db: Session, city_ids: List[int], start_date: date, end_date: date
+) -> Dict[date, DayOutlook]:
+    """
+    Outlook per trip day, averaged over the trip's cities: forecasts where
+    weather rows exist, climatology for the remaining days. Days with neither
+    are left out.
+    """
+    if not city_ids or end_date < start_date:
+        return {}
+    days = [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)]
+
+    forecasts: Dict[date, List[models.Weather]] = {}
+    for weather in (
+        db.query(models.Weather)
+        .filter(
+            models.Weather.city_id.in_(city_ids),
+            models.Weather.date >= start_date,
+            models.Weather.date <= end_date,
+        )
+        .all()
+    ):
+        forecasts.setdefault(weather.date, []).append(weather)
+
+    normals: Dict[int, List[models.WeatherClimatology]] = {}
+    missing = [d for d in days if d not in forecasts]
+    if missing:
+        for normal in climatology_for(db, city_ids, (week_of_year(d) for d in missing)):
+            normals.setdefault(normal.week, []).append(normal)
+
+    outlook: Dict[date, DayOutlook] = {}
+    for day in days:
+        if day in forecasts:
+            readings = forecasts[day]
+            ranges = [temperature_range(w.temperature) for w in readings]
+            outlook[day] = DayOutlook(
+                date=day,
+                source="forecast",
+                bad_weather_probability=sum(is_bad_conditions(w.conditions) for w in readings)
+                / len(readings),
+                min_temp=_mean([low for low, _ in ranges]),
+                max_temp=_mean([high for _, high in ranges]),
+            )
+        elif week_of_year(day) in normals:
+            rows = normals[week_of_year(day)]
+            outlook[day] = DayOutlook(
+                date=day,
+                source="climatology",
+                bad_weather_probability=sum(r.bad_weather_probability for r in rows) / len(rows),
+                min_temp=_mean([r.mean_min_temp for r in rows]),
+                max_temp=_mean([r.mean_max_temp for r in rows]),
+            )
+    return outlook
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -9,11 +10,55 @@ class Settings:
 
     def __init__(self) -> None:
         self.database_url: str | None = os.getenv("DATABASE_URL")
+        # Optional read replica for GET endpoints; falls back to the primary.
+        # Locally, a second database (e.g. another SQLite file) can stand in.
+        self.database_read_url: str | None = os.getenv("DATABASE_READ_URL") or None
+        # Connection pool tuning (ignored for SQLite)
+        self.db_pool_size: int = int(os.getenv("DB_POOL_SIZE", "5"))
+        self.db_max_overflow: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+        self.db_pool_recycle: int = int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800"))
+        self.db_pool_timeout: int = int(os.getenv("DB_POOL_TIMEOUT_SECONDS", "30"))
+        # Server-side statement timeout for PostgreSQL, 0 disables it
+        self.db_statement_timeout_ms: int = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))
         self.secret_key: str = os.getenv("SECRET_KEY", "change-me")
         self.algorithm: str = os.getenv("ALGORITHM", "HS256")
         self.access_token_expire_minutes: int = int(
             os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "60")
         )
+        # Authenticated-user cache (0 disables either)
+        self.auth_cache_ttl_seconds: float = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+        self.auth_cache_max_entries: int = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000"))
+        # Password hashing pool (0 workers hashes inline); 0 rounds keeps passlib's default
+        self.password_hash_workers: int = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+        self.password_hash_max_pending: int = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "16"))
+        self.password_hash_queue_timeout: float = float(
+            os.getenv("PASSWORD_HASH_QUEUE_TIMEOUT_SECONDS", "5")
+        )
+        self.password_hash_rounds: int = int(os.getenv("PASSWORD_HASH_ROUNDS", "0"))
+        # Admission control for the itinerary planners, per route and worker
+        # (see app/admission.py); 0 max-per-user disables the per-user cap
+        self.plan_max_concurrent: int = int(os.getenv("PLAN_MAX_CONCURRENT", "4"))
+        self.plan_max_queue: int = int(os.getenv("PLAN_MAX_QUEUE", "16"))
+        self.plan_max_per_user: int = int(os.getenv("PLAN_MAX_PER_USER", "2"))
+        self.plan_queue_timeout: float = float(os.getenv("PLAN_QUEUE_TIMEOUT_SECONDS", "10"))
+        # Planning deadline: default and the most a client may ask for (?timeout=)
+        self.plan_timeout: float = float(os.getenv("PLAN_TIMEOUT_SECONDS", "10"))
+        self.plan_max_timeout: float = float(os.getenv("PLAN_MAX_TIMEOUT_SECONDS", "60"))
+        # Cache-Control max-age for catalog GETs (cities, places, weather, categories)
+        self.catalog_cache_max_age: int = int(os.getenv("CATALOG_CACHE_MAX_AGE", "60"))
+        # How often each worker re-reads the shared catalog_versions table
+        self.catalog_versions_refresh_seconds: float = float(
+            os.getenv("CATALOG_VERSIONS_REFRESH_SECONDS", "5")
+        )
+        # In-process catalog cache and its cross-worker invalidation bus:
+        # auto (postgres on PostgreSQL, else local), postgres, file or local
+        self.catalog_cache_ttl_seconds: float = float(os.getenv("CATALOG_CACHE_TTL_SECONDS", "300"))
+        self.catalog_cache_max_entries: int = int(os.getenv("CATALOG_CACHE_MAX_ENTRIES", "1024"))
+        self.catalog_bus: str = os.getenv("CATALOG_BUS", "auto")
+        self.catalog_bus_file: str = os.getenv(
+            "CATALOG_BUS_FILE", os.path.join(tempfile.gettempdir(), "travel-planner-catalog.json")
+        )
+        self.catalog_bus_poll_seconds: float = float(os.getenv("CATALOG_BUS_POLL_SECONDS", "1"))
 
         if not self.database_url:
             raise ValueError(
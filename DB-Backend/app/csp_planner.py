@@ -1,12 +1,16 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import date, timedelta, datetime, time
-from typing import List, Optional
+from time import monotonic
+from typing import Callable, List, Optional
 
+import numpy as np
 from sqlalchemy.orm import Session
 
 from . import models
+from .climatology import trip_outlook
+from .plan_scoring import candidate_vectors
 
 
 @dataclass
@@ -21,6 +25,46 @@ class PlanningRequest:
     max_places_per_day: int = 3
 
 
+class PlanningCancelled(Exception):
+    """The client went away; nothing of the plan should be written."""
+
+
+# Seconds between client-disconnect checks (each one is a hop to the event loop)
+CANCEL_CHECK_INTERVAL = 0.05
+
+
+@dataclass
+class PlanningDeadline:
+    """
+    Cooperative time limit for one planning run. The planner calls
+    ``expired()`` inside its loops and stops with what it has so far;
+    ``is_cancelled`` (e.g. "has the HTTP client disconnected?") is polled
+    at most every CANCEL_CHECK_INTERVAL seconds and raises PlanningCancelled.
+    """
+    expires_at: float  # time.monotonic()
+    is_cancelled: Callable[[], bool] = lambda: False
+    hit: bool = False  # planning stopped at the deadline
+    _next_cancel_check: float = field(default=0.0, repr=False)
+
+    @classmethod
+    def after(cls, seconds: float, is_cancelled: Optional[Callable[[], bool]] = None) -> "PlanningDeadline":
+        return cls(monotonic() + seconds, is_cancelled or (lambda: False))
+
+    def check_cancelled(self) -> None:
+        """Raise PlanningCancelled if the caller has given up (always polls)."""
+        self._next_cancel_check = monotonic() + CANCEL_CHECK_INTERVAL
+        if self.is_cancelled():
+            raise PlanningCancelled()
+
+    def expired(self) -> bool:
+        now = monotonic()
+        if now >= self._next_cancel_check:
+            self.check_cancelled()
+        if now >= self.expires_at:
+            self.hit = True
+        return self.hit
+
+
 @dataclass
 class PlannedActivity:
     day_no: int
@@ -41,8 +85,9 @@ def _available_places_for_cities(db: Session, city_ids: List[int]) -> List[model
 
 
 def _estimate_place_cost(place: models.Place) -> float:
-    # In a real app, this might come from DB or category average
-    # For now, return a random value between 500 and 5000
+    if place.entry_fee:
+        return float(place.entry_fee)
+    # No imported cost: return a random value between 500 and 5000
     import random
     return float(random.randint(500, 5000))
 
@@ -67,6 +112,22 @@ def _get_place_duration(place: models.Place) -> float:
     return base
 
 
+def _is_indoor(place: models.Place) -> bool:
+    """Category heuristic for places that work on a rainy day."""
+    cat = (place.category or "").lower()
+    return any(word in cat for word in ("museum", "gallery", "restaurant", "food", "cafe", "shopping", "mall"))
+
+
+def _minutes(time_str: str) -> float:
+    """Minutes since midnight of a time string (HH:MM)."""
+    t = datetime.strptime(time_str, "%H:%M")
+    return t.hour * 60 + t.minute
+
+
+def _clock(minutes: float) -> str:
+    return add_minutes("00:00", minutes)
+
+
 def add_minutes(time_str: str, minutes: float) -> str:
     """Add minutes to a time string (HH:MM)."""
     t = datetime.strptime(time_str, "%H:%M")
@@ -75,7 +136,7 @@ def add_minutes(time_str: str, minutes: float) -> str:
 
 
 def build_itinerary_plan(
-    db: Session, request: PlanningRequest
+    db: Session, request: PlanningRequest, deadline: Optional[PlanningDeadline] = None
 ) -> List[PlannedActivity]:
     """
     Enhanced CSP-style planner with time scheduling:
@@ -86,6 +147,17 @@ def build_itinerary_plan(
         * avoid repeating the same place
         * keep approximate daily cost under daily_budget
         * time scheduling with travel buffers
+        * every activity ends by 22:00
+    - objective: total utility (app.plan_scoring): review ratings and the
+      user's category preferences, minus penalties for repeating a
+      category and for travel from the previous stop. Each slot takes the
+      highest-scoring feasible candidate among the places nearest the
+      previous stop (all of them for a day's first slot); on days the
+      weather outlook marks as likely bad, indoor places while any remain.
+
+    With a ``deadline`` the search stops when it expires and returns the
+    activities placed so far (``deadline.hit`` is set); PlanningCancelled
+    propagates if the caller goes away.
     """
     all_places = _available_places_for_cities(db, request.city_ids)
     
@@ -99,35 +171,56 @@ def build_itinerary_plan(
         return []
 
     total_days = (request.end_date - request.start_date).days + 1
+    outlook = trip_outlook(db, request.city_ids, request.start_date, request.end_date)
+    candidates = candidate_vectors(
+        db,
+        places,
+        request.user_id,
+        costs=[_estimate_place_cost(p) for p in places],
+        durations=[_get_place_duration(p) * 60 for p in places],
+        indoor=[_is_indoor(p) for p in places],
+    )
+    used = np.zeros(len(candidates), dtype=bool)
+    trip_categories = np.zeros(candidates.category_count)
     activities: List[PlannedActivity] = []
-    used_place_ids: set[int] = set()
 
     # Travel buffer in minutes
     TRAVEL_BUFFER = 30
+    # Activities must end by 10 PM
+    DAY_END = _minutes("22:00")
 
     for day in range(1, total_days + 1):
+        if deadline is not None and deadline.expired():
+            break
         remaining_budget = request.daily_budget or float("inf")
         day_count = 0
-        current_time_str = request.daily_start_time
+        current_minute = _minutes(request.daily_start_time)
+        day_outlook = outlook.get(request.start_date + timedelta(days=day - 1))
+        bad_weather = day_outlook is not None and day_outlook.bad_weather
+        day_categories = np.zeros(candidates.category_count)
+        previous: Optional[int] = None
 
-        for place in places:
-            if day_count >= request.max_places_per_day:
+        while day_count < request.max_places_per_day:
+            if deadline is not None and deadline.expired():
+                break
+            feasible = (
+                ~used
+                & (candidates.costs <= remaining_budget)
+                & (current_minute + candidates.durations <= DAY_END)
+            )
+            if not feasible.any():
                 break
-            if place.place_id in used_place_ids:
-                continue
-            
-            cost = _estimate_place_cost(place)
-            if cost > remaining_budget:
-                continue
+            index, scores = candidates.slot_scores(
+                day_categories, trip_categories, previous, bad_weather, feasible
+            )
+            best = int(index[np.argmax(scores)])
+            place = candidates.places[best]
+            cost = float(candidates.costs[best])
 
             # Calculate times
-            duration_hours = _get_place_duration(place)
-            start_time = current_time_str
-            end_time = add_minutes(start_time, duration_hours * 60)
-            
-            # Check if end time is too late (e.g., after 10 PM)
-            if end_time > "22:00":
-                break
+            start_time = _clock(current_minute)
+            end_minute = current_minute + candidates.durations[best]
+            end_time = _clock(end_minute)
 
             activities.append(
                 PlannedActivity(
@@ -135,16 +228,20 @@ def build_itinerary_plan(
                     place_id=place.place_id,
                     start_time=start_time,
                     end_time=end_time,
-                    notes=f"Visit {place.place_name}",
+                    notes=f"Visit {place.place_name}"
+                    + (" (bad weather likely)" if bad_weather and not candidates.indoor[best] else ""),
                     cost=cost,
                 )
             )
-            used_place_ids.add(place.place_id)
+            used[best] = True
+            day_categories[candidates.category_index[best]] += 1
+            trip_categories[candidates.category_index[best]] += 1
             remaining_budget -= cost
             day_count += 1
-            
+            previous = best
+
             # Update current time for next activity (end time + buffer)
-            current_time_str = add_minutes(end_time, TRAVEL_BUFFER)
+            current_minute = end_minute + TRAVEL_BUFFER
 
     return activities
 
@@ -1,11 +1,106 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 from .config import settings
 
+# Async drivers for each backend we run on: asyncpg for Neon/PostgreSQL,
+# aiosqlite for local testing.
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+# Dialects with INSERT ... ON CONFLICT DO UPDATE
+UPSERT_INSERTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+
+def upsert_insert(dialect_name: str, table):
+    """INSERT for ``table`` that supports ``on_conflict_do_update`` on this dialect."""
+    if dialect_name not in UPSERT_INSERTS:
+        raise ValueError(f"Upserts are not supported on '{dialect_name}' databases")
+    return UPSERT_INSERTS[dialect_name](table)
+
+
+def to_async_url(database_url: str) -> str:
+    """Rewrite a sync database URL for its async driver.
+
+    asyncpg does not understand libpq's ``sslmode``/``channel_binding``
+    parameters, so ``sslmode`` is translated to asyncpg's ``ssl``.
+    """
+    url = make_url(database_url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for '{backend}' databases")
+    url = url.set(drivername=ASYNC_DRIVERS[backend])
+    if backend == "postgresql":
+        sslmode = url.query.get("sslmode")
+        url = url.difference_update_query(["sslmode", "channel_binding"])
+        if sslmode:
+            url = url.update_query_dict({"ssl": sslmode})
+    return url.render_as_string(hide_password=False)
+
+
+def engine_options(database_url: str, async_driver: bool = False) -> dict:
+    """Pool and connection settings for an engine on ``database_url``."""
+    options: dict = {"pool_pre_ping": True}
+    if make_url(database_url).get_backend_name() != "postgresql":
+        return options
+    options.update(
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_recycle=settings.db_pool_recycle,
+        pool_timeout=settings.db_pool_timeout,
+    )
+    timeout = settings.db_statement_timeout_ms
+    if timeout > 0:
+        if async_driver:
+            options["connect_args"] = {"server_settings": {"statement_timeout": str(timeout)}}
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={timeout}"}
+    return options
+
+
+def _enable_sqlite_foreign_keys(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
+def _apply_backend_settings(sync_engine) -> None:
+    # SQLite ignores ON DELETE rules unless asked; bulk DELETEs rely on them.
+    if sync_engine.dialect.name == "sqlite":
+        event.listen(sync_engine, "connect", _enable_sqlite_foreign_keys)
+
+
 # IMPORTANT for Neon: ?sslmode=require must be in your URL
 try:
-    engine = create_engine(settings.database_url, pool_pre_ping=True)
+    engine = create_engine(settings.database_url, **engine_options(settings.database_url))
+    async_engine = create_async_engine(
+        to_async_url(settings.database_url),
+        **engine_options(settings.database_url, async_driver=True),
+    )
     print(f"Database connection configured: {settings.database_url[:50]}...")
+    # Read-only routes go to the replica when one is configured; otherwise
+    # they share the primary engine (and its pool).
+    if settings.database_read_url:
+        read_engine = create_engine(
+            settings.database_read_url, **engine_options(settings.database_read_url)
+        )
+        async_read_engine = create_async_engine(
+            to_async_url(settings.database_read_url),
+            **engine_options(settings.database_read_url, async_driver=True),
+        )
+        print(f"Read replica configured: {settings.database_read_url[:50]}...")
+    else:
+        read_engine = engine
+        async_read_engine = async_engine
+    for configured in {engine, async_engine.sync_engine, read_engine, async_read_engine.sync_engine}:
+        _apply_backend_settings(configured)
 except Exception as e:
     print(f"ERROR: Failed to create database engine: {e}")
     raise
@@ -16,7 +111,26 @@ SessionLocal = sessionmaker(
     bind=engine
 )
 
+ReadSessionLocal = sessionmaker(
+    autocommit=False,
+    autoflush=False,
+    bind=read_engine
+)
+
+# expire_on_commit=False: attributes cannot be lazily reloaded on an async
+# session, so objects must stay usable for serialization after commit.
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+AsyncReadSessionLocal = async_sessionmaker(
+    bind=async_read_engine,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
 Base = declarative_base()
 
 print("Database module loaded successfully")
-
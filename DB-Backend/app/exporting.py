@@ -0,0 +1,110 @@
+"""Streaming NDJSON/CSV exports for the large list endpoints.
+
+Exports run on their own read connection with a server-side cursor and
+serialize Core result rows batch by batch, so memory use does not depend
+on how many rows are exported.
+"""
+import csv
+import io
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+from enum import Enum
+from typing import Any, AsyncIterator, Callable, Iterator, Sequence
+
+from fastapi.responses import StreamingResponse
+
+from .database import async_read_engine, read_engine
+
+EXPORT_BATCH_SIZE = 1000
+
+
+class ExportFormat(str, Enum):
+    ndjson = "ndjson"
+    csv = "csv"
+
+
+MEDIA_TYPES = {
+    ExportFormat.ndjson: "application/x-ndjson",
+    ExportFormat.csv: "text/csv",
+}
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, (date, time, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _csv_value(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=_json_default)
+    if isinstance(value, (date, time, datetime)):
+        return value.isoformat()
+    return value
+
+
+def _serializer(fmt: ExportFormat, keys: Sequence[str]) -> Callable[[Sequence[Sequence[Any]]], str]:
+    if fmt == ExportFormat.ndjson:
+        def encode(rows):
+            return "".join(
+                json.dumps(dict(zip(keys, row)), default=_json_default) + "\n" for row in rows
+            )
+        return encode
+
+    def encode(rows):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerows([_csv_value(v) for v in row] for row in rows)
+        return buffer.getvalue()
+    return encode
+
+
+def _header(fmt: ExportFormat, keys: Sequence[str]) -> str:
+    if fmt != ExportFormat.csv:
+        return ""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(keys)
+    return buffer.getvalue()
+
+
+def _response(body, fmt: ExportFormat, name: str) -> StreamingResponse:
+    return StreamingResponse(
+        body,
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{fmt.value}"'},
+    )
+
+
+def stream_export(stmt, fmt: ExportFormat, name: str) -> StreamingResponse:
+    """Stream ``stmt`` from the read engine (for sync routes)."""
+    def body() -> Iterator[str]:
+        with read_engine.connect() as conn:
+            result = conn.execution_options(
+                stream_results=True, yield_per=EXPORT_BATCH_SIZE
+            ).execute(stmt)
+            keys = list(result.keys())
+            encode = _serializer(fmt, keys)
+            yield _header(fmt, keys)
+            for rows in result.partitions():
+                yield encode(rows)
+
+    return _response(body(), fmt, name)
+
+
+def stream_export_async(stmt, fmt: ExportFormat, name: str) -> StreamingResponse:
+    """Stream ``stmt`` from the async read engine (for async routes)."""
+    async def body() -> AsyncIterator[str]:
+        async with async_read_engine.connect() as conn:
+            result = await conn.stream(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+            keys = list(result.keys())
+            encode = _serializer(fmt, keys)
+            yield _header(fmt, keys)
+            async for rows in result.partitions():
+                yield encode(rows)
+
+    return _response(body(), fmt, name)
@@ -0,0 +1,181 @@
+"""Nearest-place lookups over place coordinates.
+
+Coordinates live in ``places.latitude`` / ``places.longitude`` (extracted
+from the ``location`` JSON on write, see ``coordinates``). ``PlaceGrid``
+buckets them into a uniform lat/lon grid sized for a handful of places per
+cell; a k-nearest query searches rings of cells outward from the query
+point and stops as soon as no unvisited cell can hold anything closer, so
+its cost depends on the local density and ``k``, not on the catalog size.
+
+The API keeps one grid per worker in ``app.catalog`` (rebuilt after place
+writes); the planner builds a small one over the trip's candidate places
+and scores only the nearest few for each stop after the first of a day.
+"""
+from __future__ import annotations
+
+import math
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import models
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+# Average number of places per grid cell
+TARGET_CELL_OCCUPANCY = 8
+MIN_CELL_DEGREES = 0.005  # ~500 m
+MAX_CELL_DEGREES = 5.0
+
+_LAT_KEYS = ("lat", "latitude")
+_LON_KEYS = ("lon", "lng", "long", "longitude")
+
+
+def coordinates(location) -> Tuple[Optional[float], Optional[float]]:
+    """(lat, lon) from a location JSON object, or (None, None) if absent or invalid."""
+    if not isinstance(location, dict):
+        return None, None
+    lat = next((location[k] for k in _LAT_KEYS if location.get(k) is not None), None)
+    lon = next((location[k] for k in _LON_KEYS if location.get(k) is not None), None)
+    try:
+        lat, lon = float(lat), float(lon)
+    except (TypeError, ValueError):
+        return None, None
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return None, None
+    return lat, lon
+
+
+def haversine_km(lat: float, lon: float, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """Great-circle distances from one point to many, in kilometres."""
+    lat1, lon1 = math.radians(lat), math.radians(lon)
+    lat2, lon2 = np.radians(lats), np.radians(lons)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+class PlaceGrid:
+    """Uniform lat/lon grid over (place_id, lat, lon) points."""
+
+    def __init__(self, points: Iterable[Tuple[int, float, float]]) -> None:
+        points = list(points)
+        self.ids = np.array([p[0] for p in points], dtype=np.int64)
+        self.lats = np.array([p[1] for p in points], dtype=np.float64)
+        self.lons = np.array([p[2] for p in points], dtype=np.float64)
+        self.cells: Dict[Tuple[int, int], np.ndarray] = {}
+        self.categories: Dict[int, Optional[str]] = {}  # filled by load_place_grid
+        if not points:
+            self.cell_degrees = MAX_CELL_DEGREES
+            self._max_ring = 0
+            return
+
+        lat_span = float(self.lats.max() - self.lats.min()) or MIN_CELL_DEGREES
+        lon_span = float(self.lons.max() - self.lons.min()) or MIN_CELL_DEGREES
+        size = math.sqrt(lat_span * lon_span * TARGET_CELL_OCCUPANCY / len(points))
+        self.cell_degrees = min(max(size, MIN_CELL_DEGREES), MAX_CELL_DEGREES)
+
+        rows = np.floor(self.lats / self.cell_degrees).astype(np.int64)
+        cols = np.floor(self.lons / self.cell_degrees).astype(np.int64)
+        order = np.lexsort((cols, rows))
+        keys = np.stack([rows[order], cols[order]], axis=1)
+        starts = np.flatnonzero(np.any(np.diff(keys, axis=0) != 0, axis=1)) + 1
+        for chunk in np.split(order, starts):
+            self.cells[(int(rows[chunk[0]]), int(cols[chunk[0]]))] = chunk
+        self._row_range = (int(rows.min()), int(rows.max()))
+        self._col_range = (int(cols.min()), int(cols.max()))
+        self._max_ring = max(
+            self._row_range[1] - self._row_range[0], self._col_range[1] - self._col_range[0]
+        ) + 1
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return math.floor(lat / self.cell_degrees), math.floor(lon / self.cell_degrees)
+
+    def _ring(self, row: int, col: int, ring: int) -> List[np.ndarray]:
+        if ring == 0:
+            found = self.cells.get((row, col))
+            return [found] if found is not None else []
+        found = []
+        (row_lo, row_hi), (col_lo, col_hi) = self._row_range, self._col_range
+        for r in range(max(row - ring, row_lo), min(row + ring, row_hi) + 1):
+            if r in (row - ring, row + ring):
+                columns = range(max(col - ring, col_lo), min(col + ring, col_hi) + 1)
+            else:
+                columns = (col - ring, col + ring)
+            for c in columns:
+                cell = self.cells.get((r, c))
+                if cell is not None:
+                    found.append(cell)
+        return found
+
+    def _ring_clearance_km(self, lat: float, ring: int) -> float:
+        """Lower bound on the distance to any point outside rings 0..``ring``."""
+        # Longitude degrees shrink towards the poles; use the narrowest row reached
+        edge_lat = min(abs(lat) + (ring + 1) * self.cell_degrees, 89.0)
+        return ring * self.cell_degrees * KM_PER_DEGREE * math.cos(math.radians(edge_lat))
+
+    def nearest(
+        self,
+        lat: float,
+        lon: float,
+        k: int,
+        radius_km: Optional[float] = None,
+        accept: Optional[Callable[[int], bool]] = None,
+    ) -> List[Tuple[int, float]]:
+        """Up to ``k`` (place_id, distance_km) closest to (lat, lon), nearest first.
+
+        ``accept`` filters candidates by place id (e.g. already visited).
+        """
+        if not len(self.ids) or k <= 0:
+            return []
+        row, col = self._cell(lat, lon)
+        reach = max(
+            self._row_range[0] - row, row - self._row_range[1],
+            self._col_range[0] - col, col - self._col_range[1], 0,
+        )
+        best_ids = np.empty(0, dtype=np.int64)
+        best_dist = np.empty(0, dtype=np.float64)
+        # Rings closer than ``reach`` lie entirely outside the grid
+        for ring in range(reach, reach + self._max_ring + 1):
+            cells = self._ring(row, col, ring)
+            if cells:
+                idx = np.concatenate(cells)
+                if accept is not None:
+                    idx = idx[[accept(int(pid)) for pid in self.ids[idx]]]
+                if len(idx):
+                    dist = haversine_km(lat, lon, self.lats[idx], self.lons[idx])
+                    best_ids = np.concatenate([best_ids, self.ids[idx]])
+                    best_dist = np.concatenate([best_dist, dist])
+                    keep = np.argsort(best_dist, kind="stable")[:k]
+                    best_ids, best_dist = best_ids[keep], best_dist[keep]
+            clearance = self._ring_clearance_km(lat, ring)
+            if radius_km is not None and clearance > radius_km:
+                break
+            if len(best_ids) >= k and best_dist[-1] <= clearance:
+                break
+        if radius_km is not None:
+            within = best_dist <= radius_km
+            best_ids, best_dist = best_ids[within], best_dist[within]
+        return [(int(pid), float(d)) for pid, d in zip(best_ids, best_dist)]
+
+
+def _build_grid(rows) -> PlaceGrid:
+    grid = PlaceGrid((row.place_id, row.latitude, row.longitude) for row in rows)
+    grid.categories = {row.place_id: row.category for row in rows}
+    return grid
+
+
+async def load_place_grid(db: AsyncSession) -> PlaceGrid:
+    Place = models.Place
+    result = await db.execute(
+        select(Place.place_id, Place.latitude, Place.longitude, Place.category).where(
+            Place.latitude.isnot(None), Place.longitude.isnot(None)
+        )
+    )
+    # Bucketing every place is CPU work; keep it off the event loop
+    return await run_in_threadpool(_build_grid, result.all())
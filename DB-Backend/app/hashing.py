@@ -0,0 +1,99 @@
+"""Password hashing off the event loop and the API worker threads.
+
+pbkdf2_sha256 is deliberately CPU-heavy, so hashes and verifications run
+in a small process pool and are awaited from async routes. At most
+``PASSWORD_HASH_MAX_PENDING`` operations may be queued or running; a
+caller waits for a slot on the event loop, holding no thread, and gets a
+503 if none frees up within ``PASSWORD_HASH_QUEUE_TIMEOUT_SECONDS``.
+Workers are spawned, so scripts that hash passwords need an
+``if __name__ == "__main__"`` guard or ``PASSWORD_HASH_WORKERS=0``, which
+hashes on the loop's default thread pool instead.
+"""
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+from .config import settings
+
+
+def _build_context() -> CryptContext:
+    options = {}
+    if settings.password_hash_rounds:
+        # min_rounds makes older, weaker hashes "need update" on next login
+        options["pbkdf2_sha256__default_rounds"] = settings.password_hash_rounds
+        options["pbkdf2_sha256__min_rounds"] = settings.password_hash_rounds
+    return CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto", **options)
+
+
+pwd_context = _build_context()
+
+
+# Module-level so they can be pickled into the worker processes.
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify_and_update(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    return pwd_context.verify_and_update(password, hashed)
+
+
+class PasswordHasher:
+    def __init__(self, workers: int, max_pending: int, queue_timeout: float) -> None:
+        self.workers = workers
+        self.max_pending = max(max_pending, 1)
+        self.queue_timeout = queue_timeout
+        # Created on first use, inside the event loop that serves requests
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn: never fork a process that holds DB connections and threads
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    async def _run(self, fn, *args):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_pending)
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many concurrent sign-ins, please retry shortly",
+                headers={"Retry-After": str(max(int(self.queue_timeout), 1))},
+            )
+        try:
+            pool = self._pool() if self.workers > 0 else None
+            return await asyncio.get_running_loop().run_in_executor(pool, fn, *args)
+        finally:
+            self._slots.release()
+
+    async def hash(self, password: str) -> str:
+        return await self._run(_hash, password)
+
+    async def verify_and_update(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        """(valid, new_hash); new_hash is set when the stored hash uses outdated parameters."""
+        return await self._run(_verify_and_update, password, hashed)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+
+password_hasher = PasswordHasher(
+    workers=settings.password_hash_workers,
+    max_pending=settings.password_hash_max_pending,
+    queue_timeout=settings.password_hash_queue_timeout,
+)
@@ -0,0 +1,141 @@
+"""HTTP conditional-request helpers (ETag / If-None-Match / If-Modified-Since).
+
+Catalog endpoints (cities, places, weather, categories) validate requests
+against per-table version counters instead of the response body, and a
+matching ``If-None-Match`` is answered with 304 before any query runs.
+
+The counters live in the ``catalog_versions`` table, so every worker (and
+every restart) hands out the same validators. Writers bump them through
+``catalog.changed`` in ``app.catalog``, which also covers the import and
+ingest scripts; each worker re-reads the table when the catalog bus reports
+a change and at least every ``CATALOG_VERSIONS_REFRESH_SECONDS``.
+
+Writes that bypass ``catalog.changed`` (manual SQL) bump nothing, so
+validators are also only valid for one ``CATALOG_CACHE_TTL_SECONDS``
+window: after it ends every client refetches once. That is the same
+staleness bound as the in-process catalog cache.
+"""
+import hashlib
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException, Request, Response
+
+from . import models
+from .config import settings
+from .database import SessionLocal, upsert_insert
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [tag.strip() for tag in header.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+class TableVersions:
+    """Local snapshot of the shared version counter and last-modified time per table."""
+
+    def __init__(self, refresh_seconds: float) -> None:
+        self.refresh_seconds = refresh_seconds
+        self._versions: Dict[str, int] = {}
+        self._modified: Dict[str, datetime] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def refresh(self) -> None:
+        """Re-read the shared counters before the next validators are built."""
+        with self._lock:
+            self._loaded_at = None
+
+    def bump(self, *tables: str) -> None:
+        """Record a committed write to ``tables`` for every worker."""
+        table = models.CatalogVersion.__table__
+        now = datetime.utcnow()
+        with SessionLocal() as db:
+            dialect = db.get_bind().dialect.name
+            for name in tables:
+                stmt = upsert_insert(dialect, table).values(table_name=name, version=1, modified_at=now)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=["table_name"],
+                    set_={"version": table.c.version + 1, "modified_at": stmt.excluded.modified_at},
+                )
+                db.execute(stmt)
+            db.commit()
+        self.refresh()
+
+    def _load(self) -> None:
+        Version = models.CatalogVersion
+        with SessionLocal() as db:
+            rows = db.query(Version.table_name, Version.version, Version.modified_at).all()
+        self._versions = {name: version for name, version, _ in rows}
+        # Stored as naive UTC; HTTP dates have one-second resolution
+        self._modified = {
+            name: modified.replace(tzinfo=timezone.utc, microsecond=0) for name, _, modified in rows
+        }
+
+    def _ensure_loaded(self) -> None:
+        now = time.monotonic()
+        if self._loaded_at is not None and now - self._loaded_at < self.refresh_seconds:
+            return
+        try:
+            self._load()
+        except Exception as e:
+            # Keep the last snapshot; the TTL window still bounds staleness
+            print(f"HTTP cache: could not read catalog versions: {e}")
+        self._loaded_at = now
+
+    def validators(self, tables: Tuple[str, ...], variant: str) -> Tuple[str, datetime]:
+        """(ETag, Last-Modified) for a response built from ``tables``."""
+        window_seconds = max(int(settings.catalog_cache_ttl_seconds), 1)
+        window = int(time.time()) // window_seconds
+        window_start = datetime.fromtimestamp(window * window_seconds, timezone.utc)
+        with self._lock:
+            self._ensure_loaded()
+            versions = ",".join(f"{t}:{self._versions.get(t, 0)}" for t in tables)
+            modified = max(self._modified.get(t, window_start) for t in tables)
+        digest = hashlib.sha256(f"{window}|{versions}|{variant}".encode()).hexdigest()
+        return '"' + digest[:32] + '"', max(modified, window_start)
+
+
+table_versions = TableVersions(settings.catalog_versions_refresh_seconds)
+
+
+def _not_modified_since(request: Request, last_modified: datetime) -> bool:
+    header = request.headers.get("if-modified-since")
+    if not header or request.headers.get("if-none-match"):
+        return False  # If-None-Match takes precedence when both are sent
+    try:
+        since = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return last_modified <= since
+
+
+def catalog_cache(*tables: str) -> Callable[[Request, Response], Dict[str, str]]:
+    """
+    Dependency for GET routes whose response depends only on ``tables`` and
+    the URL. Raises 304 when the client's copy is current; otherwise sets
+    ETag, Last-Modified and Cache-Control on the response and returns them
+    (for routes that build their own Response object).
+    """
+    def dependency(request: Request, response: Response) -> Dict[str, str]:
+        variant = f"{request.url.path}?{request.url.query}"
+        etag, last_modified = table_versions.validators(tables, variant)
+        headers = {
+            "ETag": etag,
+            "Last-Modified": format_datetime(last_modified, usegmt=True),
+            "Cache-Control": f"public, max-age={settings.catalog_cache_max_age}",
+        }
+        if etag_matches(request, etag) or _not_modified_since(request, last_modified):
+            raise HTTPException(status_code=304, headers=headers)
+        response.headers.update(headers)
+        return headers
+
+    return dependency
@@ -1,15 +1,20 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, Depends
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 
 from .database import Base, engine
 from .auth import get_db
+from .catalog import catalog
+from .pagination import NEXT_CURSOR_HEADER
 from .routers import (
     activities,
     auth_routes,
     cities,
     expenses,
     itineraries,
+    metrics,
     places,
     recommendations,
     reviews,
@@ -17,7 +22,15 @@ from .routers import (
     weather,
 )
 
-app = FastAPI(title="Travel Planner API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Listen for catalog changes made by other workers
+    catalog.start()
+    yield
+    catalog.stop()
+
+
+app = FastAPI(title="Travel Planner API", lifespan=lifespan)
 
 # Global exception handler to catch all unhandled errors
 @app.exception_handler(Exception)
@@ -61,6 +74,7 @@ app.add_middleware(
     allow_credentials=False,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 # IMPORTANT: Create all tables in Neon
@@ -81,3 +95,4 @@ app.include_router(reviews.router)
 app.include_router(expenses.router)
 app.include_router(weather.router)
 app.include_router(recommendations.router)
+app.include_router(metrics.router)
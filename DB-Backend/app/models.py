@@ -1,4 +1,6 @@
-from sqlalchemy import Column, Integer, String, Text, Date, Numeric, ForeignKey, Table, Time, DateTime, JSON
+from sqlalchemy import Column, Integer, String, Text, Date, Numeric, ForeignKey, Table, Time, DateTime, JSON, Float, Index, UniqueConstraint
+from sqlalchemy import func, text
+from sqlalchemy.dialects import postgresql  # noqa: F401  (typed to_tsvector/to_tsquery)
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from .database import Base
@@ -25,8 +27,20 @@ class User(Base):
 
     itineraries = relationship("Itinerary", back_populates="owner", cascade="all, delete")
     reviews = relationship("Review", back_populates="author", cascade="all, delete")
+    preferences = relationship("UserPreference", cascade="all, delete")
 
 
+class UserPreference(Base):
+    """Free-form user settings; "category:<name>" keys weight the planner (app/plan_scoring.py)."""
+    __tablename__ = "user_preferences"
+    preference_id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.user_id", ondelete="CASCADE"))
+    preference_key = Column(String(100), nullable=False)
+    preference_value = Column(String(255))
+    weight = Column(Integer, default=1)  # Importance 1-10
+
+    __table_args__ = (UniqueConstraint("user_id", "preference_key"),)
+
 
 class Itinerary(Base):
     __tablename__ = "itineraries"
@@ -44,6 +58,11 @@ class Itinerary(Base):
     activities = relationship("Activity", back_populates="itinerary")
     expenses = relationship("Expense", back_populates="itinerary")
 
+    __table_args__ = (
+        Index("idx_itineraries_user_start", "user_id", "start_date", "itinerary_id"),
+        Index("idx_itineraries_start", "start_date", "itinerary_id"),
+    )
+
 class City(Base):
     __tablename__ = "cities"
     city_id = Column(Integer, primary_key=True, index=True)
@@ -55,6 +74,10 @@ class City(Base):
     weather = relationship("Weather", back_populates="city")
     itineraries = relationship("Itinerary", secondary=itinerary_cities, back_populates="cities")
 
+    __table_args__ = (
+        Index("idx_cities_name", "name", "city_id"),
+    )
+
 class Place(Base):
     __tablename__ = "places"
     place_id = Column(Integer, primary_key=True, index=True)
@@ -64,11 +87,39 @@ class Place(Base):
     category = Column(String(100))
     location = Column(JSON)
     duration = Column(Numeric(4, 2), default=2.0)  # Duration in hours
+    entry_fee = Column(Numeric(10, 2))  # Per-person cost; NULL or 0 when unknown
+    # Copied from location on write (app.geo.coordinates) for the nearby index
+    latitude = Column(Float)
+    longitude = Column(Float)
 
     city = relationship("City", back_populates="places")
     activities = relationship("Activity", back_populates="place")
     reviews = relationship("Review", back_populates="place")
 
+    __table_args__ = (
+        Index("idx_places_city_name", "city_id", "place_name", "place_id"),
+        Index("idx_places_name", "place_name", "place_id"),
+    )
+
+def place_search_document():
+    """tsvector searched by /places/search on PostgreSQL; must match idx_places_search.
+
+    Constants are literal SQL (not bound parameters) so queries use the
+    same expression as the index.
+    """
+    columns, empty = Place.__table__.c, text("''")
+    document = (
+        func.coalesce(columns.place_name, empty)
+        .op("||")(text("' '"))
+        .op("||")(func.coalesce(columns.description, empty))
+    )
+    return func.to_tsvector(text("'simple'"), document)
+
+
+Index("idx_places_search", place_search_document(), postgresql_using="gin").ddl_if(
+    dialect="postgresql"
+)
+
 class Activity(Base):
     __tablename__ = "activities"
     activity_id = Column(Integer, primary_key=True, index=True)
@@ -83,6 +134,10 @@ class Activity(Base):
     itinerary = relationship("Itinerary", back_populates="activities")
     place = relationship("Place", back_populates="activities")
 
+    __table_args__ = (
+        Index("idx_activities_itinerary_day", "itinerary_id", "day_no", "start_time", "activity_id"),
+    )
+
 class Review(Base):
     __tablename__ = "reviews"
     review_id = Column(Integer, primary_key=True, index=True)
@@ -95,6 +150,45 @@ class Review(Base):
     author = relationship("User", back_populates="reviews")
     place = relationship("Place", back_populates="reviews")
 
+    __table_args__ = (
+        Index("idx_reviews_place_date", "place_id", "review_date", "review_id"),
+        Index("idx_reviews_user_date", "user_id", "review_date", "review_id"),
+        Index("idx_reviews_date", "review_date", "review_id"),
+    )
+
+
+# Review lists sort review_date DESC NULLS LAST; PostgreSQL needs indexes in
+# exactly that order (SQLite's DESC already puts NULLs last, so the ASC
+# indexes above serve it there)
+Index(
+    "idx_reviews_place_feed",
+    Review.place_id,
+    Review.review_date.desc().nulls_last(),
+    Review.review_id.desc(),
+).ddl_if(dialect="postgresql")
+Index(
+    "idx_reviews_user_feed",
+    Review.user_id,
+    Review.review_date.desc().nulls_last(),
+    Review.review_id.desc(),
+).ddl_if(dialect="postgresql")
+Index(
+    "idx_reviews_feed", Review.review_date.desc().nulls_last(), Review.review_id.desc()
+).ddl_if(dialect="postgresql")
+
+
+class PlaceRatingSummary(Base):
+    """Running review count, rating sum and histogram per place (see app/ratings.py)."""
+    __tablename__ = "place_rating_summaries"
+    place_id = Column(Integer, ForeignKey("places.place_id", ondelete="CASCADE"), primary_key=True)
+    review_count = Column(Integer, nullable=False, default=0)
+    rating_sum = Column(Integer, nullable=False, default=0)
+    rating_1 = Column(Integer, nullable=False, default=0)
+    rating_2 = Column(Integer, nullable=False, default=0)
+    rating_3 = Column(Integer, nullable=False, default=0)
+    rating_4 = Column(Integer, nullable=False, default=0)
+    rating_5 = Column(Integer, nullable=False, default=0)
+
 class Weather(Base):
     __tablename__ = "weather"
     weather_id = Column(Integer, primary_key=True, index=True)
@@ -105,6 +199,36 @@ class Weather(Base):
 
     city = relationship("City", back_populates="weather")
 
+    __table_args__ = (
+        Index("idx_weather_date", "date", "weather_id"),
+        # One row per city and day; the conflict target for bulk upserts
+        Index("uq_weather_city_date", "city_id", "date", unique=True),
+    )
+
+
+# Same for the weather list (date DESC NULLS LAST), with and without a city
+Index(
+    "idx_weather_feed", Weather.date.desc().nulls_last(), Weather.weather_id.desc()
+).ddl_if(dialect="postgresql")
+Index(
+    "idx_weather_city_feed",
+    Weather.city_id,
+    Weather.date.desc().nulls_last(),
+    Weather.weather_id.desc(),
+).ddl_if(dialect="postgresql")
+
+
+class WeatherClimatology(Base):
+    """Weather normals per (city, ISO week of year), rebuilt by refresh_climatology.py."""
+    __tablename__ = "weather_climatology"
+    city_id = Column(Integer, ForeignKey("cities.city_id", ondelete="CASCADE"), primary_key=True)
+    week = Column(Integer, primary_key=True)
+    sample_days = Column(Integer, nullable=False)
+    mean_min_temp = Column(Float)  # Celsius
+    mean_max_temp = Column(Float)
+    bad_weather_probability = Column(Float, nullable=False)
+    computed_at = Column(DateTime, default=datetime.utcnow)
+
 class Expense(Base):
     __tablename__ = "expenses"
     expense_id = Column(Integer, primary_key=True, index=True)
@@ -114,3 +238,70 @@ class Expense(Base):
     category = Column(String(100))
 
     itinerary = relationship("Itinerary", back_populates="expenses")
+
+    __table_args__ = (
+        Index("idx_expenses_itinerary_expense", "itinerary_id", "expense_id"),
+    )
+
+
+class ItineraryTotals(Base):
+    """Running expense and planned-cost totals per itinerary (see app/budget.py)."""
+    __tablename__ = "itinerary_totals"
+    itinerary_id = Column(
+        Integer, ForeignKey("itineraries.itinerary_id", ondelete="CASCADE"), primary_key=True
+    )
+    expense_total = Column(Numeric(12,2), nullable=False, default=0)
+    expense_count = Column(Integer, nullable=False, default=0)
+    planned_activity_cost = Column(Numeric(12,2), nullable=False, default=0)
+    activity_count = Column(Integer, nullable=False, default=0)
+
+
+class ItineraryCategoryTotal(Base):
+    """Running expense totals per (itinerary, category); NULL categories count as "Other"."""
+    __tablename__ = "itinerary_category_totals"
+    itinerary_id = Column(
+        Integer, ForeignKey("itineraries.itinerary_id", ondelete="CASCADE"), primary_key=True
+    )
+    category = Column(String(100), primary_key=True)
+    total = Column(Numeric(12,2), nullable=False, default=0)
+    count = Column(Integer, nullable=False, default=0)
+
+
+class PlaceRecommendation(Base):
+    """Top-N places per (user, category), written by the offline batch job."""
+    __tablename__ = "place_recommendations"
+    recommendation_id = Column(Integer, primary_key=True, index=True)
+    # NULL for the non-personalized ranking served to new users
+    user_id = Column(Integer, ForeignKey("users.user_id", ondelete="CASCADE"), nullable=True)
+    category = Column(String(100), nullable=False)
+    place_id = Column(Integer, ForeignKey("places.place_id", ondelete="CASCADE"), nullable=False)
+    score = Column(Float, nullable=False)
+    rank = Column(Integer, nullable=False)
+    version = Column(Integer, nullable=False, index=True)
+    computed_at = Column(DateTime, default=datetime.utcnow)
+
+    place = relationship("Place")
+
+    __table_args__ = (
+        Index("idx_place_recommendations_user_version", "user_id", "version", "category"),
+    )
+
+
+class CatalogVersion(Base):
+    """Change counter per catalog table, shared by every worker (see app/http_cache.py)."""
+    __tablename__ = "catalog_versions"
+    table_name = Column(String(100), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    modified_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+class BackfillCheckpoint(Base):
+    """Progress of a chunked maintenance job (see app/backfill.py)."""
+    __tablename__ = "backfill_checkpoints"
+    name = Column(String(100), primary_key=True)
+    last_key = Column(Integer)  # last primary key committed; NULL before the first chunk
+    rows_done = Column(Integer, nullable=False, default=0)
+    rows_changed = Column(Integer, nullable=False, default=0)
+    started_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime)
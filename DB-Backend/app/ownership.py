@@ -0,0 +1,97 @@
+"""Itinerary ownership checks pushed into SQL.
+
+Rather than loading an itinerary and comparing ``user_id`` in Python, the
+ownership condition (or nothing, for admins) is added to the statement that
+does the work, so one SELECT/INSERT/UPDATE/DELETE both authorizes and acts.
+Zero affected rows means the row is missing or belongs to someone else;
+both are answered with 404 so other users' ids are not revealed.
+"""
+from typing import Any, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import Row, delete, insert, literal, select, true, update
+from sqlalchemy.orm import Session
+
+from . import models
+
+
+def not_found(what: str) -> HTTPException:
+    return HTTPException(status_code=404, detail=f"{what} not found")
+
+
+def is_admin(current_user: models.User) -> bool:
+    return current_user.user_type == "admin"
+
+
+def itinerary_scope(current_user: models.User):
+    """Condition on ``models.Itinerary`` rows ``current_user`` may access."""
+    if is_admin(current_user):
+        return true()
+    return models.Itinerary.user_id == current_user.user_id
+
+
+def child_scope(itinerary_id_column, current_user: models.User):
+    """Condition on rows of a table with an ``itinerary_id`` column (activities, expenses)."""
+    if is_admin(current_user):
+        return true()
+    return itinerary_id_column.in_(
+        select(models.Itinerary.itinerary_id).where(
+            models.Itinerary.user_id == current_user.user_id
+        )
+    )
+
+
+def owned_itinerary(itinerary_id: int, current_user: models.User):
+    """EXISTS: the itinerary exists and ``current_user`` may access it."""
+    return (
+        select(models.Itinerary.itinerary_id)
+        .where(models.Itinerary.itinerary_id == itinerary_id, itinerary_scope(current_user))
+        .exists()
+    )
+
+
+def get_owned_itinerary_or_404(
+    db: Session, itinerary_id: int, current_user: models.User, *options: Any
+) -> models.Itinerary:
+    itinerary = (
+        db.query(models.Itinerary)
+        .options(*options)
+        .filter(models.Itinerary.itinerary_id == itinerary_id, itinerary_scope(current_user))
+        .first()
+    )
+    if not itinerary:
+        raise not_found("Itinerary")
+    return itinerary
+
+
+def require_itinerary(db: Session, itinerary_id: int, current_user: models.User) -> None:
+    if not db.scalar(select(owned_itinerary(itinerary_id, current_user))):
+        raise not_found("Itinerary")
+
+
+def insert_owned(db: Session, model, values: dict, current_user: models.User) -> Optional[Any]:
+    """INSERT ... SELECT a child row only if its itinerary is accessible; None otherwise."""
+    columns = model.__table__.c
+    row = select(*[literal(value, columns[key].type) for key, value in values.items()]).where(
+        owned_itinerary(values["itinerary_id"], current_user)
+    )
+    stmt = insert(model).from_select(list(values), row).returning(model)
+    return db.scalars(stmt).first()
+
+
+def update_owned(db: Session, model, pk_column, pk: int, scope, values: dict) -> Optional[Any]:
+    """UPDATE ... RETURNING the row with primary key ``pk`` within ``scope``; None if no match."""
+    if not values:
+        return db.query(model).filter(pk_column == pk, scope).first()
+    stmt = update(model).where(pk_column == pk, scope).values(**values).returning(model)
+    return db.scalars(stmt).first()
+
+
+def delete_owned(db: Session, model, pk_column, pk: int, scope, *returning: Any) -> Optional[Row]:
+    """DELETE the row with primary key ``pk`` within ``scope``.
+
+    Returns the deleted row's key plus any ``returning`` columns, or None if
+    nothing matched.
+    """
+    stmt = delete(model).where(pk_column == pk, scope).returning(pk_column, *returning)
+    return db.execute(stmt).first()
@@ -0,0 +1,130 @@
+"""Keyset (cursor) pagination shared by the list endpoints.
+
+List routes keep returning plain JSON arrays; when more rows exist the
+opaque cursor for the next page is sent in the ``X-Next-Cursor`` header and
+is passed back as ``?cursor=``.
+"""
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Query, Response
+from sqlalchemy import and_, false, or_
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+@dataclass
+class PageParams:
+    cursor: Optional[str]
+    limit: int
+
+
+def page_params(
+    cursor: Optional[str] = Query(None, description="Opaque cursor from X-Next-Cursor"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+) -> PageParams:
+    return PageParams(cursor=cursor, limit=limit)
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, (date, time, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def _decode_value(column, raw: Any) -> Any:
+    if raw is None:
+        return None
+    python_type = column.type.python_type
+    if python_type in (date, time, datetime):
+        return python_type.fromisoformat(raw)
+    return python_type(raw)
+
+
+def _nullable(col) -> bool:
+    return getattr(getattr(col, "expression", col), "nullable", True)
+
+
+class Keyset:
+    """
+    A stable sort order plus the predicate that resumes it after a cursor.
+
+    ``keys`` are ``(column, descending)`` pairs and must end with a unique
+    column (the primary key) so the order is total. NULLs of nullable keys
+    sort last in both directions, which ``after`` mirrors. NOT NULL keys get
+    a plain ASC/DESC, which PostgreSQL reads from an ordinary btree index
+    (backwards for DESC); descending nullable keys need an index declared
+    ``DESC NULLS LAST`` there (see the ``*_feed`` indexes in app/models.py).
+    """
+
+    def __init__(self, *keys: Tuple[Any, bool]):
+        self.keys = keys
+
+    def order_by(self) -> List[Any]:
+        clauses = []
+        for col, descending in self.keys:
+            clause = col.desc() if descending else col.asc()
+            clauses.append(clause.nulls_last() if _nullable(col) else clause)
+        return clauses
+
+    def after(self, values: Sequence[Any]):
+        clauses = []
+        equal_so_far: List[Any] = []
+        for (col, descending), value in zip(self.keys, values):
+            if value is None:
+                # Only other NULLs share this position; nothing sorts after.
+                beyond = false()
+                equal = col.is_(None)
+            else:
+                beyond = col < value if descending else col > value
+                if _nullable(col):
+                    beyond = or_(beyond, col.is_(None))
+                equal = col == value
+            clauses.append(and_(*equal_so_far, beyond))
+            equal_so_far.append(equal)
+        return or_(*clauses)
+
+    def encode(self, row: Any) -> str:
+        values = [_encode_value(getattr(row, col.key)) for col, _ in self.keys]
+        raw = json.dumps(values, separators=(",", ":")).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    def decode(self, cursor: str) -> List[Any]:
+        try:
+            raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+            values = json.loads(raw)
+            if not isinstance(values, list) or len(values) != len(self.keys):
+                raise ValueError("cursor does not match sort keys")
+            return [_decode_value(col, v) for (col, _), v in zip(self.keys, values)]
+        except (binascii.Error, ValueError, TypeError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    def apply(self, query, page: PageParams):
+        """Order, resume and limit a Query or Select (one extra row to detect more)."""
+        if page.cursor:
+            query = query.filter(self.after(self.decode(page.cursor)))
+        return query.order_by(*self.order_by()).limit(page.limit + 1)
+
+    def split(self, rows: Sequence[Any], page: PageParams) -> Tuple[List[Any], Optional[str]]:
+        """Trim the look-ahead row; returns the page and the next cursor (or None)."""
+        rows = list(rows)
+        if len(rows) > page.limit:
+            rows = rows[: page.limit]
+            return rows, self.encode(rows[-1])
+        return rows, None
+
+    def finish(self, rows: Sequence[Any], page: PageParams, response: Response) -> List[Any]:
+        """Trim the look-ahead row and advertise the next cursor if there is one."""
+        rows, cursor = self.split(rows, page)
+        if cursor:
+            response.headers[NEXT_CURSOR_HEADER] = cursor
+        return rows
@@ -0,0 +1,175 @@
+"""Utility model for the itinerary planner.
+
+Every candidate place gets a base utility once per plan, from data that is
+already precomputed:
+
+* its review average (``place_rating_summaries``), smoothed towards the
+  candidates' mean like the recommender does, scaled to [0, 1];
+* the user's weight for its category: ``user_preferences`` rows keyed
+  ``category:<name>`` with weight 1-10, scaled to [0, 1].
+
+The planner keeps the candidates as parallel numpy arrays. For each slot
+after the first of a day it only scores the ``NEXT_STOP_NEIGHBOURS``
+feasible candidates nearest the previous stop (a ``PlaceGrid`` lookup over
+the candidates), plus any without coordinates; the first slot, or one after
+a stop with unknown coordinates, scores every feasible candidate. On
+bad-weather days only indoor candidates are considered while any remain.
+Starting from the base utility it subtracts:
+
+* a diversity penalty per stop of the same category already planned that
+  day and on the whole trip;
+* a travel cost per kilometre from the previous stop.
+
+It then takes the best candidate that still fits the budget and the day.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from . import models
+from .geo import PlaceGrid
+from .recommender import RATING_PRIOR_WEIGHT
+
+RATING_WEIGHT = 1.0
+PREFERENCE_WEIGHT = 1.0
+# Per stop of the same category already planned
+SAME_DAY_CATEGORY_PENALTY = 0.35
+SAME_TRIP_CATEGORY_PENALTY = 0.1
+TRAVEL_PENALTY_PER_KM = 0.02
+# Candidates scored for a stop that follows one with known coordinates
+NEXT_STOP_NEIGHBOURS = 20
+
+CATEGORY_PREFERENCE_PREFIX = "category:"
+MAX_PREFERENCE_WEIGHT = 10
+
+
+def category_preferences(db: Session, user_id: int) -> Dict[str, float]:
+    """Lower-cased category -> preference in [0, 1] for the user."""
+    Preference = models.UserPreference
+    rows = (
+        db.query(Preference.preference_key, Preference.weight)
+        .filter(
+            Preference.user_id == user_id,
+            Preference.preference_key.like(f"{CATEGORY_PREFERENCE_PREFIX}%"),
+        )
+        .all()
+    )
+    return {
+        key[len(CATEGORY_PREFERENCE_PREFIX):].strip().lower(): min(
+            max(weight or 0, 0), MAX_PREFERENCE_WEIGHT
+        ) / MAX_PREFERENCE_WEIGHT
+        for key, weight in rows
+    }
+
+
+def rating_scores(db: Session, place_ids: List[int]) -> np.ndarray:
+    """Smoothed review average per place, in [0, 1], from the summary table."""
+    Summary = models.PlaceRatingSummary
+    found = {
+        row.place_id: (row.rating_sum, row.review_count)
+        for row in db.query(Summary.place_id, Summary.rating_sum, Summary.review_count).filter(
+            Summary.place_id.in_(place_ids)
+        )
+    }
+    sums = np.array([float(found.get(pid, (0, 0))[0]) for pid in place_ids], dtype=np.float64)
+    counts = np.array([float(found.get(pid, (0, 0))[1]) for pid in place_ids], dtype=np.float64)
+    total = counts.sum()
+    prior = sums.sum() / total if total else 3.0
+    return (sums + RATING_PRIOR_WEIGHT * prior) / (counts + RATING_PRIOR_WEIGHT) / 5.0
+
+
+@dataclass
+class CandidateVectors:
+    """Plan candidates as parallel arrays (index i is ``places[i]``)."""
+    places: List[models.Place]
+    utility: np.ndarray  # base utility, before per-slot penalties
+    category_index: np.ndarray  # into the distinct categories of this plan
+    category_count: int
+    costs: np.ndarray
+    durations: np.ndarray  # minutes
+    indoor: np.ndarray  # bool
+    lats: np.ndarray  # NaN where unknown
+    lons: np.ndarray
+    grid: PlaceGrid  # over the candidates with coordinates, keyed by index
+
+    def __len__(self) -> int:
+        return len(self.places)
+
+    def _pool(self, previous: Optional[int], eligible: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Indices to score after ``previous`` and their distance from it (0 where unknown)."""
+        if previous is not None and not np.isnan(self.lats[previous] + self.lons[previous]):
+            nearest = self.grid.nearest(
+                self.lats[previous], self.lons[previous], NEXT_STOP_NEIGHBOURS,
+                accept=eligible.__getitem__,
+            )
+            unlocated = np.flatnonzero(eligible & np.isnan(self.lats + self.lons))
+            index = np.concatenate([np.array([i for i, _ in nearest], dtype=np.int64), unlocated])
+            travel = np.concatenate([np.array([d for _, d in nearest]), np.zeros(len(unlocated))])
+            return index, travel
+        index = np.flatnonzero(eligible)
+        return index, np.zeros(len(index))
+
+    def slot_scores(
+        self,
+        day_category_counts: np.ndarray,
+        trip_category_counts: np.ndarray,
+        previous: Optional[int],
+        bad_weather: bool,
+        feasible: np.ndarray,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Candidates considered for the next slot of a day (indices) and their utility."""
+        if bad_weather and (feasible & self.indoor).any():
+            feasible = feasible & self.indoor
+        index, travel = self._pool(previous, feasible)
+        category = self.category_index[index]
+        scores = (
+            self.utility[index]
+            - SAME_DAY_CATEGORY_PENALTY * day_category_counts[category]
+            - SAME_TRIP_CATEGORY_PENALTY * trip_category_counts[category]
+            - TRAVEL_PENALTY_PER_KM * travel
+        )
+        return index, scores
+
+
+def candidate_vectors(
+    db: Session,
+    places: List[models.Place],
+    user_id: int,
+    costs: List[float],
+    durations: List[float],
+    indoor: List[bool],
+) -> CandidateVectors:
+    """Score ``places`` for ``user_id`` with two queries (ratings, preferences)."""
+    preferences = category_preferences(db, user_id)
+    categories: Dict[str, int] = {}
+    category_index = np.array(
+        [categories.setdefault((p.category or "").lower(), len(categories)) for p in places],
+        dtype=np.int64,
+    )
+    preference = np.array(
+        [preferences.get((p.category or "").lower(), 0.0) for p in places], dtype=np.float64
+    )
+    utility = (
+        RATING_WEIGHT * rating_scores(db, [p.place_id for p in places])
+        + PREFERENCE_WEIGHT * preference
+    )
+    lats = np.array([np.nan if p.latitude is None else p.latitude for p in places], dtype=np.float64)
+    lons = np.array([np.nan if p.longitude is None else p.longitude for p in places], dtype=np.float64)
+    return CandidateVectors(
+        places=places,
+        utility=utility,
+        category_index=category_index,
+        category_count=len(categories),
+        costs=np.array(costs, dtype=np.float64),
+        durations=np.array(durations, dtype=np.float64),
+        indoor=np.array(indoor, dtype=bool),
+        lats=lats,
+        lons=lons,
+        grid=PlaceGrid(
+            (i, lat, lon) for i, (lat, lon) in enumerate(zip(lats, lons)) if not np.isnan(lat + lon)
+        ),
+    )
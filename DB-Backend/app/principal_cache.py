@@ -0,0 +1,97 @@
+"""In-process cache of authenticated users, keyed by access token.
+
+Saves the JWT decode and the user lookup on repeat requests with the same
+token. Entries live for at most ``ttl_seconds`` (never past the token's own
+expiry), the cache holds at most ``max_entries`` tokens (least recently
+used evicted first), and all of a user's entries are dropped when that user
+is updated or deleted. Other workers see such changes within the TTL.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
+
+from . import models
+from .config import settings
+
+
+class PrincipalCache:
+    def __init__(self, max_entries: int, ttl_seconds: float) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, int, dict]]" = OrderedDict()
+        self._keys_by_user: Dict[int, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl_seconds > 0
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token: str) -> Optional[models.User]:
+        """A detached copy of the cached user; merge it into the request session."""
+        if not self.enabled:
+            return None
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, user_id, values = entry
+            if expires_at <= time.time():
+                self._drop(key, user_id)
+                return None
+            self._entries.move_to_end(key)
+        user = models.User(**values)
+        make_transient_to_detached(user)
+        return user
+
+    def put(self, token: str, user: models.User, token_expires_at: Optional[float] = None) -> None:
+        if not self.enabled:
+            return
+        expires_at = time.time() + self.ttl_seconds
+        if token_expires_at is not None:
+            expires_at = min(expires_at, token_expires_at)
+        values = {attr.key: getattr(user, attr.key) for attr in inspect(models.User).column_attrs}
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (expires_at, user.user_id, values)
+            self._entries.move_to_end(key)
+            self._keys_by_user.setdefault(user.user_id, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                old_key, (_, old_user_id, _) = self._entries.popitem(last=False)
+                self._forget(old_key, old_user_id)
+
+    def invalidate_user(self, user_id: int) -> None:
+        with self._lock:
+            for key in self._keys_by_user.pop(user_id, set()):
+                self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user.clear()
+
+    def _drop(self, key: str, user_id: int) -> None:
+        self._entries.pop(key, None)
+        self._forget(key, user_id)
+
+    def _forget(self, key: str, user_id: int) -> None:
+        keys = self._keys_by_user.get(user_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[user_id]
+
+
+principal_cache = PrincipalCache(
+    max_entries=settings.auth_cache_max_entries,
+    ttl_seconds=settings.auth_cache_ttl_seconds,
+)
@@ -0,0 +1,117 @@
+"""Incrementally maintained review summaries per place.
+
+The review routes report each write here inside their own transaction as
+an atomic ``column = column + :delta`` upsert, so a place page reads its
+review count, average and 1-5 star histogram from one row instead of
+aggregating (or downloading) every review. ``rebuild_summaries``
+recomputes the rows from the reviews table after data is changed outside
+the API.
+"""
+from typing import Iterable, Optional
+
+from sqlalchemy import case, delete, func, insert, select
+from sqlalchemy.orm import Session
+
+from . import models, schemas
+from .database import upsert_insert
+
+STARS = (1, 2, 3, 4, 5)
+
+
+def _bucket(rating: int) -> str:
+    """Histogram column for a rating; out-of-range ratings count as 1 or 5 stars."""
+    return f"rating_{min(max(int(rating), STARS[0]), STARS[-1])}"
+
+
+def record_review(db: Session, place_id: Optional[int], rating: Optional[int], count: int = 1) -> None:
+    """Add ``count`` reviews with ``rating`` to the place's summary (negative to remove)."""
+    if place_id is None or rating is None:
+        return
+    table = models.PlaceRatingSummary.__table__
+    deltas = {"review_count": count, "rating_sum": rating * count, _bucket(rating): count}
+    stmt = upsert_insert(db.get_bind().dialect.name, table).values(place_id=place_id, **deltas)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["place_id"],
+        set_={name: table.c[name] + stmt.excluded[name] for name in deltas},
+    )
+    db.execute(stmt)
+
+
+def remove_review(db: Session, place_id: Optional[int], rating: Optional[int]) -> None:
+    record_review(db, place_id, rating, count=-1)
+
+
+def remove_user_reviews(db: Session, user_id: int) -> None:
+    """Take a user's reviews out of the summaries before the user is deleted.
+
+    ``User.reviews`` cascades on delete, which bypasses ``remove_review``.
+    """
+    Review = models.Review
+    rows = (
+        db.query(Review.place_id, Review.rating, func.count(Review.review_id))
+        .filter(Review.user_id == user_id)
+        .group_by(Review.place_id, Review.rating)
+        .all()
+    )
+    for place_id, rating, count in rows:
+        record_review(db, place_id, rating, count=-count)
+
+
+def rebuild_summaries(db: Session, place_ids: Optional[Iterable[int]] = None) -> None:
+    """Recompute the summaries of some (default: all) places from the reviews table."""
+    Review, Summary = models.Review, models.PlaceRatingSummary
+    ids = list(place_ids) if place_ids is not None else None
+    db.flush()
+
+    stmt = delete(Summary)
+    if ids is not None:
+        stmt = stmt.where(Summary.place_id.in_(ids))
+    db.execute(stmt)
+
+    # Same clamping as _bucket
+    bucket = case(
+        (Review.rating <= STARS[0], STARS[0]),
+        (Review.rating >= STARS[-1], STARS[-1]),
+        else_=Review.rating,
+    )
+    summaries = (
+        select(
+            Review.place_id,
+            func.count(Review.review_id),
+            func.sum(Review.rating),
+            *(func.count(case((bucket == stars, 1))) for stars in STARS),
+        )
+        .where(Review.place_id.isnot(None), Review.rating.isnot(None))
+        .group_by(Review.place_id)
+    )
+    if ids is not None:
+        summaries = summaries.where(Review.place_id.in_(ids))
+    db.execute(
+        insert(Summary).from_select(
+            ["place_id", "review_count", "rating_sum", *(f"rating_{stars}" for stars in STARS)],
+            summaries,
+        )
+    )
+
+
+def load_summary(db: Session, place_id: int) -> Optional[schemas.PlaceRatingSummary]:
+    """The place's review summary in one query; None if the place does not exist."""
+    Place, Summary = models.Place, models.PlaceRatingSummary
+    row = db.execute(
+        select(Place.place_id, Summary)
+        .outerjoin(Summary, Summary.place_id == Place.place_id)
+        .where(Place.place_id == place_id)
+    ).first()
+    if row is None:
+        return None
+    summary = row.PlaceRatingSummary
+    if summary is None or not summary.review_count:
+        return schemas.PlaceRatingSummary(
+            place_id=place_id, histogram={stars: 0 for stars in STARS}
+        )
+    return schemas.PlaceRatingSummary(
+        place_id=place_id,
+        review_count=summary.review_count,
+        average_rating=round(summary.rating_sum / summary.review_count, 2),
+        histogram={stars: getattr(summary, f"rating_{stars}") for stars in STARS},
+    )
@@ -0,0 +1,236 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import func, insert, delete
+from sqlalchemy.orm import Session
+
+from . import models
+
+# Smoothing for the rating prior: a place needs about this many reviews
+# before its own average outweighs the catalog-wide mean.
+RATING_PRIOR_WEIGHT = 5.0
+# Added to places in cities the user has already planned a trip to. Ratings are
+# normalised to [0, 1], so this keeps visited cities ahead of everything else.
+VISITED_CITY_BOOST = 1.0
+DEFAULT_TOP_N = 20
+DEFAULT_USER_CHUNK = 500
+
+
+@dataclass
+class PlaceCatalog:
+    """Column-oriented view of the place catalog used for vectorized scoring."""
+    place_ids: np.ndarray
+    city_index: np.ndarray  # index into city_ids, len(city_ids) when the place has no city
+    base_scores: np.ndarray
+    categories: List[Optional[str]]
+    city_ids: List[int]
+
+    def category_columns(self) -> Dict[str, np.ndarray]:
+        columns: Dict[str, List[int]] = {}
+        for idx, cat in enumerate(self.categories):
+            if cat:
+                columns.setdefault(cat, []).append(idx)
+        return {cat: np.asarray(idx, dtype=np.int64) for cat, idx in columns.items()}
+
+
+def load_catalog(db: Session, categories: Optional[List[str]] = None) -> PlaceCatalog:
+    """Load places with their smoothed rating from the review summary table."""
+    Summary = models.PlaceRatingSummary
+    query = (
+        db.query(
+            models.Place.place_id,
+            models.Place.city_id,
+            models.Place.category,
+            Summary.rating_sum,
+            Summary.review_count,
+        )
+        .outerjoin(Summary, Summary.place_id == models.Place.place_id)
+    )
+    if categories is not None:
+        query = query.filter(models.Place.category.in_(categories))
+    rows = query.order_by(models.Place.place_name, models.Place.place_id).all()
+
+    city_ids = sorted({r.city_id for r in rows if r.city_id is not None})
+    city_pos = {cid: i for i, cid in enumerate(city_ids)}
+
+    sums = np.array([float(r.rating_sum or 0) for r in rows], dtype=np.float64)
+    counts = np.array([float(r.review_count or 0) for r in rows], dtype=np.float64)
+    total = counts.sum()
+    prior = sums.sum() / total if total else 3.0
+    smoothed = (sums + RATING_PRIOR_WEIGHT * prior) / (counts + RATING_PRIOR_WEIGHT)
+
+    return PlaceCatalog(
+        place_ids=np.array([r.place_id for r in rows], dtype=np.int64),
+        city_index=np.array(
+            [city_pos.get(r.city_id, len(city_ids)) for r in rows], dtype=np.int64
+        ),
+        base_scores=smoothed / 5.0,
+        categories=[r.category for r in rows],
+        city_ids=city_ids,
+    )
+
+
+def _visited_matrix(
+    db: Session, user_ids: List[int], city_ids: List[int]
+) -> np.ndarray:
+    """Boolean (users x cities+1) matrix of cities each user has itineraries in.
+
+    The extra trailing column stands for "no city" and is always False.
+    """
+    visited = np.zeros((len(user_ids), len(city_ids) + 1), dtype=bool)
+    if not user_ids or not city_ids:
+        return visited
+    user_pos = {uid: i for i, uid in enumerate(user_ids)}
+    city_pos = {cid: i for i, cid in enumerate(city_ids)}
+    rows = (
+        db.query(models.Itinerary.user_id, models.itinerary_cities.c.city_id)
+        .join(
+            models.itinerary_cities,
+            models.itinerary_cities.c.itinerary_id == models.Itinerary.itinerary_id,
+        )
+        .filter(models.Itinerary.user_id.in_(user_ids))
+        .distinct()
+        .all()
+    )
+    for user_id, city_id in rows:
+        if city_id in city_pos:
+            visited[user_pos[user_id], city_pos[city_id]] = True
+    return visited
+
+
+def score_users(catalog: PlaceCatalog, visited: np.ndarray) -> np.ndarray:
+    """Score every place for every user: (users x places)."""
+    boost = visited[:, catalog.city_index] * VISITED_CITY_BOOST
+    return catalog.base_scores[np.newaxis, :] + boost
+
+
+def _top_n(scores: np.ndarray, n: int) -> np.ndarray:
+    # Stable sort keeps the catalog's name ordering among equal scores.
+    return np.argsort(-scores, axis=-1, kind="stable")[..., :n]
+
+
+def precompute_recommendations(
+    db: Session,
+    top_n: int = DEFAULT_TOP_N,
+    chunk_size: int = DEFAULT_USER_CHUNK,
+) -> int:
+    """
+    Recompute the top-N places per (user, category) for every user, plus a
+    non-personalized top-N per category (``user_id`` NULL) for new users, and
+    store them under a new version. Older versions are removed once the new
+    one is complete, so readers always see a full set. Returns the new version.
+    """
+    catalog = load_catalog(db)
+    cat_columns = catalog.category_columns()
+    current = db.query(func.max(models.PlaceRecommendation.version)).scalar() or 0
+    version = current + 1
+    computed_at = datetime.utcnow()
+    table = models.PlaceRecommendation.__table__
+
+    # Base scores only: the visited-city boost needs a user
+    rows = []
+    for category, columns in cat_columns.items():
+        cat_scores = catalog.base_scores[columns]
+        for rank, col in enumerate(_top_n(cat_scores, top_n), start=1):
+            rows.append(
+                {
+                    "user_id": None,
+                    "category": category,
+                    "place_id": int(catalog.place_ids[columns[col]]),
+                    "score": float(cat_scores[col]),
+                    "rank": rank,
+                    "version": version,
+                    "computed_at": computed_at,
+                }
+            )
+    if rows:
+        db.execute(insert(table), rows)
+
+    last_user_id = 0
+    while True:
+        user_ids = [
+            uid
+            for (uid,) in db.query(models.User.user_id)
+            .filter(models.User.user_id > last_user_id)
+            .order_by(models.User.user_id)
+            .limit(chunk_size)
+            .all()
+        ]
+        if not user_ids:
+            break
+        last_user_id = user_ids[-1]
+
+        scores = score_users(catalog, _visited_matrix(db, user_ids, catalog.city_ids))
+        rows = []
+        for category, columns in cat_columns.items():
+            cat_scores = scores[:, columns]
+            top = _top_n(cat_scores, top_n)
+            for u, user_id in enumerate(user_ids):
+                for rank, col in enumerate(top[u], start=1):
+                    rows.append(
+                        {
+                            "user_id": user_id,
+                            "category": category,
+                            "place_id": int(catalog.place_ids[columns[col]]),
+                            "score": float(cat_scores[u, col]),
+                            "rank": rank,
+                            "version": version,
+                            "computed_at": computed_at,
+                        }
+                    )
+        if rows:
+            db.execute(insert(table), rows)
+        db.flush()
+
+    db.execute(delete(table).where(table.c.version < version))
+    db.commit()
+    return version
+
+
+def live_recommendations(
+    db: Session,
+    user_id: int,
+    categories: List[str],
+    limit: int,
+    personalize: bool,
+) -> List[int]:
+    """Rank places on the fly with the same scoring as the batch job."""
+    catalog = load_catalog(db, categories)
+    if not len(catalog.place_ids):
+        return []
+    if personalize:
+        visited = _visited_matrix(db, [user_id], catalog.city_ids)
+    else:
+        visited = np.zeros((1, len(catalog.city_ids) + 1), dtype=bool)
+    scores = score_users(catalog, visited)
+    return [int(catalog.place_ids[i]) for i in _top_n(scores, limit)[0]]
+
+
+def precomputed_recommendations(
+    db: Session, user_id: Optional[int], categories: List[str], limit: int
+) -> Optional[List[int]]:
+    """
+    Serve from the batch table; ``user_id`` None reads the non-personalized
+    ranking. None when there are no precomputed rows for it.
+    """
+    Rec = models.PlaceRecommendation
+    owner = Rec.user_id.is_(None) if user_id is None else Rec.user_id == user_id
+    version = db.query(func.max(Rec.version)).filter(owner).scalar()
+    if version is None:
+        return None
+    rows = (
+        db.query(Rec.place_id)
+        .filter(
+            owner,
+            Rec.version == version,
+            Rec.category.in_(categories),
+        )
+        .order_by(Rec.score.desc(), Rec.rank)
+        .limit(limit)
+        .all()
+    )
+    return [place_id for (place_id,) in rows]
@@ -4,6 +4,7 @@ from . import (
     cities,
     expenses,
     itineraries,
+    metrics,
     places,
     reviews,
     users,
@@ -20,4 +21,5 @@ __all__ = [
     "reviews",
     "expenses",
     "weather",
+    "metrics",
 ]
@@ -1,30 +1,35 @@
 from typing import List
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy import delete, false, insert, or_, select, update
 from sqlalchemy.orm import Session
 
-from .. import models, schemas
-from ..auth import get_current_user, get_db
+from .. import budget, models, schemas
+from ..auth import get_current_user, get_db, get_read_db
+from ..exporting import ExportFormat, stream_export
+from ..ownership import (
+    child_scope,
+    delete_owned,
+    insert_owned,
+    not_found,
+    require_itinerary,
+    update_owned,
+)
+from ..pagination import Keyset, PageParams, page_params
+from ..scheduling import ItinerarySchedule, ensure_no_conflict
 
 router = APIRouter(prefix="/activities", tags=["activities"])
 
+MAX_BATCH_OPERATIONS = 500
 
-def _get_activity_or_404(activity_id: int, db: Session) -> models.Activity:
-    activity = db.query(models.Activity).get(activity_id)
-    if not activity:
-        raise HTTPException(status_code=404, detail="Activity not found")
-    return activity
+ACTIVITY_ORDER = Keyset(
+    (models.Activity.day_no, False),
+    (models.Activity.start_time, False),
+    (models.Activity.activity_id, False),
+)
 
 
-def _ensure_itinerary_access(
-    itinerary_id: int, db: Session, current_user: models.User
-) -> models.Itinerary:
-    itinerary = db.query(models.Itinerary).get(itinerary_id)
-    if not itinerary:
-        raise HTTPException(status_code=404, detail="Itinerary not found")
-    if itinerary.user_id != current_user.user_id and current_user.user_type != "admin":
-        raise HTTPException(status_code=403, detail="Not permitted")
-    return itinerary
+TIMING_FIELDS = {"day_no", "start_time", "end_time"}
 
 
 @router.post("/", response_model=schemas.ActivityRead, status_code=status.HTTP_201_CREATED)
@@ -33,33 +38,232 @@ def create_activity(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user),
 ):
-    _ensure_itinerary_access(payload.itinerary_id, db, current_user)
     if payload.place_id:
         place = db.query(models.Place).get(payload.place_id)
         if not place:
             raise HTTPException(status_code=404, detail="Place not found")
-    activity = models.Activity(**payload.dict())
-    db.add(activity)
+    activity = insert_owned(db, models.Activity, payload.dict(), current_user)
+    if not activity:
+        raise not_found("Itinerary")
+    # Checked after the insert so a foreign itinerary's schedule is never probed;
+    # raising here leaves the transaction uncommitted.
+    ensure_no_conflict(
+        db,
+        payload.itinerary_id,
+        payload.day_no,
+        payload.start_time,
+        payload.end_time,
+        exclude_activity_id=activity.activity_id,
+    )
+    budget.record_activity_cost(db, activity.itinerary_id, activity.estimated_cost)
+    result = schemas.ActivityRead.model_validate(activity)
     db.commit()
-    db.refresh(activity)
-    return activity
+    return result
+
+
+def _check_batch_schedule(
+    db: Session,
+    itinerary_id: int,
+    creates: List[dict],
+    updates: dict[int, dict],
+    deletes: set[int],
+) -> None:
+    """Reject a batch whose result would contain overlapping activities.
+
+    Loads the days the batch touches once and replays the operations on an
+    in-memory per-day interval index.
+    """
+    timing_updates = {
+        activity_id: values
+        for activity_id, values in updates.items()
+        if values.keys() & TIMING_FIELDS
+    }
+    if not creates and not timing_updates:
+        return
+    Activity = models.Activity
+    days = {v.get("day_no") for v in creates} | {
+        v["day_no"] for v in timing_updates.values() if "day_no" in v
+    }
+    if timing_updates:
+        # An activity rescheduled within its day must be checked against the
+        # rest of that day, so the days it is on now are loaded as well.
+        days.update(
+            db.scalars(
+                select(Activity.day_no)
+                .where(
+                    Activity.itinerary_id == itinerary_id,
+                    Activity.activity_id.in_(timing_updates),
+                )
+                .distinct()
+            )
+        )
+    rows = (
+        db.query(Activity.activity_id, Activity.day_no, Activity.start_time, Activity.end_time)
+        .filter(
+            Activity.itinerary_id == itinerary_id,
+            or_(
+                Activity.day_no.in_([d for d in days if d is not None]),
+                Activity.day_no.is_(None) if None in days else false(),
+                Activity.activity_id.in_(timing_updates),
+            ),
+        )
+        .all()
+    )
+    schedule = ItinerarySchedule()
+    current = {}
+    for row in rows:
+        current[row.activity_id] = row
+        # Moved activities are re-placed below, so they are checked against
+        # the batch's final state rather than their old slots.
+        if row.activity_id not in deletes and row.activity_id not in timing_updates:
+            schedule.place(row.activity_id, row.day_no, row.start_time, row.end_time, check=False)
+    for activity_id, values in timing_updates.items():
+        row = current[activity_id]
+        schedule.place(
+            activity_id,
+            values.get("day_no", row.day_no),
+            values.get("start_time", row.start_time),
+            values.get("end_time", row.end_time),
+        )
+    for index, values in enumerate(creates, start=1):
+        schedule.place(-index, values.get("day_no"), values.get("start_time"), values.get("end_time"))
+
+
+@router.post("/batch", response_model=schemas.ActivityBatchResult)
+def batch_activities(
+    payload: schemas.ActivityBatchRequest,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """
+    Apply many create/update/delete operations to one itinerary's activities
+    in a single transaction. Ownership is checked once, referenced activities
+    and places are validated with one IN query each, and each kind of
+    operation is applied with a single bulk statement.
+    """
+    if len(payload.operations) > MAX_BATCH_OPERATIONS:
+        raise HTTPException(
+            status_code=400, detail=f"At most {MAX_BATCH_OPERATIONS} operations per batch"
+        )
+    require_itinerary(db, payload.itinerary_id, current_user)
+
+    creates: List[dict] = []
+    updates: dict[int, dict] = {}
+    deletes: set[int] = set()
+    for index, operation in enumerate(payload.operations):
+        if operation.op != "create" and operation.activity_id is None:
+            raise HTTPException(
+                status_code=400, detail=f"Operation {index}: activity_id is required"
+            )
+        if operation.op != "delete" and operation.values is None:
+            raise HTTPException(status_code=400, detail=f"Operation {index}: values are required")
+        if operation.op == "create":
+            creates.append(
+                {**operation.values.dict(exclude_none=True), "itinerary_id": payload.itinerary_id}
+            )
+        elif operation.op == "update":
+            values = operation.values.dict(exclude_unset=True)
+            if not values:
+                raise HTTPException(
+                    status_code=400, detail=f"Operation {index}: values must set at least one field"
+                )
+            # Several updates to the same activity are merged, later ones win
+            updates.setdefault(operation.activity_id, {}).update(values)
+        else:
+            deletes.add(operation.activity_id)
+    if deletes & updates.keys():
+        raise HTTPException(
+            status_code=400, detail="An activity cannot be both updated and deleted in one batch"
+        )
+
+    target_ids = deletes | updates.keys()
+    current_costs: dict[int, object] = {}
+    if target_ids:
+        current_costs = dict(
+            db.execute(
+                select(models.Activity.activity_id, models.Activity.estimated_cost).where(
+                    models.Activity.activity_id.in_(target_ids),
+                    models.Activity.itinerary_id == payload.itinerary_id,
+                )
+            ).all()
+        )
+        missing = sorted(target_ids - current_costs.keys())
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Activities not found: {missing}")
+
+    place_ids = {
+        values["place_id"]
+        for values in [*creates, *updates.values()]
+        if values.get("place_id") is not None
+    }
+    if place_ids:
+        found = set(
+            db.scalars(select(models.Place.place_id).where(models.Place.place_id.in_(place_ids)))
+        )
+        missing = sorted(place_ids - found)
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Places not found: {missing}")
+
+    _check_batch_schedule(db, payload.itinerary_id, creates, updates, deletes)
+
+    created: List[schemas.ActivityRead] = []
+    try:
+        if deletes:
+            db.execute(
+                delete(models.Activity).where(models.Activity.activity_id.in_(deletes))
+            )
+        if updates:
+            db.execute(
+                update(models.Activity),
+                [{"activity_id": activity_id, **values} for activity_id, values in updates.items()],
+            )
+        if creates:
+            rows = db.scalars(insert(models.Activity).returning(models.Activity), creates)
+            # Serialize before commit expires the returned rows
+            created = [schemas.ActivityRead.model_validate(a) for a in rows]
+        cost_delta = (
+            sum(budget.money(a.estimated_cost) for a in created)
+            + sum(
+                budget.money(values["estimated_cost"]) - budget.money(current_costs[activity_id])
+                for activity_id, values in updates.items()
+                if "estimated_cost" in values
+            )
+            - sum(budget.money(current_costs[activity_id]) for activity_id in deletes)
+        )
+        budget.record_activity_cost(
+            db, payload.itinerary_id, cost_delta, count=len(created) - len(deletes)
+        )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    return schemas.ActivityBatchResult(
+        created=created,
+        updated=sorted(updates),
+        deleted=sorted(deletes),
+    )
 
 
 @router.get("/", response_model=List[schemas.ActivityRead])
 def list_activities(
+    response: Response,
     itinerary_id: int | None = None,
-    db: Session = Depends(get_db),
+    page: PageParams = Depends(page_params),
+    export_format: ExportFormat | None = Query(None, alias="format"),
+    db: Session = Depends(get_read_db),
     current_user: models.User = Depends(get_current_user),
 ):
-    query = db.query(models.Activity)
+    query = db.query(models.Activity).filter(
+        child_scope(models.Activity.itinerary_id, current_user)
+    )
     if itinerary_id:
-        itinerary = _ensure_itinerary_access(itinerary_id, db, current_user)
-        query = query.filter(models.Activity.itinerary_id == itinerary.itinerary_id)
-    elif current_user.user_type != "admin":
-        query = query.join(models.Itinerary).filter(
-            models.Itinerary.user_id == current_user.user_id
+        query = query.filter(models.Activity.itinerary_id == itinerary_id)
+    if export_format:
+        return stream_export(
+            query.order_by(*ACTIVITY_ORDER.order_by()).statement, export_format, "activities"
         )
-    return query.order_by(models.Activity.day_no).all()
+    return ACTIVITY_ORDER.finish(ACTIVITY_ORDER.apply(query, page).all(), page, response)
 
 
 @router.put("/{activity_id}", response_model=schemas.ActivityRead)
@@ -69,13 +273,38 @@ def update_activity(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user),
 ):
-    activity = _get_activity_or_404(activity_id, db)
-    _ensure_itinerary_access(activity.itinerary_id, db, current_user)
     data = payload.dict(exclude_unset=True)
     if "place_id" in data and data["place_id"] is not None:
         place = db.query(models.Place).get(data["place_id"])
         if not place:
             raise HTTPException(status_code=404, detail="Place not found")
+    scope = child_scope(models.Activity.itinerary_id, current_user)
+    if not data.keys() & TIMING_FIELDS:
+        activity = update_owned(
+            db, models.Activity, models.Activity.activity_id, activity_id, scope, data
+        )
+        if not activity:
+            raise not_found("Activity")
+        result = schemas.ActivityRead.model_validate(activity)
+        db.commit()
+        return result
+
+    # Rescheduling needs the current times to check for overlaps
+    activity = (
+        db.query(models.Activity)
+        .filter(models.Activity.activity_id == activity_id, scope)
+        .first()
+    )
+    if not activity:
+        raise not_found("Activity")
+    ensure_no_conflict(
+        db,
+        activity.itinerary_id,
+        data.get("day_no", activity.day_no),
+        data.get("start_time", activity.start_time),
+        data.get("end_time", activity.end_time),
+        exclude_activity_id=activity.activity_id,
+    )
     for key, value in data.items():
         setattr(activity, key, value)
     db.commit()
@@ -89,8 +318,17 @@ def delete_activity(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user),
 ):
-    activity = _get_activity_or_404(activity_id, db)
-    _ensure_itinerary_access(activity.itinerary_id, db, current_user)
-    db.delete(activity)
+    deleted = delete_owned(
+        db,
+        models.Activity,
+        models.Activity.activity_id,
+        activity_id,
+        child_scope(models.Activity.itinerary_id, current_user),
+        models.Activity.itinerary_id,
+        models.Activity.estimated_cost,
+    )
+    if not deleted:
+        raise not_found("Activity")
+    budget.remove_activity_cost(db, deleted.itinerary_id, deleted.estimated_cost)
     db.commit()
 
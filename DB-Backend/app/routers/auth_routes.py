@@ -1,24 +1,27 @@
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from .. import models, schemas
 from ..auth import (
     authenticate_user,
     create_access_token,
-    get_db,
+    get_async_db,
     hash_password,
 )
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 @router.post("/register", response_model=schemas.UserRead, status_code=201)
-def register_user(user_in: schemas.UserCreate, db: Session = Depends(get_db)):
+async def register_user(user_in: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
     import traceback
     print(f"User in: {user_in}")
     try:
         # Check if email already exists
-        existing_user = db.query(models.User).filter(models.User.email == user_in.email).first()
+        existing_user = await db.scalar(
+            select(models.User).where(models.User.email == user_in.email)
+        )
         if existing_user:
             raise HTTPException(status_code=400, detail="Email already registered")
         
@@ -30,14 +33,14 @@ def register_user(user_in: schemas.UserCreate, db: Session = Depends(get_db)):
             first_name=user_in.first_name,
             last_name=user_in.last_name,
             email=user_in.email,
-            password_hash=hash_password(user_in.password),
+            password_hash=await hash_password(user_in.password),
             contact_info=user_in.contact_info,
             user_type=user_type,
         )
         
         db.add(new_user)
-        db.commit()
-        db.refresh(new_user)
+        await db.commit()
+        await db.refresh(new_user)
         
         # Manually construct response to ensure all fields match schema
         return schemas.UserRead(
@@ -57,7 +60,7 @@ def register_user(user_in: schemas.UserCreate, db: Session = Depends(get_db)):
         # Rollback on any other error
         if db:
             try:
-                db.rollback()
+                await db.rollback()
             except Exception as rollback_error:
                 print(f"Rollback error: {rollback_error}")
         
@@ -82,13 +85,13 @@ def register_user(user_in: schemas.UserCreate, db: Session = Depends(get_db)):
 
 
 @router.post("/login")
-def login(
-    form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)
+async def login(
+    form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)
 ):
     import traceback
     try:
         print(f"Login attempt for: {form_data.username}")
-        user = authenticate_user(db, form_data.username, form_data.password)
+        user = await authenticate_user(db, form_data.username, form_data.password)
         if not user:
             print(f"Authentication failed for: {form_data.username}")
             raise HTTPException(status_code=400, detail="Incorrect email or password")
@@ -1,66 +1,99 @@
 from typing import List
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from .. import models, schemas
-from ..auth import get_current_admin, get_db
+from ..auth import get_async_db, get_async_read_db, get_current_admin_async
+from ..catalog import catalog
+from ..http_cache import catalog_cache
+from ..pagination import NEXT_CURSOR_HEADER, Keyset, PageParams, page_params
 
 router = APIRouter(prefix="/cities", tags=["cities"])
 
+CITY_ORDER = Keyset((models.City.name, False), (models.City.city_id, False))
+
+
+async def _get_city_or_404(city_id: int, db: AsyncSession) -> models.City:
+    city = await db.get(models.City, city_id)
+    if not city:
+        raise HTTPException(status_code=404, detail="City not found")
+    return city
+
 
 @router.post("/", response_model=schemas.CityRead, status_code=status.HTTP_201_CREATED)
-def create_city(
+async def create_city(
     payload: schemas.CityCreate,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_admin_async),
 ):
     city = models.City(**payload.dict())
     db.add(city)
-    db.commit()
-    db.refresh(city)
+    await db.commit()
+    await run_in_threadpool(catalog.changed, "cities")
+    await db.refresh(city)
     return city
 
 
-@router.get("/", response_model=List[schemas.CityRead])
-def list_cities(db: Session = Depends(get_db)):
-    return db.query(models.City).order_by(models.City.name).all()
+@router.get(
+    "/", response_model=List[schemas.CityRead], dependencies=[Depends(catalog_cache("cities"))]
+)
+async def list_cities(
+    response: Response,
+    page: PageParams = Depends(page_params),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    async def load():
+        result = await db.execute(CITY_ORDER.apply(select(models.City), page))
+        rows, cursor = CITY_ORDER.split(result.scalars().all(), page)
+        return [schemas.CityRead.model_validate(c) for c in rows], cursor
 
+    cities, cursor = await catalog.get_or_load(
+        ("cities", page.cursor, page.limit), ("cities",), load
+    )
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
+    return cities
 
-@router.get("/{city_id}", response_model=schemas.CityRead)
-def get_city(city_id: int, db: Session = Depends(get_db)):
-    city = db.query(models.City).get(city_id)
-    if not city:
-        raise HTTPException(status_code=404, detail="City not found")
-    return city
+
+@router.get(
+    "/{city_id}", response_model=schemas.CityRead, dependencies=[Depends(catalog_cache("cities"))]
+)
+async def get_city(city_id: int, db: AsyncSession = Depends(get_async_read_db)):
+    async def load():
+        return schemas.CityRead.model_validate(await _get_city_or_404(city_id, db))
+
+    return await catalog.get_or_load(("city", city_id), ("cities",), load)
 
 
 @router.put("/{city_id}", response_model=schemas.CityRead)
-def update_city(
+async def update_city(
     city_id: int,
     payload: schemas.CityUpdate,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_admin_async),
 ):
-    city = db.query(models.City).get(city_id)
-    if not city:
-        raise HTTPException(status_code=404, detail="City not found")
+    city = await _get_city_or_404(city_id, db)
     for key, value in payload.dict(exclude_unset=True).items():
         setattr(city, key, value)
-    db.commit()
-    db.refresh(city)
+    await db.commit()
+    await run_in_threadpool(catalog.changed, "cities")
+    await db.refresh(city)
     return city
 
 
 @router.delete("/{city_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_city(
+async def delete_city(
     city_id: int,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_admin_async),
 ):
-    city = db.query(models.City).get(city_id)
-    if not city:
-        raise HTTPException(status_code=404, detail="City not found")
-    db.delete(city)
-    db.commit()
-
+    city = await _get_city_or_404(city_id, db)
+    await db.delete(city)
+    await db.commit()
+    # Deleting a city also unlinks its places and removes its weather
+    await run_in_threadpool(
+        catalog.changed, "cities", "places", "weather", "weather_climatology"
+    )
@@ -1,29 +1,18 @@
 from typing import List
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Query, Response, status
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
-from .. import models, schemas
-from ..auth import get_current_user, get_db
+from .. import budget, models, schemas
+from ..auth import get_current_user, get_db, get_read_db
+from ..exporting import ExportFormat, stream_export
+from ..ownership import child_scope, delete_owned, insert_owned, not_found, update_owned
+from ..pagination import Keyset, PageParams, page_params
 
 router = APIRouter(prefix="/expenses", tags=["expenses"])
 
-
-def _get_expense_or_404(expense_id: int, db: Session) -> models.Expense:
-    expense = db.query(models.Expense).get(expense_id)
-    if not expense:
-        raise HTTPException(status_code=404, detail="Expense not found")
-    return expense
-
-
-def _ensure_itinerary_access(
-    itinerary_id: int, db: Session, current_user: models.User
-) -> None:
-    itinerary = db.query(models.Itinerary).get(itinerary_id)
-    if not itinerary:
-        raise HTTPException(status_code=404, detail="Itinerary not found")
-    if itinerary.user_id != current_user.user_id and current_user.user_type != "admin":
-        raise HTTPException(status_code=403, detail="Not permitted")
+EXPENSE_ORDER = Keyset((models.Expense.expense_id, True))
 
 
 @router.post("/", response_model=schemas.ExpenseRead, status_code=status.HTTP_201_CREATED)
@@ -32,29 +21,35 @@ def create_expense(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user),
 ):
-    _ensure_itinerary_access(payload.itinerary_id, db, current_user)
-    expense = models.Expense(**payload.dict())
-    db.add(expense)
+    expense = insert_owned(db, models.Expense, payload.dict(), current_user)
+    if not expense:
+        raise not_found("Itinerary")
+    budget.record_expense(db, expense.itinerary_id, expense.category, expense.amount)
+    # Serialize before commit expires the returned row
+    result = schemas.ExpenseRead.model_validate(expense)
     db.commit()
-    db.refresh(expense)
-    return expense
+    return result
 
 
 @router.get("/", response_model=List[schemas.ExpenseRead])
 def list_expenses(
+    response: Response,
     itinerary_id: int | None = None,
-    db: Session = Depends(get_db),
+    page: PageParams = Depends(page_params),
+    export_format: ExportFormat | None = Query(None, alias="format"),
+    db: Session = Depends(get_read_db),
     current_user: models.User = Depends(get_current_user),
 ):
-    query = db.query(models.Expense)
+    query = db.query(models.Expense).filter(
+        child_scope(models.Expense.itinerary_id, current_user)
+    )
     if itinerary_id:
-        _ensure_itinerary_access(itinerary_id, db, current_user)
         query = query.filter(models.Expense.itinerary_id == itinerary_id)
-    elif current_user.user_type != "admin":
-        query = query.join(models.Itinerary).filter(
-            models.Itinerary.user_id == current_user.user_id
+    if export_format:
+        return stream_export(
+            query.order_by(*EXPENSE_ORDER.order_by()).statement, export_format, "expenses"
         )
-    return query.order_by(models.Expense.expense_id.desc()).all()
+    return EXPENSE_ORDER.finish(EXPENSE_ORDER.apply(query, page).all(), page, response)
 
 
 @router.put("/{expense_id}", response_model=schemas.ExpenseRead)
@@ -64,13 +59,29 @@ def update_expense(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user),
 ):
-    expense = _get_expense_or_404(expense_id, db)
-    _ensure_itinerary_access(expense.itinerary_id, db, current_user)
-    for key, value in payload.dict(exclude_unset=True).items():
-        setattr(expense, key, value)
+    data = payload.dict(exclude_unset=True)
+    scope = child_scope(models.Expense.itinerary_id, current_user)
+    previous = None
+    if data.keys() & {"amount", "category"}:
+        # The old amount and category are needed to move the totals
+        previous = db.execute(
+            select(models.Expense.amount, models.Expense.category)
+            .where(models.Expense.expense_id == expense_id, scope)
+            .with_for_update()
+        ).first()
+        if not previous:
+            raise not_found("Expense")
+    expense = update_owned(
+        db, models.Expense, models.Expense.expense_id, expense_id, scope, data
+    )
+    if not expense:
+        raise not_found("Expense")
+    if previous:
+        budget.remove_expense(db, expense.itinerary_id, previous.category, previous.amount)
+        budget.record_expense(db, expense.itinerary_id, expense.category, expense.amount)
+    result = schemas.ExpenseRead.model_validate(expense)
     db.commit()
-    db.refresh(expense)
-    return expense
+    return result
 
 
 @router.delete("/{expense_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -79,8 +90,18 @@ def delete_expense(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user),
 ):
-    expense = _get_expense_or_404(expense_id, db)
-    _ensure_itinerary_access(expense.itinerary_id, db, current_user)
-    db.delete(expense)
+    deleted = delete_owned(
+        db,
+        models.Expense,
+        models.Expense.expense_id,
+        expense_id,
+        child_scope(models.Expense.itinerary_id, current_user),
+        models.Expense.itinerary_id,
+        models.Expense.category,
+        models.Expense.amount,
+    )
+    if not deleted:
+        raise not_found("Expense")
+    budget.remove_expense(db, deleted.itinerary_id, deleted.category, deleted.amount)
     db.commit()
 
@@ -1,28 +1,42 @@
+from itertools import groupby
 from typing import List
-from datetime import datetime
-
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session, joinedload
-
-from .. import models, schemas
-from ..csp_planner import PlanningRequest, build_itinerary_plan, recommend_cities_by_reviews
-from ..auth import get_current_user, get_db
+from datetime import datetime, time
+
+from anyio import from_thread
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import delete, insert, literal, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, joinedload, selectinload
+
+from .. import budget, models, schemas
+from ..admission import admission
+from ..climatology import trip_outlook
+from ..config import settings
+from ..csp_planner import (
+    PlanningCancelled,
+    PlanningDeadline,
+    PlanningRequest,
+    build_itinerary_plan,
+    recommend_cities_by_reviews,
+)
+from ..auth import get_current_user, get_db, get_read_db
+from ..ownership import (
+    delete_owned,
+    get_owned_itinerary_or_404,
+    itinerary_scope,
+    not_found,
+    owned_itinerary,
+    require_itinerary,
+    update_owned,
+)
+from ..pagination import Keyset, PageParams, page_params
+from ..scheduling import find_all_conflicts
 
 router = APIRouter(prefix="/itineraries", tags=["itineraries"])
 
-
-def _get_itinerary_or_404(itinerary_id: int, db: Session) -> models.Itinerary:
-    itinerary = db.query(models.Itinerary).get(itinerary_id)
-    if not itinerary:
-        raise HTTPException(status_code=404, detail="Itinerary not found")
-    return itinerary
-
-
-def _enforce_owner_or_admin(
-    itinerary: models.Itinerary, current_user: models.User
-) -> None:
-    if itinerary.user_id != current_user.user_id and current_user.user_type != "admin":
-        raise HTTPException(status_code=403, detail="Not permitted for this itinerary")
+ITINERARY_ORDER = Keyset(
+    (models.Itinerary.start_date, False), (models.Itinerary.itinerary_id, False)
+)
 
 
 @router.post("/", response_model=schemas.ItineraryRead, status_code=201)
@@ -42,25 +56,126 @@ def create_itinerary(
 
 @router.get("/", response_model=List[schemas.ItineraryRead])
 def list_itineraries(
-    db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)
+    response: Response,
+    page: PageParams = Depends(page_params),
+    db: Session = Depends(get_read_db),
+    current_user: models.User = Depends(get_current_user),
 ):
-    query = db.query(models.Itinerary)
-    if current_user.user_type != "admin":
-        query = query.filter(models.Itinerary.user_id == current_user.user_id)
-    return query.options(joinedload(models.Itinerary.cities)).order_by(models.Itinerary.start_date).all()
+    query = db.query(models.Itinerary).filter(itinerary_scope(current_user))
+    # selectinload rather than joinedload so LIMIT applies to itineraries, not joined rows
+    query = ITINERARY_ORDER.apply(query.options(selectinload(models.Itinerary.cities)), page)
+    return ITINERARY_ORDER.finish(query.all(), page, response)
 
 
 @router.get("/{itinerary_id}", response_model=schemas.ItineraryRead)
 def get_itinerary(
     itinerary_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: models.User = Depends(get_current_user),
 ):
-    itinerary = db.query(models.Itinerary).options(joinedload(models.Itinerary.cities)).get(itinerary_id)
-    if not itinerary:
-        raise HTTPException(status_code=404, detail="Itinerary not found")
-    _enforce_owner_or_admin(itinerary, current_user)
-    return itinerary
+    return get_owned_itinerary_or_404(
+        db, itinerary_id, current_user, selectinload(models.Itinerary.cities)
+    )
+
+
+@router.get("/{itinerary_id}/full", response_model=schemas.ItineraryFull)
+def get_itinerary_full(
+    itinerary_id: int,
+    db: Session = Depends(get_read_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """
+    Everything the itinerary details page needs in one response: the
+    itinerary, its cities, activities grouped by day with place summaries,
+    and expense totals. Uses a fixed number of queries regardless of size.
+    """
+    itinerary = get_owned_itinerary_or_404(
+        db,
+        itinerary_id,
+        current_user,
+        selectinload(models.Itinerary.cities),
+        selectinload(models.Itinerary.activities).joinedload(models.Activity.place),
+    )
+
+    # Days in order (unscheduled activities last), activities by start time
+    activities = sorted(
+        itinerary.activities,
+        key=lambda a: (
+            a.day_no is None,
+            a.day_no or 0,
+            a.start_time is None,
+            a.start_time or time.min,
+            a.activity_id,
+        ),
+    )
+    days = [
+        schemas.ItineraryDay(
+            day_no=day_no,
+            activities=[schemas.ActivityDetail.model_validate(a) for a in group],
+        )
+        for day_no, group in groupby(activities, key=lambda a: a.day_no)
+    ]
+
+    result = schemas.ItineraryFull.model_validate(itinerary)
+    result.days = days
+    totals = budget.load_budget(db, itinerary_id, itinerary_scope(current_user))
+    result.expense_totals = schemas.ExpenseTotals(
+        total=totals.expense_total,
+        count=totals.expense_count,
+        by_category=totals.by_category,
+        planned_activity_cost=totals.planned_activity_cost,
+    )
+    return result
+
+
+@router.get("/{itinerary_id}/budget", response_model=schemas.ItineraryBudget)
+def get_itinerary_budget(
+    itinerary_id: int,
+    db: Session = Depends(get_read_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """Budget, spend and planned cost from the maintained totals (one query)."""
+    result = budget.load_budget(db, itinerary_id, itinerary_scope(current_user))
+    if result is None:
+        raise not_found("Itinerary")
+    return result
+
+
+@router.get("/{itinerary_id}/outlook", response_model=List[schemas.DayOutlookRead])
+def get_itinerary_outlook(
+    itinerary_id: int,
+    db: Session = Depends(get_read_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """Expected weather per trip day: forecasts where known, weekly normals otherwise."""
+    itinerary = get_owned_itinerary_or_404(
+        db, itinerary_id, current_user, selectinload(models.Itinerary.cities)
+    )
+    outlook = trip_outlook(
+        db, [c.city_id for c in itinerary.cities], itinerary.start_date, itinerary.end_date
+    )
+    return [outlook[day] for day in sorted(outlook)]
+
+
+@router.get("/{itinerary_id}/conflicts", response_model=List[schemas.ActivityConflict])
+def list_itinerary_conflicts(
+    itinerary_id: int,
+    db: Session = Depends(get_read_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """All pairs of overlapping activities on the same day, found in one sweep."""
+    require_itinerary(db, itinerary_id, current_user)
+    rows = (
+        db.query(
+            models.Activity.activity_id,
+            models.Activity.day_no,
+            models.Activity.start_time,
+            models.Activity.end_time,
+        )
+        .filter(models.Activity.itinerary_id == itinerary_id)
+        .all()
+    )
+    return [schemas.ActivityConflict(**vars(c)) for c in find_all_conflicts(rows)]
 
 
 @router.put("/{itinerary_id}", response_model=schemas.ItineraryRead)
@@ -70,13 +185,20 @@ def update_itinerary(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user),
 ):
-    itinerary = _get_itinerary_or_404(itinerary_id, db)
-    _enforce_owner_or_admin(itinerary, current_user)
-    for key, value in payload.dict(exclude_unset=True).items():
-        setattr(itinerary, key, value)
+    itinerary = update_owned(
+        db,
+        models.Itinerary,
+        models.Itinerary.itinerary_id,
+        itinerary_id,
+        itinerary_scope(current_user),
+        payload.dict(exclude_unset=True),
+    )
+    if not itinerary:
+        raise not_found("Itinerary")
+    # Serialize before commit expires the returned row
+    result = schemas.ItineraryRead.model_validate(itinerary)
     db.commit()
-    db.refresh(itinerary)
-    return itinerary
+    return result
 
 
 @router.delete("/{itinerary_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -85,9 +207,15 @@ def delete_itinerary(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user),
 ):
-    itinerary = _get_itinerary_or_404(itinerary_id, db)
-    _enforce_owner_or_admin(itinerary, current_user)
-    db.delete(itinerary)
+    # Activities, expenses and city links go with it via ON DELETE CASCADE
+    if not delete_owned(
+        db,
+        models.Itinerary,
+        models.Itinerary.itinerary_id,
+        itinerary_id,
+        itinerary_scope(current_user),
+    ):
+        raise not_found("Itinerary")
     db.commit()
 
 
@@ -98,14 +226,22 @@ def add_city_to_itinerary(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user),
 ):
-    itinerary = _get_itinerary_or_404(itinerary_id, db)
-    _enforce_owner_or_admin(itinerary, current_user)
-    city = db.query(models.City).get(city_id)
-    if not city:
-        raise HTTPException(status_code=404, detail="City not found")
-    if city in itinerary.cities:
+    link = models.itinerary_cities.c
+    row = select(literal(itinerary_id), literal(city_id)).where(
+        owned_itinerary(itinerary_id, current_user),
+        select(models.City.city_id).where(models.City.city_id == city_id).exists(),
+    )
+    try:
+        added = db.execute(
+            insert(models.itinerary_cities).from_select([link.itinerary_id, link.city_id], row)
+        ).rowcount
+    except IntegrityError:
+        db.rollback()
         raise HTTPException(status_code=400, detail="City already in itinerary")
-    itinerary.cities.append(city)
+    if not added:
+        # Only the failure path pays for finding out which check failed
+        require_itinerary(db, itinerary_id, current_user)
+        raise not_found("City")
     db.commit()
     return {"detail": "City added"}
 
@@ -117,29 +253,74 @@ def remove_city_from_itinerary(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user),
 ):
-    itinerary = _get_itinerary_or_404(itinerary_id, db)
-    _enforce_owner_or_admin(itinerary, current_user)
-    city = db.query(models.City).get(city_id)
-    if not city or city not in itinerary.cities:
+    link = models.itinerary_cities.c
+    removed = db.execute(
+        delete(models.itinerary_cities).where(
+            link.itinerary_id == itinerary_id,
+            link.city_id == city_id,
+            owned_itinerary(itinerary_id, current_user),
+        )
+    ).rowcount
+    if not removed:
+        require_itinerary(db, itinerary_id, current_user)
         raise HTTPException(status_code=404, detail="City not linked to itinerary")
-    itinerary.cities.remove(city)
     db.commit()
 
 
+# nginx's "client closed request"; nobody is left to read it
+CLIENT_CLOSED_REQUEST = 499
+
+
+def _plan(
+    db: Session, req: PlanningRequest, request: Request, timeout: float | None, allow_partial: bool
+):
+    """
+    Run the planner under a deadline, stopping if the client disconnects.
+    Returns (activities, partial); raises 504 if the deadline left nothing
+    usable and 499 if the client is gone, before anything is written.
+    """
+    def disconnected() -> bool:
+        # Sync routes run in a worker thread; ask the event loop
+        return from_thread.run(request.is_disconnected)
+
+    deadline = PlanningDeadline.after(timeout or settings.plan_timeout, disconnected)
+    try:
+        planned = build_itinerary_plan(db, req, deadline)
+        deadline.check_cancelled()
+    except PlanningCancelled:
+        db.rollback()
+        raise HTTPException(status_code=CLIENT_CLOSED_REQUEST, detail="Client disconnected")
+    if deadline.hit and (not planned or not allow_partial):
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail="Planning did not finish within the time limit",
+        )
+    return planned, deadline.hit
+
+
 @router.post("/{itinerary_id}/plan", status_code=201)
 def plan_itinerary(
     itinerary_id: int,
+    request: Request,
     daily_budget: float | None = None,
     max_places_per_day: int = 3,
+    timeout: float | None = Query(None, gt=0, le=settings.plan_max_timeout, description="seconds"),
+    allow_partial: bool = True,
+    _admitted: None = Depends(admission("plan")),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user),
 ):
     """
     Use a simple CSP-style planner to populate activities for an itinerary
     based on its cities, date range and optional budget constraints.
+    Planning stops after ``timeout`` seconds (PLAN_TIMEOUT_SECONDS by
+    default) and keeps what it has ("partial": true) unless ``allow_partial``
+    is false.
     """
-    itinerary = _get_itinerary_or_404(itinerary_id, db)
-    _enforce_owner_or_admin(itinerary, current_user)
+    itinerary = get_owned_itinerary_or_404(
+        db, itinerary_id, current_user, selectinload(models.Itinerary.cities)
+    )
 
     if not itinerary.cities:
         raise HTTPException(status_code=400, detail="Add at least one city first")
@@ -153,7 +334,7 @@ def plan_itinerary(
         max_places_per_day=max_places_per_day,
     )
 
-    planned = build_itinerary_plan(db, req)
+    planned, partial = _plan(db, req, request, timeout, allow_partial)
 
     # clear existing auto activities (for simplicity we just append now)
     for p in planned:
@@ -172,14 +353,21 @@ def plan_itinerary(
         )
         db.add(activity)
 
+    budget.record_activity_cost(
+        db, itinerary.itinerary_id, sum(budget.money(p.cost) for p in planned), count=len(planned)
+    )
     db.commit()
-    return {"detail": f"Planned {len(planned)} activities", "count": len(planned)}
+    return {"detail": f"Planned {len(planned)} activities", "count": len(planned), "partial": partial}
 
 
 @router.post("/{itinerary_id}/plan-custom", status_code=201)
 def plan_itinerary_custom(
     itinerary_id: int,
     payload: schemas.CustomPlanRequest,
+    request: Request,
+    timeout: float | None = Query(None, gt=0, le=settings.plan_max_timeout, description="seconds"),
+    allow_partial: bool = True,
+    _admitted: None = Depends(admission("plan-custom")),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user),
 ):
@@ -188,8 +376,9 @@ def plan_itinerary_custom(
     """
     from datetime import datetime
     
-    itinerary = _get_itinerary_or_404(itinerary_id, db)
-    _enforce_owner_or_admin(itinerary, current_user)
+    itinerary = get_owned_itinerary_or_404(
+        db, itinerary_id, current_user, selectinload(models.Itinerary.cities)
+    )
 
     if not itinerary.cities:
         raise HTTPException(status_code=400, detail="Add at least one city first")
@@ -205,14 +394,21 @@ def plan_itinerary_custom(
         max_places_per_day=payload.max_places_per_day,
     )
 
-    planned = build_itinerary_plan(db, req)
+    planned, partial = _plan(db, req, request, timeout, allow_partial)
 
     # Clear existing activities? Or append? 
     # Usually planning replaces the schedule, so let's clear for this itinerary
     # But maybe user wants to keep manual ones? 
     # For now, let's just append but maybe we should delete old ones to avoid duplicates
     # Let's delete old auto-generated ones or just all for this itinerary if re-planning
-    db.query(models.Activity).filter(models.Activity.itinerary_id == itinerary_id).delete()
+    removed_costs = db.scalars(
+        delete(models.Activity)
+        .where(models.Activity.itinerary_id == itinerary_id)
+        .returning(models.Activity.estimated_cost)
+    ).all()
+    budget.remove_activity_cost(
+        db, itinerary_id, sum(budget.money(cost) for cost in removed_costs), count=len(removed_costs)
+    )
 
     for p in planned:
         # Convert string times to python time objects
@@ -230,13 +426,21 @@ def plan_itinerary_custom(
         )
         db.add(activity)
 
+    budget.record_activity_cost(
+        db, itinerary.itinerary_id, sum(budget.money(p.cost) for p in planned), count=len(planned)
+    )
     db.commit()
-    return {"detail": f"Planned {len(planned)} activities", "count": len(planned), "activities": planned}
+    return {
+        "detail": f"Planned {len(planned)} activities",
+        "count": len(planned),
+        "partial": partial,
+        "activities": planned,
+    }
 
 
 @router.get("/recommend/top-cities", response_model=list[schemas.CityRead])
 def recommend_top_cities(
-    limit: int = 5, db: Session = Depends(get_db)
+    limit: int = 5, db: Session = Depends(get_read_db)
 ):
     """
     Recommendation endpoint:
@@ -0,0 +1,17 @@
+from typing import Dict
+
+from fastapi import APIRouter, Depends
+
+from .. import models
+from ..admission import controllers
+from ..auth import get_current_admin_async
+
+router = APIRouter(prefix="/metrics", tags=["metrics"])
+
+
+@router.get("/admission")
+async def admission_metrics(
+    current_user: models.User = Depends(get_current_admin_async),
+) -> Dict[str, dict]:
+    """Queue depth, running count and rejections per guarded route (this worker only)."""
+    return {name: limiter.snapshot() for name, limiter in controllers.items()}
@@ -1,77 +1,273 @@
-from typing import List
+import json
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from .. import models, schemas
-from ..auth import get_current_admin, get_db
+from .. import geo, models, schemas, search
+from ..auth import get_async_db, get_async_read_db, get_current_admin_async
+from ..catalog import catalog
+from ..http_cache import catalog_cache
+from ..pagination import NEXT_CURSOR_HEADER, Keyset, PageParams, page_params
 
 router = APIRouter(prefix="/places", tags=["places"])
 
+PLACE_ORDER = Keyset((models.Place.place_name, False), (models.Place.place_id, False))
+# Served by idx_places_city_name (city_id, place_name, place_id)
+PLACES_BY_CITY_ORDER = Keyset(
+    (models.Place.city_id, False), (models.Place.place_name, False), (models.Place.place_id, False)
+)
+
+# Fields that may be requested from /places/by-city via ?fields=
+PLACE_FIELDS = tuple(schemas.PlaceRead.model_fields)
+MAX_CITIES_PER_REQUEST = 50
+MAX_SEARCH_RESULTS = 50
+MAX_NEARBY_RADIUS_KM = 500
+
+
+async def _get_place_or_404(place_id: int, db: AsyncSession) -> models.Place:
+    place = await db.get(models.Place, place_id)
+    if not place:
+        raise HTTPException(status_code=404, detail="Place not found")
+    return place
+
+
+async def _ensure_city_exists(city_id: int, db: AsyncSession) -> None:
+    if not await db.get(models.City, city_id):
+        raise HTTPException(status_code=404, detail="City not found")
+
 
 @router.post("/", response_model=schemas.PlaceRead, status_code=status.HTTP_201_CREATED)
-def create_place(
+async def create_place(
     payload: schemas.PlaceCreate,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_admin_async),
 ):
-    city = db.query(models.City).get(payload.city_id)
-    if not city:
-        raise HTTPException(status_code=404, detail="City not found")
+    await _ensure_city_exists(payload.city_id, db)
     place = models.Place(**payload.dict())
+    place.latitude, place.longitude = geo.coordinates(place.location)
     db.add(place)
-    db.commit()
-    db.refresh(place)
+    await db.commit()
+    await run_in_threadpool(catalog.changed, "places")
+    await db.refresh(place)
     return place
 
 
-@router.get("/", response_model=List[schemas.PlaceRead])
-def list_places(city_id: int | None = None, db: Session = Depends(get_db)):
-    query = db.query(models.Place)
-    if city_id:
-        query = query.filter(models.Place.city_id == city_id)
-    return query.order_by(models.Place.place_name).all()
+@router.get(
+    "/", response_model=List[schemas.PlaceRead], dependencies=[Depends(catalog_cache("places"))]
+)
+async def list_places(
+    response: Response,
+    city_id: int | None = None,
+    page: PageParams = Depends(page_params),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    async def load():
+        query = select(models.Place)
+        if city_id:
+            query = query.where(models.Place.city_id == city_id)
+        result = await db.execute(PLACE_ORDER.apply(query, page))
+        rows, cursor = PLACE_ORDER.split(result.scalars().all(), page)
+        return [schemas.PlaceRead.model_validate(p) for p in rows], cursor
 
+    places, cursor = await catalog.get_or_load(
+        ("places", city_id, page.cursor, page.limit), ("places",), load
+    )
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
+    return places
 
-@router.get("/{place_id}", response_model=schemas.PlaceRead)
-def get_place(place_id: int, db: Session = Depends(get_db)):
-    place = db.query(models.Place).get(place_id)
-    if not place:
-        raise HTTPException(status_code=404, detail="Place not found")
-    return place
+
+@router.get("/by-city")
+async def list_places_by_city(
+    city_ids: List[int] = Query(..., max_length=MAX_CITIES_PER_REQUEST),
+    category: List[str] | None = Query(None),
+    fields: str | None = Query(None, description="Comma-separated PlaceRead fields"),
+    page: PageParams = Depends(page_params),
+    cache_headers: Dict[str, str] = Depends(catalog_cache("places")),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    """
+    Places for several cities, grouped by city id:
+    ``{"<city_id>": [place, ...]}``. Every requested city is present, with
+    an empty list if it has no matching places on this page.
+
+    Paginated like the list routes (``limit`` places per page, cursor in
+    ``X-Next-Cursor``); pages run city by city, so one city's places may
+    continue on the next page and clients merge the lists per city.
+    """
+    selected = [f.strip() for f in fields.split(",") if f.strip()] if fields else list(PLACE_FIELDS)
+    unknown = [f for f in selected if f not in PLACE_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+
+    async def load() -> Tuple[bytes, Optional[str]]:
+        Place = models.Place
+        # The sort keys come first (for the cursor), then the requested fields
+        keys = [col for col, _ in PLACES_BY_CITY_ORDER.keys]
+        columns = [getattr(Place, f) for f in selected]
+        query = select(*keys, *columns).where(Place.city_id.in_(city_ids))
+        if category:
+            query = query.where(Place.category.in_(category))
+        result = await db.execute(PLACES_BY_CITY_ORDER.apply(query, page))
+        rows, cursor = PLACES_BY_CITY_ORDER.split(result.all(), page)
+
+        grouped: dict[str, list] = {str(cid): [] for cid in dict.fromkeys(city_ids)}
+        for row in rows:
+            grouped[str(row.city_id)].append(
+                {
+                    f: float(v) if isinstance(v, Decimal) else v
+                    for f, v in zip(selected, row[len(keys):])
+                }
+            )
+        return json.dumps(grouped, separators=(",", ":")).encode(), cursor
+
+    key = (
+        "places-by-city",
+        tuple(city_ids),
+        tuple(category or ()),
+        tuple(selected),
+        page.cursor,
+        page.limit,
+    )
+    body, cursor = await catalog.get_or_load(key, ("places",), load)
+    headers = dict(cache_headers)
+    if cursor:
+        headers[NEXT_CURSOR_HEADER] = cursor
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@router.get(
+    "/search",
+    response_model=List[schemas.PlaceRead],
+    dependencies=[Depends(catalog_cache("places"))],
+)
+async def search_places(
+    q: str = Query(..., min_length=1, max_length=200),
+    city_id: int | None = None,
+    category: str | None = None,
+    limit: int = Query(20, ge=1, le=MAX_SEARCH_RESULTS),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    """Places whose name or description contains every word of ``q`` (as a prefix), best first."""
+    async def load():
+        places = await search.search_places(db, q, limit, city_id=city_id, category=category)
+        return [schemas.PlaceRead.model_validate(p) for p in places]
+
+    key = ("place-search", " ".join(search.search_terms(q)), city_id, category, limit)
+    return await catalog.get_or_load(key, ("places",), load)
+
+
+@router.get(
+    "/autocomplete",
+    response_model=List[schemas.PlaceSuggestion],
+    dependencies=[Depends(catalog_cache("places"))],
+)
+async def autocomplete_places(
+    q: str = Query(..., min_length=1, max_length=100),
+    city_id: int | None = None,
+    limit: int = Query(10, ge=1, le=MAX_SEARCH_RESULTS),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    """Place names starting with ``q``, or with a word starting with ``q``, from memory."""
+    index = await catalog.get_or_load(
+        ("place-name-index",), ("places",), lambda: search.load_name_index(db)
+    )
+    return [
+        schemas.PlaceSuggestion(place_id=place_id, city_id=place_city, place_name=name)
+        for place_id, place_city, name in index.complete(q, limit, city_id=city_id)
+    ]
+
+
+@router.get(
+    "/nearby",
+    response_model=List[schemas.NearbyPlace],
+    dependencies=[Depends(catalog_cache("places"))],
+)
+async def nearby_places(
+    lat: float | None = Query(None, ge=-90, le=90),
+    lon: float | None = Query(None, ge=-180, le=180),
+    place_id: int | None = None,
+    radius: float | None = Query(None, gt=0, le=MAX_NEARBY_RADIUS_KM, description="km"),
+    k: int = Query(10, ge=1, le=MAX_SEARCH_RESULTS),
+    category: str | None = None,
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    """The ``k`` places closest to (lat, lon), or to another place, nearest first."""
+    if place_id is not None:
+        origin = await _get_place_or_404(place_id, db)
+        lat, lon = geo.coordinates(origin.location)
+        if lat is None:
+            raise HTTPException(status_code=400, detail="Place has no coordinates")
+    elif lat is None or lon is None:
+        raise HTTPException(status_code=400, detail="Pass lat and lon, or place_id")
+
+    async def load():
+        grid = await catalog.get_or_load(("place-grid",), ("places",), lambda: geo.load_place_grid(db))
+
+        def accept(pid: int) -> bool:
+            return pid != place_id and (category is None or grid.categories.get(pid) == category)
+
+        found = grid.nearest(lat, lon, k, radius_km=radius, accept=accept)
+        if not found:
+            return []
+        result = await db.execute(
+            select(models.Place).where(models.Place.place_id.in_([pid for pid, _ in found]))
+        )
+        places = {p.place_id: p for p in result.scalars()}
+        return [
+            schemas.NearbyPlace(
+                **schemas.PlaceRead.model_validate(places[pid]).dict(), distance_km=round(km, 3)
+            )
+            for pid, km in found
+            if pid in places
+        ]
+
+    key = ("places-nearby", round(lat, 6), round(lon, 6), place_id, radius, k, category)
+    return await catalog.get_or_load(key, ("places",), load)
+
+
+@router.get(
+    "/{place_id}", response_model=schemas.PlaceRead, dependencies=[Depends(catalog_cache("places"))]
+)
+async def get_place(place_id: int, db: AsyncSession = Depends(get_async_read_db)):
+    async def load():
+        return schemas.PlaceRead.model_validate(await _get_place_or_404(place_id, db))
+
+    return await catalog.get_or_load(("place", place_id), ("places",), load)
 
 
 @router.put("/{place_id}", response_model=schemas.PlaceRead)
-def update_place(
+async def update_place(
     place_id: int,
     payload: schemas.PlaceUpdate,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_admin_async),
 ):
-    place = db.query(models.Place).get(place_id)
-    if not place:
-        raise HTTPException(status_code=404, detail="Place not found")
+    place = await _get_place_or_404(place_id, db)
     data = payload.dict(exclude_unset=True)
     if "city_id" in data:
-        city = db.query(models.City).get(data["city_id"])
-        if not city:
-            raise HTTPException(status_code=404, detail="City not found")
+        await _ensure_city_exists(data["city_id"], db)
     for key, value in data.items():
         setattr(place, key, value)
-    db.commit()
-    db.refresh(place)
+    if "location" in data:
+        place.latitude, place.longitude = geo.coordinates(place.location)
+    await db.commit()
+    await run_in_threadpool(catalog.changed, "places")
+    await db.refresh(place)
     return place
 
 
 @router.delete("/{place_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_place(
+async def delete_place(
     place_id: int,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_admin_async),
 ):
-    place = db.query(models.Place).get(place_id)
-    if not place:
-        raise HTTPException(status_code=404, detail="Place not found")
-    db.delete(place)
-    db.commit()
-
+    place = await _get_place_or_404(place_id, db)
+    await db.delete(place)
+    await db.commit()
+    await run_in_threadpool(catalog.changed, "places")
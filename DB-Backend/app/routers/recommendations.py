@@ -1,11 +1,15 @@
 from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy import func, distinct
+from sqlalchemy import func, distinct, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
 from pydantic import BaseModel
 
 from .. import models, schemas
-from ..auth import get_current_user, get_db
+from ..auth import get_async_read_db, get_current_user_async
+from ..catalog import catalog
+from ..http_cache import catalog_cache
+from ..recommender import live_recommendations, precomputed_recommendations
 
 router = APIRouter(prefix="/recommendations", tags=["recommendations"])
 
@@ -16,51 +20,56 @@ class RecommendationRequest(BaseModel):
     limit: int = 20
 
 
-@router.get("/categories")
-def get_categories(db: Session = Depends(get_db)):
+@router.get("/categories", dependencies=[Depends(catalog_cache("places"))])
+async def get_categories(db: AsyncSession = Depends(get_async_read_db)):
     """Get all unique place categories"""
-    categories = db.query(distinct(models.Place.category)).filter(
-        models.Place.category.isnot(None)
-    ).all()
-    return [{"category": cat[0]} for cat in categories if cat[0]]
+    async def load():
+        result = await db.execute(
+            select(distinct(models.Place.category)).where(models.Place.category.isnot(None))
+        )
+        return [{"category": cat[0]} for cat in result.all() if cat[0]]
+
+    return await catalog.get_or_load("categories", ("places",), load)
 
 
 @router.post("/places")
-def recommend_places(
+async def recommend_places(
     request: RecommendationRequest,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: models.User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
     Recommend places based on user preferences.
-    - New users: Filter by selected categories
+    - New users: Filter by selected categories, ranked by review rating
     - Existing users: Use categories + analyze past itineraries
+    Both are precomputed by precompute_recommendations.py and scored live
+    only when the batch job has no rows for them yet.
     """
     
-    # Base query: filter by categories
-    query = db.query(models.Place).filter(
-        models.Place.category.in_(request.categories)
+    personalize = request.user_type == "existing"
+    # New users share the batch job's non-personalized ranking (no user id)
+    place_ids = await db.run_sync(
+        precomputed_recommendations,
+        current_user.user_id if personalize else None,
+        request.categories,
+        request.limit,
     )
-    
-    if request.user_type == "existing":
-        # For existing users, boost places from cities they've visited
-        user_itineraries = db.query(models.Itinerary).filter(
-            models.Itinerary.user_id == current_user.user_id
-        ).all()
-        
-        visited_city_ids = set()
-        for itin in user_itineraries:
-            for city in itin.cities:
-                visited_city_ids.add(city.city_id)
-        
-        if visited_city_ids:
-            # Prioritize places from visited cities
-            query = query.order_by(
-                models.Place.city_id.in_(list(visited_city_ids)).desc()
-            )
-    
-    # Order by rating (if available) or just by name
-    places = query.limit(request.limit).all()
+    if place_ids is None:
+        place_ids = await db.run_sync(
+            live_recommendations,
+            current_user.user_id,
+            request.categories,
+            request.limit,
+            personalize=personalize,
+        )
+
+    result = await db.execute(
+        select(models.Place)
+        .options(joinedload(models.Place.city))
+        .where(models.Place.place_id.in_(place_ids))
+    )
+    places_by_id = {p.place_id: p for p in result.scalars()}
+    places = [places_by_id[pid] for pid in place_ids if pid in places_by_id]
     
     # Group by category
     result = {}
@@ -81,12 +90,12 @@ def recommend_places(
 
 
 @router.get("/top-cities")
-def get_top_cities(limit: int = 10, db: Session = Depends(get_db)):
+async def get_top_cities(limit: int = 10, db: AsyncSession = Depends(get_async_read_db)):
     """Get top-rated cities based on average review ratings of their places"""
     
     # Calculate average rating per city
-    city_ratings = (
-        db.query(
+    city_ratings = await db.execute(
+        select(
             models.City.city_id,
             models.City.name,
             func.avg(models.Review.rating).label("avg_rating"),
@@ -97,7 +106,6 @@ def get_top_cities(limit: int = 10, db: Session = Depends(get_db)):
         .group_by(models.City.city_id, models.City.name)
         .order_by(func.avg(models.Review.rating).desc())
         .limit(limit)
-        .all()
     )
     
     return [
@@ -1,16 +1,30 @@
 from typing import List
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session, joinedload
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
 
-from .. import models, schemas
-from ..auth import get_current_user, get_db
+from .. import models, ratings, schemas
+from ..auth import get_async_db, get_async_read_db, get_current_user_async
+from ..exporting import ExportFormat, stream_export_async
+from ..pagination import Keyset, PageParams, page_params
 
 router = APIRouter(prefix="/reviews", tags=["reviews"])
 
+REVIEW_ORDER = Keyset((models.Review.review_date, True), (models.Review.review_id, True))
 
-def _get_review_or_404(review_id: int, db: Session) -> models.Review:
-    review = db.query(models.Review).get(review_id)
+
+async def _get_review_or_404(review_id: int, db: AsyncSession) -> models.Review:
+    # ReviewRead embeds the place, and relationships cannot be lazy-loaded on
+    # an async session, so it is always loaded up front.
+    result = await db.execute(
+        select(models.Review)
+        .options(joinedload(models.Review.place))
+        .where(models.Review.review_id == review_id)
+        .execution_options(populate_existing=True)
+    )
+    review = result.scalar_one_or_none()
     if not review:
         raise HTTPException(status_code=404, detail="Review not found")
     return review
@@ -22,61 +36,101 @@ def _ensure_review_owner(review: models.Review, current_user: models.User) -> No
 
 
 @router.post("/", response_model=schemas.ReviewRead, status_code=status.HTTP_201_CREATED)
-def create_review(
+async def create_review(
     payload: schemas.ReviewCreate,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_user_async),
 ):
     if payload.user_id != current_user.user_id and current_user.user_type != "admin":
         raise HTTPException(status_code=403, detail="Cannot create for other users")
-    place = db.query(models.Place).get(payload.place_id)
+    place = await db.get(models.Place, payload.place_id)
     if not place:
         raise HTTPException(status_code=404, detail="Place not found")
     review = models.Review(**payload.dict())
     db.add(review)
-    db.commit()
-    db.refresh(review)
-    return review
+    await db.run_sync(ratings.record_review, review.place_id, review.rating)
+    await db.commit()
+    return await _get_review_or_404(review.review_id, db)
 
 
 @router.get("/", response_model=List[schemas.ReviewRead])
-def list_reviews(
+async def list_reviews(
+    response: Response,
     place_id: int | None = None,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
+    page: PageParams = Depends(page_params),
+    export_format: ExportFormat | None = Query(None, alias="format"),
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: models.User = Depends(get_current_user_async),
 ):
-    query = db.query(models.Review)
+    query = select(models.Review)
     if place_id:
-        query = query.filter(models.Review.place_id == place_id)
+        query = query.where(models.Review.place_id == place_id)
     elif current_user.user_type != "admin":
-        query = query.filter(models.Review.user_id == current_user.user_id)
-    return query.options(joinedload(models.Review.place)).order_by(models.Review.review_date.desc()).all()
+        query = query.where(models.Review.user_id == current_user.user_id)
+    if export_format:
+        return stream_export_async(
+            query.order_by(*REVIEW_ORDER.order_by()), export_format, "reviews"
+        )
+    result = await db.execute(
+        REVIEW_ORDER.apply(query.options(joinedload(models.Review.place)), page)
+    )
+    return REVIEW_ORDER.finish(result.scalars().all(), page, response)
+
+
+@router.get("/places/{place_id}/summary", response_model=schemas.PlaceRatingSummary)
+async def place_review_summary(
+    place_id: int,
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: models.User = Depends(get_current_user_async),
+):
+    """Review count, average rating and star histogram for a place's header."""
+    summary = await db.run_sync(ratings.load_summary, place_id)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="Place not found")
+    return summary
+
+
+@router.get("/places/{place_id}", response_model=List[schemas.ReviewFeedItem])
+async def place_review_feed(
+    place_id: int,
+    response: Response,
+    page: PageParams = Depends(page_params),
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: models.User = Depends(get_current_user_async),
+):
+    """A place's reviews, newest first, one page at a time (cursor in X-Next-Cursor)."""
+    query = select(models.Review).where(models.Review.place_id == place_id)
+    result = await db.execute(REVIEW_ORDER.apply(query, page))
+    return REVIEW_ORDER.finish(result.scalars().all(), page, response)
 
 
 @router.put("/{review_id}", response_model=schemas.ReviewRead)
-def update_review(
+async def update_review(
     review_id: int,
     payload: schemas.ReviewUpdate,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_user_async),
 ):
-    review = _get_review_or_404(review_id, db)
+    review = await _get_review_or_404(review_id, db)
     _ensure_review_owner(review, current_user)
+    previous_rating = review.rating
     for key, value in payload.dict(exclude_unset=True).items():
         setattr(review, key, value)
-    db.commit()
-    db.refresh(review)
-    return review
+    if review.rating != previous_rating:
+        await db.run_sync(ratings.remove_review, review.place_id, previous_rating)
+        await db.run_sync(ratings.record_review, review.place_id, review.rating)
+    await db.commit()
+    return await _get_review_or_404(review_id, db)
 
 
 @router.delete("/{review_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_review(
+async def delete_review(
     review_id: int,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_user_async),
 ):
-    review = _get_review_or_404(review_id, db)
+    review = await _get_review_or_404(review_id, db)
     _ensure_review_owner(review, current_user)
-    db.delete(review)
-    db.commit()
-
+    await db.delete(review)
+    await db.run_sync(ratings.remove_review, review.place_id, review.rating)
+    await db.commit()
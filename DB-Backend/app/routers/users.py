@@ -1,30 +1,98 @@
 from typing import List
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from anyio import from_thread
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from sqlalchemy.orm import Session
 
-from .. import models, schemas
-from ..auth import get_current_admin, get_current_user, get_db, hash_password
+from .. import models, ratings, schemas
+from ..auth import get_current_admin, get_current_user, get_db, get_read_db, hash_password
+from ..pagination import Keyset, PageParams, page_params
+from ..principal_cache import principal_cache
 
 router = APIRouter(prefix="/users", tags=["users"])
 
+USER_ORDER = Keyset((models.User.user_id, False))
+
 
 @router.get("/me", response_model=schemas.UserRead)
 def read_current_user(current_user: models.User = Depends(get_current_user)):
     return current_user
 
 
+@router.get("/me/preferences", response_model=List[schemas.UserPreferenceRead])
+def list_my_preferences(
+    db: Session = Depends(get_read_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    return (
+        db.query(models.UserPreference)
+        .filter(models.UserPreference.user_id == current_user.user_id)
+        .order_by(models.UserPreference.preference_key)
+        .all()
+    )
+
+
+@router.put("/me/preferences/{preference_key}", response_model=schemas.UserPreferenceRead)
+def set_my_preference(
+    preference_key: str,
+    payload: schemas.UserPreferenceSet,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """Create or replace one preference, e.g. ``category:Museum`` with weight 8."""
+    if not preference_key.strip() or len(preference_key) > 100:
+        raise HTTPException(status_code=400, detail="Invalid preference key")
+    preference = (
+        db.query(models.UserPreference)
+        .filter(
+            models.UserPreference.user_id == current_user.user_id,
+            models.UserPreference.preference_key == preference_key,
+        )
+        .one_or_none()
+    )
+    if preference is None:
+        preference = models.UserPreference(user_id=current_user.user_id, preference_key=preference_key)
+        db.add(preference)
+    preference.preference_value = payload.preference_value
+    preference.weight = payload.weight
+    db.commit()
+    db.refresh(preference)
+    return preference
+
+
+@router.delete("/me/preferences/{preference_key}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_my_preference(
+    preference_key: str,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    removed = (
+        db.query(models.UserPreference)
+        .filter(
+            models.UserPreference.user_id == current_user.user_id,
+            models.UserPreference.preference_key == preference_key,
+        )
+        .delete()
+    )
+    if not removed:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Preference not found")
+    db.commit()
+
+
 @router.get("/", response_model=List[schemas.UserRead])
 def list_users(
-    db: Session = Depends(get_db), current_user: models.User = Depends(get_current_admin)
+    response: Response,
+    page: PageParams = Depends(page_params),
+    db: Session = Depends(get_read_db),
+    current_user: models.User = Depends(get_current_admin),
 ):
-    return db.query(models.User).all()
+    return USER_ORDER.finish(USER_ORDER.apply(db.query(models.User), page).all(), page, response)
 
 
 @router.get("/{user_id}", response_model=schemas.UserRead)
 def get_user(
     user_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: models.User = Depends(get_current_admin),
 ):
     user = db.query(models.User).get(user_id)
@@ -41,10 +109,12 @@ def update_me(
 ):
     data = payload.dict(exclude_unset=True)
     if "password" in data:
-        current_user.password_hash = hash_password(data.pop("password"))
+        # Sync route: wait for the hasher on the event loop
+        current_user.password_hash = from_thread.run(hash_password, data.pop("password"))
     for key, value in data.items():
         setattr(current_user, key, value)
     db.commit()
+    principal_cache.invalidate_user(current_user.user_id)
     db.refresh(current_user)
     return current_user
 
@@ -58,5 +128,7 @@ def delete_user(
     user = db.query(models.User).get(user_id)
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    ratings.remove_user_reviews(db, user_id)
     db.delete(user)
     db.commit()
+    principal_cache.invalidate_user(user_id)
@@ -1,66 +1,222 @@
-from typing import List
+import codecs
+from datetime import date, timedelta
+from typing import AsyncIterator, List
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from .. import models, schemas
-from ..auth import get_current_admin, get_db
+from ..auth import get_async_db, get_async_read_db, get_current_admin_async
+from ..catalog import catalog
+from ..climatology import week_of_year
+from ..exporting import ExportFormat, stream_export_async
+from ..http_cache import catalog_cache
+from ..pagination import Keyset, PageParams, page_params
+from ..weather_ingest import (
+    INGEST_BATCH_SIZE,
+    WeatherBatch,
+    WeatherRowParser,
+    known_cities,
+    unknown_city_error,
+    upsert_weather,
+)
 
 router = APIRouter(prefix="/weather", tags=["weather"])
 
+WEATHER_ORDER = Keyset((models.Weather.date, True), (models.Weather.weather_id, True))
+
+
+async def _get_weather_or_404(weather_id: int, db: AsyncSession) -> models.Weather:
+    weather = await db.get(models.Weather, weather_id)
+    if not weather:
+        raise HTTPException(status_code=404, detail="Weather record not found")
+    return weather
+
 
 @router.post("/", response_model=schemas.WeatherRead, status_code=status.HTTP_201_CREATED)
-def create_weather_entry(
+async def create_weather_entry(
     payload: schemas.WeatherCreate,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_admin_async),
 ):
     weather = models.Weather(**payload.dict())
     db.add(weather)
-    db.commit()
-    db.refresh(weather)
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(
+            status_code=409, detail="Weather for this city and date already exists"
+        )
+    await run_in_threadpool(catalog.changed, "weather")
+    await db.refresh(weather)
     return weather
 
 
-@router.get("/", response_model=List[schemas.WeatherRead])
-def list_weather(db: Session = Depends(get_db)):
-    return db.query(models.Weather).order_by(models.Weather.date.desc()).all()
+@router.get(
+    "/", response_model=List[schemas.WeatherRead], dependencies=[Depends(catalog_cache("weather"))]
+)
+async def list_weather(
+    response: Response,
+    city_id: int | None = None,
+    date_from: date | None = Query(None, alias="from"),
+    date_to: date | None = Query(None, alias="to"),
+    page: PageParams = Depends(page_params),
+    export_format: ExportFormat | None = Query(None, alias="format"),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    """Weather rows, newest first; ``city_id`` + ``from``/``to`` use uq_weather_city_date."""
+    query = select(models.Weather)
+    if city_id:
+        query = query.where(models.Weather.city_id == city_id)
+    if date_from:
+        query = query.where(models.Weather.date >= date_from)
+    if date_to:
+        query = query.where(models.Weather.date <= date_to)
+    if export_format:
+        return stream_export_async(
+            query.order_by(*WEATHER_ORDER.order_by()), export_format, "weather"
+        )
+    result = await db.execute(WEATHER_ORDER.apply(query, page))
+    return WEATHER_ORDER.finish(result.scalars().all(), page, response)
+
 
+async def _request_lines(request: Request) -> AsyncIterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    pending = ""
+    async for chunk in request.stream():
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
 
-@router.get("/{weather_id}", response_model=schemas.WeatherRead)
-def get_weather(weather_id: int, db: Session = Depends(get_db)):
-    weather = db.query(models.Weather).get(weather_id)
-    if not weather:
-        raise HTTPException(status_code=404, detail="Weather record not found")
-    return weather
+
+async def _write_weather_batch(db: AsyncSession, rows: List[dict]) -> None:
+    known = await db.scalars(known_cities(r["city_id"] for r in rows))
+    error = unknown_city_error(rows, known)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
+    await db.execute(upsert_weather(db.bind.dialect.name, rows))
+
+
+@router.post("/bulk", response_model=schemas.WeatherIngestResult)
+async def bulk_ingest_weather(
+    request: Request,
+    fmt: ExportFormat = Query(ExportFormat.ndjson, alias="format"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_admin_async),
+):
+    """
+    Upsert many weather rows from an NDJSON or CSV request body, keyed on
+    (city_id, date). The body is streamed and written in batches inside one
+    transaction: any invalid row rejects the whole upload.
+    """
+    parser = WeatherRowParser(fmt)
+    batch = WeatherBatch()
+    received = upserted = 0
+    try:
+        async for line in _request_lines(request):
+            row = parser.feed(line)
+            if row is None:
+                continue
+            received += 1
+            batch.add(row)
+            if len(batch) >= INGEST_BATCH_SIZE:
+                rows = batch.take()
+                await _write_weather_batch(db, rows)
+                upserted += len(rows)
+        if len(batch):
+            rows = batch.take()
+            await _write_weather_batch(db, rows)
+            upserted += len(rows)
+    except ValueError as e:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+    await db.commit()
+    await run_in_threadpool(catalog.changed, "weather")
+    return schemas.WeatherIngestResult(received=received, upserted=upserted)
+
+
+@router.get(
+    "/climatology",
+    response_model=List[schemas.WeatherClimatologyRead],
+    dependencies=[Depends(catalog_cache("weather_climatology"))],
+)
+async def get_climatology(
+    city_id: int,
+    date_from: date | None = Query(None, alias="from"),
+    date_to: date | None = Query(None, alias="to"),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    """
+    Weekly weather normals for a city (see refresh_climatology.py), optionally
+    only the ISO weeks touched by ``from``..``to``.
+    """
+    weeks = None
+    if date_from and date_to:
+        if date_to < date_from:
+            raise HTTPException(status_code=400, detail="'to' must not be before 'from'")
+        days = min((date_to - date_from).days, 366)
+        weeks = sorted({week_of_year(date_from + timedelta(days=i)) for i in range(days + 1)})
+    elif date_from or date_to:
+        weeks = [week_of_year(date_from or date_to)]
+
+    async def load():
+        Climate = models.WeatherClimatology
+        query = select(Climate).where(Climate.city_id == city_id)
+        if weeks is not None:
+            query = query.where(Climate.week.in_(weeks))
+        result = await db.execute(query.order_by(Climate.week))
+        return [schemas.WeatherClimatologyRead.model_validate(r) for r in result.scalars().all()]
+
+    key = ("weather_climatology", city_id, tuple(weeks) if weeks is not None else None)
+    return await catalog.get_or_load(key, ("weather_climatology",), load)
+
+
+@router.get(
+    "/{weather_id}",
+    response_model=schemas.WeatherRead,
+    dependencies=[Depends(catalog_cache("weather"))],
+)
+async def get_weather(weather_id: int, db: AsyncSession = Depends(get_async_read_db)):
+    return await _get_weather_or_404(weather_id, db)
 
 
 @router.put("/{weather_id}", response_model=schemas.WeatherRead)
-def update_weather(
+async def update_weather(
     weather_id: int,
     payload: schemas.WeatherUpdate,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_admin_async),
 ):
-    weather = db.query(models.Weather).get(weather_id)
-    if not weather:
-        raise HTTPException(status_code=404, detail="Weather record not found")
+    weather = await _get_weather_or_404(weather_id, db)
     for key, value in payload.dict(exclude_unset=True).items():
         setattr(weather, key, value)
-    db.commit()
-    db.refresh(weather)
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(
+            status_code=409, detail="Weather for this city and date already exists"
+        )
+    await run_in_threadpool(catalog.changed, "weather")
+    await db.refresh(weather)
     return weather
 
 
 @router.delete("/{weather_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_weather(
+async def delete_weather(
     weather_id: int,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_admin_async),
 ):
-    weather = db.query(models.Weather).get(weather_id)
-    if not weather:
-        raise HTTPException(status_code=404, detail="Weather record not found")
-    db.delete(weather)
-    db.commit()
-
+    weather = await _get_weather_or_404(weather_id, db)
+    await db.delete(weather)
+    await db.commit()
+    await run_in_threadpool(catalog.changed, "weather")
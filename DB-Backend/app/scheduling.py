@@ -0,0 +1,171 @@
+"""Overlap detection for activities on the same itinerary day.
+
+A new interval [start, end) collides with any activity on the same
+(itinerary, day_no) that starts before ``end`` and ends after ``start``.
+The API keeps days non-overlapping, but rows written around it (the
+planner appends to existing days, manual SQL) may not be, so the checks
+never assume that only the latest-starting activity can collide: SQL
+scans the day's index range up to ``end`` for the first overlap, and the
+in-memory index looks at every interval starting before ``end``.
+Activities without both a start and an end time never conflict.
+"""
+import heapq
+from bisect import bisect_left, insort
+from dataclasses import dataclass
+from datetime import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from . import models
+
+
+@dataclass
+class Conflict:
+    day_no: Optional[int]
+    activity_id: int
+    conflicting_activity_id: int
+
+
+def validate_times(start: Optional[time], end: Optional[time]) -> None:
+    if start is not None and end is not None and end <= start:
+        raise HTTPException(status_code=400, detail="end_time must be after start_time")
+
+
+def _conflict_error(day_no: Optional[int], other_id: int) -> HTTPException:
+    # Activities not inserted yet (batch creates) carry negative placeholder ids
+    other = f"activity {other_id}" if other_id > 0 else "another new activity"
+    return HTTPException(status_code=409, detail=f"Overlaps {other} on day {day_no}")
+
+
+def find_conflict(
+    db: Session,
+    itinerary_id: int,
+    day_no: Optional[int],
+    start: Optional[time],
+    end: Optional[time],
+    exclude_activity_id: Optional[int] = None,
+) -> Optional[int]:
+    """Id of an activity overlapping [start, end) on that day, or None."""
+    if start is None or end is None:
+        return None
+    Activity = models.Activity
+    query = db.query(Activity.activity_id).filter(
+        Activity.itinerary_id == itinerary_id,
+        Activity.day_no.is_(None) if day_no is None else Activity.day_no == day_no,
+        Activity.start_time < end,
+        Activity.end_time > start,
+    )
+    if exclude_activity_id is not None:
+        query = query.filter(Activity.activity_id != exclude_activity_id)
+    # Range scan of idx_activities_itinerary_day (itinerary_id, day_no,
+    # start_time, activity_id), newest start first, stopping at the first hit
+    other = query.order_by(Activity.start_time.desc(), Activity.activity_id.desc()).first()
+    return other.activity_id if other else None
+
+
+def ensure_no_conflict(
+    db: Session,
+    itinerary_id: int,
+    day_no: Optional[int],
+    start: Optional[time],
+    end: Optional[time],
+    exclude_activity_id: Optional[int] = None,
+) -> None:
+    validate_times(start, end)
+    other = find_conflict(db, itinerary_id, day_no, start, end, exclude_activity_id)
+    if other is not None:
+        raise _conflict_error(day_no, other)
+
+
+class DayIntervals:
+    """Intervals of a single day, sorted by start."""
+
+    def __init__(self) -> None:
+        self._keys: List[Tuple[time, int]] = []  # (start, activity_id), sorted
+        self._ends: Dict[int, time] = {}
+        self._starts: Dict[int, time] = {}
+
+    def conflict(self, start: time, end: time) -> Optional[int]:
+        # Ends are not sorted if the day already overlaps, so check every
+        # interval that starts before ``end`` (a day holds a handful)
+        for _, activity_id in reversed(self._keys[: bisect_left(self._keys, (end, -1))]):
+            if self._ends[activity_id] > start:
+                return activity_id
+        return None
+
+    def add(self, activity_id: int, start: time, end: time) -> None:
+        insort(self._keys, (start, activity_id))
+        self._starts[activity_id] = start
+        self._ends[activity_id] = end
+
+    def remove(self, activity_id: int) -> None:
+        start = self._starts.pop(activity_id, None)
+        if start is None:
+            return
+        del self._ends[activity_id]
+        i = bisect_left(self._keys, (start, activity_id))
+        del self._keys[i]
+
+
+class ItinerarySchedule:
+    """In-memory per-day interval index for validating a batch of edits."""
+
+    def __init__(self) -> None:
+        self._days: Dict[Optional[int], DayIntervals] = {}
+        self._placement: Dict[int, Optional[int]] = {}
+
+    def _day(self, day_no: Optional[int]) -> DayIntervals:
+        return self._days.setdefault(day_no, DayIntervals())
+
+    def remove(self, activity_id: int) -> None:
+        if activity_id in self._placement:
+            self._day(self._placement.pop(activity_id)).remove(activity_id)
+
+    def place(
+        self,
+        activity_id: int,
+        day_no: Optional[int],
+        start: Optional[time],
+        end: Optional[time],
+        check: bool = True,
+    ) -> None:
+        """Add an activity, raising 409 if ``check`` and it overlaps the day."""
+        self.remove(activity_id)
+        if check:
+            validate_times(start, end)
+        if start is None or end is None:
+            return
+        day = self._day(day_no)
+        if check:
+            other = day.conflict(start, end)
+            if other is not None:
+                raise _conflict_error(day_no, other)
+        day.add(activity_id, start, end)
+        self._placement[activity_id] = day_no
+
+
+def find_all_conflicts(
+    activities: Iterable[Tuple[int, Optional[int], Optional[time], Optional[time]]],
+) -> List[Conflict]:
+    """Every overlapping pair, from one sweep over (activity_id, day_no, start, end) rows."""
+    timed = sorted(
+        (
+            (day_no is None, day_no or 0, start, end, activity_id, day_no)
+            for activity_id, day_no, start, end in activities
+            if start is not None and end is not None
+        ),
+    )
+    conflicts: List[Conflict] = []
+    active: List[Tuple[time, int]] = []  # min-heap of (end, activity_id)
+    current_day = None
+    for _, _, start, end, activity_id, day_no in timed:
+        if day_no != current_day:
+            active, current_day = [], day_no
+        while active and active[0][0] <= start:
+            heapq.heappop(active)
+        for _, other_id in active:
+            conflicts.append(Conflict(day_no, other_id, activity_id))
+        heapq.heappush(active, (end, activity_id))
+    return conflicts
@@ -1,7 +1,7 @@
 from datetime import date, datetime, time
-from typing import Optional, List
+from typing import Literal, Optional, List
 
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 
 
 class ORMBase(BaseModel):
@@ -79,6 +79,17 @@ class ItineraryRead(ORMBase, ItineraryBase):
     cities: List["CityRead"] = []
 
 
+class UserPreferenceSet(BaseModel):
+    preference_value: Optional[str] = None
+    weight: int = Field(1, ge=1, le=10)
+
+
+class UserPreferenceRead(ORMBase):
+    preference_key: str
+    preference_value: Optional[str] = None
+    weight: Optional[int] = None
+
+
 class CustomPlanRequest(BaseModel):
     place_ids: List[int]
     daily_start_time: str = "09:00"
@@ -115,6 +126,7 @@ class PlaceBase(BaseModel):
     category: Optional[str] = None
     location: Optional[dict] = None
     duration: Optional[float] = 2.0
+    entry_fee: Optional[float] = None
 
 
 class PlaceCreate(PlaceBase):
@@ -128,10 +140,23 @@ class PlaceUpdate(BaseModel):
     category: Optional[str] = None
     location: Optional[dict] = None
     duration: Optional[float] = None
+    entry_fee: Optional[float] = None
 
 
 class PlaceRead(ORMBase, PlaceBase):
     place_id: int
+    latitude: Optional[float] = None  # from location
+    longitude: Optional[float] = None
+
+
+class NearbyPlace(PlaceRead):
+    distance_km: float
+
+
+class PlaceSuggestion(BaseModel):
+    place_id: int
+    city_id: Optional[int] = None
+    place_name: str
 
 
 # ------------------- Activities ------------------- #
@@ -161,6 +186,33 @@ class ActivityRead(ORMBase, ActivityBase):
     activity_id: int
 
 
+class ActivityBatchValues(ActivityUpdate):
+    estimated_cost: Optional[float] = None
+
+
+class ActivityBatchOperation(BaseModel):
+    op: Literal["create", "update", "delete"]
+    activity_id: Optional[int] = None  # required for update and delete
+    values: Optional[ActivityBatchValues] = None  # required for create and update
+
+
+class ActivityBatchRequest(BaseModel):
+    itinerary_id: int
+    operations: List[ActivityBatchOperation]
+
+
+class ActivityConflict(BaseModel):
+    day_no: Optional[int] = None
+    activity_id: int
+    conflicting_activity_id: int
+
+
+class ActivityBatchResult(BaseModel):
+    created: List[ActivityRead] = []
+    updated: List[int] = []
+    deleted: List[int] = []
+
+
 # ------------------- Reviews ------------------- #
 class ReviewBase(BaseModel):
     user_id: int
@@ -185,6 +237,18 @@ class ReviewRead(ORMBase, ReviewBase):
     place: Optional["PlaceRead"] = None
 
 
+class ReviewFeedItem(ORMBase, ReviewBase):
+    """A review in a place's feed; the place itself is not repeated."""
+    review_id: int
+
+
+class PlaceRatingSummary(BaseModel):
+    place_id: int
+    review_count: int = 0
+    average_rating: Optional[float] = None
+    histogram: dict[int, int] = {}  # stars (1-5) -> number of reviews
+
+
 # ------------------- Weather ------------------- #
 class WeatherBase(BaseModel):
     city_id: int
@@ -207,6 +271,28 @@ class WeatherRead(ORMBase, WeatherBase):
     weather_id: int
 
 
+class WeatherIngestResult(BaseModel):
+    received: int  # rows parsed from the upload
+    upserted: int  # rows written after de-duplicating (city_id, date)
+
+
+class WeatherClimatologyRead(ORMBase):
+    city_id: int
+    week: int  # ISO week of year
+    sample_days: int
+    mean_min_temp: Optional[float] = None
+    mean_max_temp: Optional[float] = None
+    bad_weather_probability: float
+
+
+class DayOutlookRead(ORMBase):
+    date: date
+    source: str  # "forecast" or "climatology"
+    bad_weather_probability: float
+    min_temp: Optional[float] = None
+    max_temp: Optional[float] = None
+
+
 # ------------------- Expenses ------------------- #
 class ExpenseBase(BaseModel):
     itinerary_id: int
@@ -227,3 +313,44 @@ class ExpenseUpdate(BaseModel):
 
 class ExpenseRead(ORMBase, ExpenseBase):
     expense_id: int
+
+
+class ItineraryBudget(BaseModel):
+    itinerary_id: int
+    total_budget: Optional[float] = None
+    expense_total: float = 0.0
+    expense_count: int = 0
+    planned_activity_cost: float = 0.0
+    activity_count: int = 0
+    remaining: Optional[float] = None  # total_budget - expense_total
+    by_category: dict[str, float] = {}
+
+
+# ------------------- Itinerary detail (composite) ------------------- #
+class PlaceSummary(ORMBase):
+    place_id: int
+    city_id: Optional[int] = None
+    place_name: Optional[str] = None
+    category: Optional[str] = None
+    duration: Optional[float] = None
+
+
+class ActivityDetail(ActivityRead):
+    place: Optional[PlaceSummary] = None
+
+
+class ItineraryDay(BaseModel):
+    day_no: Optional[int] = None
+    activities: List[ActivityDetail] = []
+
+
+class ExpenseTotals(BaseModel):
+    total: float = 0.0
+    count: int = 0
+    by_category: dict[str, float] = {}
+    planned_activity_cost: float = 0.0
+
+
+class ItineraryFull(ItineraryRead):
+    days: List[ItineraryDay] = []
+    expense_totals: ExpenseTotals = ExpenseTotals()
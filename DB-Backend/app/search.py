@@ -0,0 +1,214 @@
+"""Place search: full-text queries in the database, autocomplete in memory.
+
+``/places/search`` runs in the database so the catalog never has to be
+shipped to the browser:
+
+* PostgreSQL: ``to_tsvector`` over name and description, served by the
+  GIN expression index ``idx_places_search`` (see models.py);
+* SQLite: an FTS5 external-content table ``places_fts`` kept in sync by
+  triggers, created whenever the schema is created;
+* anything else (or SQLite without FTS5): ``LIKE`` per search term.
+
+Every term is matched as a prefix, so "bad mos" finds "Badshahi Mosque".
+
+``/places/autocomplete`` answers from ``PlaceNameIndex``, a sorted array
+of normalized names (and word starts within them) searched with bisect.
+It is cached in ``app.catalog`` under the ``places`` table, so any place
+write rebuilds it on next use in every worker.
+"""
+from __future__ import annotations
+
+import re
+import unicodedata
+from bisect import bisect_left
+from typing import List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import column, event, func, or_, select, table, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import models
+from .database import Base
+
+MAX_SEARCH_TERMS = 8
+# Autocomplete stops looking after this many index entries (city filters)
+MAX_AUTOCOMPLETE_SCAN = 5000
+
+_TERM = re.compile(r"\w+", re.UNICODE)
+_fts = table("places_fts", column("rowid"))
+
+
+def normalize(value: str) -> str:
+    """Case- and accent-insensitive form used for matching."""
+    decomposed = unicodedata.normalize("NFKD", value.casefold())
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def search_terms(q: str) -> List[str]:
+    return _TERM.findall(normalize(q))[:MAX_SEARCH_TERMS]
+
+
+# ---------------------------------------------------------------- SQLite FTS5
+
+_FTS_DDL = (
+    "CREATE VIRTUAL TABLE places_fts USING fts5("
+    "place_name, description, content='places', content_rowid='place_id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "CREATE TRIGGER IF NOT EXISTS places_fts_ai AFTER INSERT ON places BEGIN "
+    "INSERT INTO places_fts(rowid, place_name, description) "
+    "VALUES (new.place_id, new.place_name, new.description); END",
+    "CREATE TRIGGER IF NOT EXISTS places_fts_ad AFTER DELETE ON places BEGIN "
+    "INSERT INTO places_fts(places_fts, rowid, place_name, description) "
+    "VALUES ('delete', old.place_id, old.place_name, old.description); END",
+    "CREATE TRIGGER IF NOT EXISTS places_fts_au AFTER UPDATE ON places BEGIN "
+    "INSERT INTO places_fts(places_fts, rowid, place_name, description) "
+    "VALUES ('delete', old.place_id, old.place_name, old.description); "
+    "INSERT INTO places_fts(rowid, place_name, description) "
+    "VALUES (new.place_id, new.place_name, new.description); END",
+    # Index the places that existed before the table did
+    "INSERT INTO places_fts(places_fts) VALUES ('rebuild')",
+)
+
+
+def _has_fts_table(conn: Connection) -> bool:
+    return conn.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'places_fts'")
+    ).first() is not None
+
+
+def ensure_sqlite_fts(conn: Connection) -> None:
+    """Create and fill ``places_fts`` and its triggers if missing (SQLite only)."""
+    if conn.dialect.name != "sqlite" or _has_fts_table(conn):
+        return
+    try:
+        for statement in _FTS_DDL:
+            conn.execute(text(statement))
+    except Exception as e:
+        # SQLite built without FTS5: search falls back to LIKE
+        print(f"Could not create places_fts, place search will use LIKE: {e}")
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _after_create(target, connection: Connection, **kw) -> None:
+    ensure_sqlite_fts(connection)
+
+
+# ---------------------------------------------------------------- search
+
+_backend: Optional[str] = None
+
+
+async def _search_backend(db: AsyncSession) -> str:
+    global _backend
+    if _backend is None:
+        dialect = db.bind.dialect.name
+        if dialect == "postgresql":
+            _backend = "tsvector"
+        elif dialect == "sqlite" and await db.run_sync(
+            lambda session: _has_fts_table(session.connection())
+        ):
+            _backend = "fts5"
+        else:
+            _backend = "like"
+    return _backend
+
+
+async def search_places(
+    db: AsyncSession,
+    q: str,
+    limit: int,
+    city_id: Optional[int] = None,
+    category: Optional[str] = None,
+) -> List[models.Place]:
+    """Best matches for ``q`` (every term as a prefix), most relevant first."""
+    terms = search_terms(q)
+    if not terms:
+        return []
+    Place = models.Place
+    backend = await _search_backend(db)
+
+    if backend == "tsvector":
+        document = models.place_search_document()
+        query_ = func.to_tsquery(text("'simple'"), " & ".join(f"{t}:*" for t in terms))
+        stmt = (
+            select(Place)
+            .where(document.op("@@")(query_))
+            .order_by(func.ts_rank(document, query_).desc(), Place.place_name, Place.place_id)
+        )
+    elif backend == "fts5":
+        # Terms are \w+ only, so quoting them is enough to keep FTS syntax out
+        match = " ".join(f'"{t}"*' for t in terms)
+        stmt = (
+            select(Place)
+            .join(_fts, _fts.c.rowid == Place.place_id)
+            .where(text("places_fts MATCH :match").bindparams(match=match))
+            .order_by(text("bm25(places_fts)"), Place.place_name, Place.place_id)
+        )
+    else:
+        stmt = select(Place).order_by(Place.place_name, Place.place_id)
+        for term in terms:
+            pattern = f"%{term}%"
+            stmt = stmt.where(
+                or_(func.lower(Place.place_name).like(pattern), func.lower(Place.description).like(pattern))
+            )
+
+    if city_id is not None:
+        stmt = stmt.where(Place.city_id == city_id)
+    if category is not None:
+        stmt = stmt.where(Place.category == category)
+    result = await db.execute(stmt.limit(limit))
+    return list(result.scalars().all())
+
+
+# ---------------------------------------------------------------- autocomplete
+
+
+class PlaceNameIndex:
+    """Sorted (normalized key, place) entries; a prefix lookup is two bisects."""
+
+    def __init__(self, places: List[Tuple[int, Optional[int], str]]) -> None:
+        entries = []
+        for place_id, city_id, name in places:
+            key = normalize(name)
+            # Whole name first, then every later word start ("fort" in "lahore fort")
+            entries.append((key, 0, place_id, city_id, name))
+            for match in _TERM.finditer(key):
+                if match.start() > 0:
+                    entries.append((key[match.start():], 1, place_id, city_id, name))
+        entries.sort()
+        self._keys = [e[0] for e in entries]
+        self._entries = entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def complete(
+        self, prefix: str, limit: int, city_id: Optional[int] = None
+    ) -> List[Tuple[int, Optional[int], str]]:
+        """Up to ``limit`` (place_id, city_id, name) whose name or a word in it starts with ``prefix``."""
+        prefix = normalize(prefix).strip()
+        if not prefix:
+            return []
+        results, seen = [], set()
+        start = bisect_left(self._keys, prefix)
+        for key, _, place_id, place_city, name in self._entries[start:start + MAX_AUTOCOMPLETE_SCAN]:
+            if not key.startswith(prefix):
+                break
+            if place_id in seen or (city_id is not None and place_city != city_id):
+                continue
+            seen.add(place_id)
+            results.append((place_id, place_city, name))
+            if len(results) >= limit:
+                break
+        return results
+
+
+async def load_name_index(db: AsyncSession) -> PlaceNameIndex:
+    Place = models.Place
+    result = await db.execute(
+        select(Place.place_id, Place.city_id, Place.place_name).where(Place.place_name.isnot(None))
+    )
+    rows = [tuple(row) for row in result]
+    # Sorting the name keys takes most of a second at 100k places
+    return await run_in_threadpool(PlaceNameIndex, rows)
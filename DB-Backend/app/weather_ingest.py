@@ -0,0 +1,102 @@
+"""Bulk weather loading shared by ``POST /weather/bulk`` and ingest_weather.py.
+
+Input is NDJSON or CSV (the same shapes ``GET /weather?format=`` exports;
+extra fields such as ``weather_id`` are ignored). Rows are written in
+batches with one multi-row ``INSERT ... ON CONFLICT (city_id, date) DO
+UPDATE`` each, so re-loading a forecast replaces it instead of adding
+duplicates.
+"""
+import csv
+import json
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import select
+
+from . import models, schemas
+from .database import upsert_insert
+from .exporting import ExportFormat
+
+INGEST_BATCH_SIZE = 1000
+
+
+class WeatherRowParser:
+    """Turns input lines into validated weather rows, one line at a time."""
+
+    def __init__(self, fmt: ExportFormat) -> None:
+        self.fmt = fmt
+        self.line_no = 0
+        self._header: Optional[List[str]] = None
+
+    def _error(self, message: str) -> ValueError:
+        return ValueError(f"line {self.line_no}: {message}")
+
+    def feed(self, line: str) -> Optional[dict]:
+        self.line_no += 1
+        line = line.strip("\r\n")
+        if not line.strip():
+            return None
+        if self.fmt == ExportFormat.ndjson:
+            try:
+                raw = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise self._error(f"invalid JSON ({e.msg})")
+            if not isinstance(raw, dict):
+                raise self._error("expected a JSON object")
+        else:
+            values = next(csv.reader([line]))
+            if self._header is None:
+                self._header = [v.strip() for v in values]
+                return None
+            raw = {k: v for k, v in zip(self._header, values) if v != ""}
+            if "temperature" in raw:
+                try:
+                    raw["temperature"] = json.loads(raw["temperature"])
+                except json.JSONDecodeError:
+                    raise self._error("temperature must be a JSON object")
+        try:
+            row = schemas.WeatherCreate.model_validate(raw)
+        except ValidationError as e:
+            first = e.errors()[0]
+            field = ".".join(str(p) for p in first["loc"])
+            raise self._error(f"{field}: {first['msg']}")
+        return row.model_dump()
+
+
+class WeatherBatch:
+    """Rows waiting to be written, deduplicated on (city_id, date); later rows win."""
+
+    def __init__(self) -> None:
+        self.rows: Dict[Tuple[int, object], dict] = {}
+
+    def add(self, row: dict) -> None:
+        self.rows[(row["city_id"], row["date"])] = row
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def take(self) -> List[dict]:
+        rows, self.rows = list(self.rows.values()), {}
+        return rows
+
+
+def known_cities(city_ids: Iterable[int]):
+    return select(models.City.city_id).where(models.City.city_id.in_(set(city_ids)))
+
+
+def unknown_city_error(rows: List[dict], known: Iterable[int]) -> Optional[str]:
+    missing = sorted({r["city_id"] for r in rows} - set(known))
+    return f"Unknown city ids: {missing}" if missing else None
+
+
+def upsert_weather(dialect_name: str, rows: List[dict]):
+    """One INSERT ... ON CONFLICT (city_id, date) DO UPDATE for ``rows``."""
+    table = models.Weather.__table__
+    stmt = upsert_insert(dialect_name, table).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=["city_id", "date"],
+        set_={
+            "temperature": stmt.excluded.temperature,
+            "conditions": stmt.excluded.conditions,
+        },
+    )
@@ -0,0 +1,62 @@
+"""
+Run a chunked, resumable maintenance job (see app/backfill.py).
+
+    python backfill.py activity-costs --chunk-size 2000 --rate 5000
+    python backfill.py budget-totals --restart
+
+An interrupted run (Ctrl-C, lost connection) continues after its last
+committed chunk when started again; --restart starts over.
+"""
+import argparse
+import os
+import sys
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.database import SessionLocal, Base, engine
+from app import models
+from app.backfill import BACKFILL_CHUNK_SIZE, JOBS, run_backfill
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.strip().splitlines()[0],
+        epilog="jobs: " + "; ".join(f"{name}: {job.description}" for name, job in JOBS.items()),
+    )
+    parser.add_argument("job", choices=sorted(JOBS))
+    parser.add_argument("--chunk-size", type=int, default=BACKFILL_CHUNK_SIZE,
+                        help="rows per chunk (one transaction each)")
+    parser.add_argument("--rate", type=float, default=None,
+                        help="max rows per second (default: unthrottled)")
+    parser.add_argument("--restart", action="store_true",
+                        help="ignore the checkpoint of an interrupted run")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine, tables=[models.BackfillCheckpoint.__table__])
+
+    db = SessionLocal()
+    try:
+        run_backfill(
+            db,
+            JOBS[args.job](),
+            chunk_size=args.chunk_size,
+            max_rows_per_second=args.rate,
+            restart=args.restart,
+        )
+    except KeyboardInterrupt:
+        db.rollback()
+        print("\nInterrupted; run again to resume from the last checkpoint.")
+        sys.exit(130)
+    except Exception as e:
+        print(f"Error: {e}")
+        import traceback
+        traceback.print_exc()
+        db.rollback()
+        sys.exit(1)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
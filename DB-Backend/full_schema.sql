@@ -63,6 +63,8 @@ CREATE TABLE IF NOT EXISTS places (
     duration NUMERIC(4, 2) DEFAULT 2.0, -- Recommended duration in hours
     opening_hours VARCHAR(255),
     entry_fee NUMERIC(10, 2) DEFAULT 0.00,
+    latitude DOUBLE PRECISION, -- copied from location
+    longitude DOUBLE PRECISION,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
@@ -162,6 +164,77 @@ CREATE TABLE IF NOT EXISTS place_tags (
     PRIMARY KEY (place_id, tag_id)
 );
 
+-- Place Recommendations (written by precompute_recommendations.py)
+CREATE TABLE IF NOT EXISTS place_recommendations (
+    recommendation_id SERIAL PRIMARY KEY,
+    user_id INTEGER REFERENCES users(user_id) ON DELETE CASCADE, -- NULL: ranking for new users
+    category VARCHAR(100) NOT NULL,
+    place_id INTEGER NOT NULL REFERENCES places(place_id) ON DELETE CASCADE,
+    score DOUBLE PRECISION NOT NULL,
+    rank INTEGER NOT NULL,
+    version INTEGER NOT NULL,
+    computed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Itinerary budget rollups (maintained by the API, see app/budget.py)
+CREATE TABLE IF NOT EXISTS itinerary_totals (
+    itinerary_id INTEGER PRIMARY KEY REFERENCES itineraries(itinerary_id) ON DELETE CASCADE,
+    expense_total NUMERIC(12, 2) NOT NULL DEFAULT 0,
+    expense_count INTEGER NOT NULL DEFAULT 0,
+    planned_activity_cost NUMERIC(12, 2) NOT NULL DEFAULT 0,
+    activity_count INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS itinerary_category_totals (
+    itinerary_id INTEGER REFERENCES itineraries(itinerary_id) ON DELETE CASCADE,
+    category VARCHAR(100),
+    total NUMERIC(12, 2) NOT NULL DEFAULT 0,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (itinerary_id, category)
+);
+
+-- Weather normals per city and ISO week (refresh_climatology.py)
+CREATE TABLE IF NOT EXISTS weather_climatology (
+    city_id INTEGER REFERENCES cities(city_id) ON DELETE CASCADE,
+    week INTEGER NOT NULL, -- ISO week of year, 1-53
+    sample_days INTEGER NOT NULL,
+    mean_min_temp DOUBLE PRECISION, -- Celsius
+    mean_max_temp DOUBLE PRECISION,
+    bad_weather_probability DOUBLE PRECISION NOT NULL,
+    computed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (city_id, week)
+);
+
+-- Progress of chunked maintenance jobs (backfill.py)
+CREATE TABLE IF NOT EXISTS backfill_checkpoints (
+    name VARCHAR(100) PRIMARY KEY,
+    last_key INTEGER,
+    rows_done INTEGER NOT NULL DEFAULT 0,
+    rows_changed INTEGER NOT NULL DEFAULT 0,
+    started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    finished_at TIMESTAMP
+);
+
+-- Review count, rating sum and star histogram per place (app/ratings.py)
+CREATE TABLE IF NOT EXISTS place_rating_summaries (
+    place_id INTEGER PRIMARY KEY REFERENCES places(place_id) ON DELETE CASCADE,
+    review_count INTEGER NOT NULL DEFAULT 0,
+    rating_sum INTEGER NOT NULL DEFAULT 0,
+    rating_1 INTEGER NOT NULL DEFAULT 0,
+    rating_2 INTEGER NOT NULL DEFAULT 0,
+    rating_3 INTEGER NOT NULL DEFAULT 0,
+    rating_4 INTEGER NOT NULL DEFAULT 0,
+    rating_5 INTEGER NOT NULL DEFAULT 0
+);
+
+-- Change counter per catalog table, shared by every API worker (app/http_cache.py)
+CREATE TABLE IF NOT EXISTS catalog_versions (
+    table_name VARCHAR(100) PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0,
+    modified_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
 -- ==========================================
 -- 3. Indexes
 -- ==========================================
@@ -174,8 +247,26 @@ CREATE INDEX idx_itineraries_user_id ON itineraries(user_id);
 CREATE INDEX idx_activities_itinerary_id ON activities(itinerary_id);
 CREATE INDEX idx_activities_date_time ON activities(day_no, start_time);
 CREATE INDEX idx_reviews_place_id ON reviews(place_id);
-CREATE INDEX idx_weather_city_date ON weather(city_id, date);
+CREATE UNIQUE INDEX uq_weather_city_date ON weather(city_id, date);
 CREATE INDEX idx_expenses_itinerary_id ON expenses(itinerary_id);
+CREATE INDEX idx_place_recommendations_user_version ON place_recommendations(user_id, version, category);
+CREATE INDEX idx_cities_name ON cities(name, city_id);
+CREATE INDEX idx_places_city_name ON places(city_id, place_name, place_id);
+CREATE INDEX idx_places_name ON places(place_name, place_id);
+CREATE INDEX idx_itineraries_user_start ON itineraries(user_id, start_date, itinerary_id);
+CREATE INDEX idx_itineraries_start ON itineraries(start_date, itinerary_id);
+CREATE INDEX idx_activities_itinerary_day ON activities(itinerary_id, day_no, start_time, activity_id);
+CREATE INDEX idx_reviews_place_date ON reviews(place_id, review_date, review_id);
+CREATE INDEX idx_reviews_user_date ON reviews(user_id, review_date, review_id);
+CREATE INDEX idx_reviews_date ON reviews(review_date, review_id);
+CREATE INDEX idx_weather_date ON weather(date, weather_id);
+CREATE INDEX idx_expenses_itinerary_expense ON expenses(itinerary_id, expense_id);
+CREATE INDEX idx_places_search ON places USING GIN (to_tsvector('simple', (coalesce(place_name, '') || ' ') || coalesce(description, '')));
+CREATE INDEX idx_reviews_place_feed ON reviews(place_id, review_date DESC NULLS LAST, review_id DESC);
+CREATE INDEX idx_reviews_user_feed ON reviews(user_id, review_date DESC NULLS LAST, review_id DESC);
+CREATE INDEX idx_reviews_feed ON reviews(review_date DESC NULLS LAST, review_id DESC);
+CREATE INDEX idx_weather_feed ON weather(date DESC NULLS LAST, weather_id DESC);
+CREATE INDEX idx_weather_city_feed ON weather(city_id, date DESC NULLS LAST, weather_id DESC);
 
 -- ==========================================
 -- 4. Views
@@ -0,0 +1,76 @@
+"""
+Bulk-load cities and places from CSV, JSON or NDJSON files (upsert on natural keys).
+
+    python import_catalog.py --cities cities.csv --places places.ndjson
+    python import_catalog.py --places pk-places.json --batch-size 10000
+
+Cities are keyed on (name, province). Places are keyed on (city, place_name)
+and name their city with ``city`` (+ ``province``) or ``city_id``; optional
+fields are category, description, duration, entry_fee (or cost), lat/lon
+and location. Only the fields present in a file are written; with
+--fill-only, existing rows only get values for columns that are still empty.
+"""
+import argparse
+import os
+import sys
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.catalog import catalog
+from app.catalog_import import (
+    IMPORT_BATCH_SIZE,
+    CatalogFormat,
+    import_cities,
+    import_places,
+    read_records,
+)
+from app.database import SessionLocal
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cities", action="append", default=[], metavar="FILE",
+                        help="city file (repeatable); loaded before places")
+    parser.add_argument("--places", action="append", default=[], metavar="FILE",
+                        help="place file (repeatable)")
+    parser.add_argument("--format", choices=[f.value for f in CatalogFormat],
+                        help="input format (default: from the file extension)")
+    parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE,
+                        help="records matched and written per round trip")
+    parser.add_argument("--fill-only", action="store_true",
+                        help="never overwrite stored values; only fill NULL columns")
+    args = parser.parse_args()
+    if not args.cities and not args.places:
+        parser.error("give at least one --cities or --places file")
+
+    jobs = [(path, import_cities) for path in args.cities]
+    jobs += [(path, import_places) for path in args.places]
+
+    db = SessionLocal()
+    try:
+        for path, load in jobs:
+            fmt = CatalogFormat(args.format) if args.format else CatalogFormat.for_path(path)
+            stats = load(
+                db, read_records(path, fmt), batch_size=args.batch_size, fill_only=args.fill_only
+            )
+            # One transaction per file: a failed file leaves earlier ones loaded
+            db.commit()
+            catalog.changed("cities", "places")
+            print(f"{path}: {stats.summary()}")
+            for error in stats.errors:
+                print(f"  {error}")
+            if stats.rejected > len(stats.errors):
+                print(f"  ... and {stats.rejected - len(stats.errors)} more rejected records")
+    except Exception as e:
+        print(f"Error: {e}")
+        import traceback
+        traceback.print_exc()
+        db.rollback()
+        sys.exit(1)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
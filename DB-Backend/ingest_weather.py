@@ -0,0 +1,102 @@
+"""
+Bulk-load weather rows from NDJSON or CSV files (upsert on city_id + date).
+
+    python ingest_weather.py forecasts.ndjson
+    python ingest_weather.py --format csv season-*.csv --batch-size 2000
+
+CSV files need a header with city_id and date; temperature is a JSON
+object, exactly as ``GET /weather?format=csv`` writes it.
+"""
+import argparse
+import os
+import sys
+import time
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.catalog import catalog
+from app.database import SessionLocal
+from app.exporting import ExportFormat
+from app.weather_ingest import (
+    INGEST_BATCH_SIZE,
+    WeatherBatch,
+    WeatherRowParser,
+    known_cities,
+    unknown_city_error,
+    upsert_weather,
+)
+
+
+def _format_for(path, requested):
+    if requested:
+        return ExportFormat(requested)
+    return ExportFormat.csv if path.lower().endswith(".csv") else ExportFormat.ndjson
+
+
+def _write(db, rows):
+    error = unknown_city_error(rows, db.scalars(known_cities(r["city_id"] for r in rows)))
+    if error:
+        raise ValueError(error)
+    db.execute(upsert_weather(db.get_bind().dialect.name, rows))
+
+
+def ingest_file(db, path, fmt, batch_size):
+    parser = WeatherRowParser(fmt)
+    batch = WeatherBatch()
+    received = upserted = 0
+    with open(path, encoding="utf-8", newline="") as f:
+        for line in f:
+            try:
+                row = parser.feed(line)
+            except ValueError as e:
+                raise ValueError(f"{path}: {e}")
+            if row is None:
+                continue
+            received += 1
+            batch.add(row)
+            if len(batch) >= batch_size:
+                rows = batch.take()
+                _write(db, rows)
+                upserted += len(rows)
+    if len(batch):
+        rows = batch.take()
+        _write(db, rows)
+        upserted += len(rows)
+    return received, upserted
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("files", nargs="+", help="NDJSON or CSV files")
+    parser.add_argument("--format", choices=[f.value for f in ExportFormat],
+                        help="input format (default: from the file extension)")
+    parser.add_argument("--batch-size", type=int, default=INGEST_BATCH_SIZE,
+                        help="rows per INSERT ... ON CONFLICT statement")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        total_received = total_upserted = 0
+        for path in args.files:
+            received, upserted = ingest_file(db, path, _format_for(path, args.format), args.batch_size)
+            db.commit()
+            total_received += received
+            total_upserted += upserted
+            print(f"{path}: {received} rows read, {upserted} upserted")
+        elapsed = time.perf_counter() - started
+        rate = total_upserted / elapsed if elapsed else 0
+        print(f"Done: {total_upserted} rows in {elapsed:.1f}s ({rate:,.0f} rows/s)")
+        # Tell running API workers to drop cached weather validators
+        catalog.changed("weather")
+    except Exception as e:
+        print(f"Error: {e}")
+        db.rollback()
+        sys.exit(1)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,6 @@
-from sqlalchemy.orm import Session
-from app.database import SessionLocal, engine
-from app import models
+from app.database import SessionLocal
+from app.catalog import catalog
+from app.catalog_import import import_cities, import_places
 
 def populate_data():
     db = SessionLocal()
@@ -118,47 +118,33 @@ def populate_data():
         ]
     }
 
-    try:
-        for province, cities in pakistan_data.items():
-            print(f"Processing {province}...")
-            for city_name, city_desc, places in cities:
-                # Check if city exists
-                city = db.query(models.City).filter(models.City.name == city_name).first()
-                if not city:
-                    city = models.City(
-                        name=city_name,
-                        description=city_desc,
-                        province=province
-                    )
-                    db.add(city)
-                    db.commit()
-                    db.refresh(city)
-                    print(f"  Added City: {city_name}")
-                else:
-                    print(f"  City exists: {city_name}")
+    cities = [
+        (f"{province}/{city_name}", {"name": city_name, "province": province, "description": city_desc})
+        for province, province_cities in pakistan_data.items()
+        for city_name, city_desc, _ in province_cities
+    ]
+    places = [
+        (f"{city_name}/{p_name}", {
+            "city": city_name,
+            "province": province,
+            "place_name": p_name,
+            "category": p_cat,
+            "description": p_desc,
+            "duration": p_dur,
+        })
+        for province, province_cities in pakistan_data.items()
+        for city_name, _, city_places in province_cities
+        for p_name, p_cat, p_desc, p_dur in city_places
+    ]
 
-                # Add places
-                for p_name, p_cat, p_desc, p_dur in places:
-                    place = db.query(models.Place).filter(models.Place.place_name == p_name, models.Place.city_id == city.city_id).first()
-                    if not place:
-                        place = models.Place(
-                            city_id=city.city_id,
-                            place_name=p_name,
-                            category=p_cat,
-                            description=p_desc,
-                            duration=p_dur
-                        )
-                        db.add(place)
-                        print(f"    Added Place: {p_name}")
-                    else:
-                        # Update duration if missing
-                        if place.duration is None:
-                            place.duration = p_dur
-                            db.add(place)
-                            print(f"    Updated Duration: {p_name}")
-                
-                db.commit()
-        
+    try:
+        # Same batched import as import_catalog.py. fill_only: existing rows
+        # only get values that are still missing (e.g. a NULL duration), so
+        # re-running the seed never overwrites edits made through the API.
+        print(import_cities(db, cities, fill_only=True).summary())
+        print(import_places(db, places, fill_only=True).summary())
+        db.commit()
+        catalog.changed("cities", "places")
         print("Data population complete!")
         
     except Exception as e:
@@ -0,0 +1,51 @@
+"""
+Offline job: precompute top-N place recommendations for every user, plus
+the non-personalized ranking served to new users.
+
+Run off-peak (e.g. from cron):
+    python precompute_recommendations.py --top-n 20 --chunk-size 500
+"""
+import argparse
+import os
+import sys
+import time
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.database import SessionLocal, Base, engine
+from app import models
+from app.recommender import DEFAULT_TOP_N, DEFAULT_USER_CHUNK, precompute_recommendations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--top-n", type=int, default=DEFAULT_TOP_N,
+                        help="places kept per user and category")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_USER_CHUNK,
+                        help="users scored per vectorized batch")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine, tables=[models.PlaceRecommendation.__table__])
+
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        version = precompute_recommendations(db, top_n=args.top_n, chunk_size=args.chunk_size)
+        rows = db.query(models.PlaceRecommendation).filter(
+            models.PlaceRecommendation.version == version
+        ).count()
+        elapsed = time.perf_counter() - started
+        print(f"Wrote recommendation version {version}: {rows} rows in {elapsed:.1f}s")
+    except Exception as e:
+        print(f"Error: {e}")
+        import traceback
+        traceback.print_exc()
+        db.rollback()
+        sys.exit(1)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
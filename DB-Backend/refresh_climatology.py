@@ -0,0 +1,49 @@
+"""
+Scheduled job: rebuild per-city weekly weather normals from the weather table.
+
+Run after loading history (e.g. nightly from cron):
+    python refresh_climatology.py
+    python refresh_climatology.py --city-id 3 --city-id 7
+"""
+import argparse
+import os
+import sys
+import time
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.database import SessionLocal, Base, engine
+from app import models
+from app.catalog import catalog
+from app.climatology import refresh_climatology
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--city-id", type=int, action="append", dest="city_ids",
+                        help="only refresh these cities (repeatable; default: all)")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine, tables=[models.WeatherClimatology.__table__])
+
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        rows = refresh_climatology(db, args.city_ids)
+        db.commit()
+        elapsed = time.perf_counter() - started
+        print(f"Wrote {rows} city-week climatology rows in {elapsed:.1f}s")
+        catalog.changed("weather_climatology")
+    except Exception as e:
+        print(f"Error: {e}")
+        import traceback
+        traceback.print_exc()
+        db.rollback()
+        sys.exit(1)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
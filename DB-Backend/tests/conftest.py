@@ -0,0 +1,50 @@
+"""Runs the API in-process against a throwaway SQLite database.
+
+From DB-Backend: ``python -m pytest tests`` (needs pytest and httpx).
+The environment is set before ``app`` is imported, so a DATABASE_URL in
+.env is never used here.
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "test.db")
+os.environ.setdefault("SECRET_KEY", "test-secret-key-not-for-production")
+os.environ["PASSWORD_HASH_WORKERS"] = "0"
+os.environ["CATALOG_BUS"] = "local"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app import models  # noqa: E402
+from app.auth import create_access_token  # noqa: E402
+from app.catalog import catalog  # noqa: E402
+from app.database import Base, SessionLocal, engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.principal_cache import principal_cache  # noqa: E402
+
+
+@pytest.fixture
+def db():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    # Ids are reused across tests, so nothing cached may outlive one
+    principal_cache.clear()
+    catalog.clear()
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def client(db):
+    return TestClient(app)
+
+
+def auth_headers(user: models.User) -> dict:
+    token = create_access_token({"sub": str(user.user_id)})
+    return {"Authorization": f"Bearer {token}"}
@@ -0,0 +1,108 @@
+from datetime import date, time
+
+from app import models
+
+from conftest import auth_headers
+
+
+def _itinerary_with_day(db):
+    """A traveler's itinerary whose day 1 has 09:00-10:00 and 11:00-12:00."""
+    user = models.User(
+        first_name="Test", last_name="User", email="traveler@example.com", password_hash="x"
+    )
+    itinerary = models.Itinerary(
+        owner=user, title="Trip", start_date=date(2024, 5, 1), end_date=date(2024, 5, 2)
+    )
+    morning = models.Activity(
+        itinerary=itinerary, day_no=1, start_time=time(9), end_time=time(10)
+    )
+    late_morning = models.Activity(
+        itinerary=itinerary, day_no=1, start_time=time(11), end_time=time(12)
+    )
+    db.add_all([user, itinerary, morning, late_morning])
+    db.commit()
+    return user, itinerary, morning, late_morning
+
+
+def test_batch_rescheduling_within_a_day_detects_overlap(client, db):
+    user, itinerary, _, late_morning = _itinerary_with_day(db)
+    move = {"start_time": "09:30:00", "end_time": "10:30:00"}
+
+    response = client.post(
+        "/activities/batch",
+        headers=auth_headers(user),
+        json={
+            "itinerary_id": itinerary.itinerary_id,
+            "operations": [
+                {"op": "update", "activity_id": late_morning.activity_id, "values": move}
+            ],
+        },
+    )
+    assert response.status_code == 409
+
+    # Same verdict as the single-activity route
+    response = client.put(
+        f"/activities/{late_morning.activity_id}", headers=auth_headers(user), json=move
+    )
+    assert response.status_code == 409
+
+
+def test_batch_rescheduling_within_a_day_into_a_free_slot(client, db):
+    user, itinerary, _, late_morning = _itinerary_with_day(db)
+
+    response = client.post(
+        "/activities/batch",
+        headers=auth_headers(user),
+        json={
+            "itinerary_id": itinerary.itinerary_id,
+            "operations": [
+                {
+                    "op": "update",
+                    "activity_id": late_morning.activity_id,
+                    "values": {"start_time": "10:00:00", "end_time": "10:45:00"},
+                }
+            ],
+        },
+    )
+    assert response.status_code == 200
+    assert response.json()["updated"] == [late_morning.activity_id]
+
+
+def test_batch_update_without_values_is_rejected(client, db):
+    user, itinerary, morning, _ = _itinerary_with_day(db)
+
+    response = client.post(
+        "/activities/batch",
+        headers=auth_headers(user),
+        json={
+            "itinerary_id": itinerary.itinerary_id,
+            "operations": [{"op": "update", "activity_id": morning.activity_id, "values": {}}],
+        },
+    )
+    assert response.status_code == 400
+
+
+def test_conflicts_are_found_when_the_day_already_overlaps(client, db):
+    """09:00-17:00 and 10:00-11:00 already overlap (e.g. appended by /plan)."""
+    user, itinerary, morning, late_morning = _itinerary_with_day(db)
+    morning.end_time = time(17)
+    late_morning.start_time, late_morning.end_time = time(10), time(11)
+    db.commit()
+    lunch = {"day_no": 1, "start_time": "12:00:00", "end_time": "13:00:00"}
+
+    response = client.post(
+        "/activities/",
+        headers=auth_headers(user),
+        json={"itinerary_id": itinerary.itinerary_id, **lunch},
+    )
+    assert response.status_code == 409
+
+    response = client.post(
+        "/activities/batch",
+        headers=auth_headers(user),
+        json={
+            "itinerary_id": itinerary.itinerary_id,
+            "operations": [{"op": "create", "values": lunch}],
+        },
+    )
+    assert response.status_code == 409
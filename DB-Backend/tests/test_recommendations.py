@@ -0,0 +1,57 @@
+from app import models
+from app.recommender import precompute_recommendations
+
+from conftest import auth_headers
+
+
+def _recommended_ids(client, user, user_type):
+    response = client.post(
+        "/recommendations/places",
+        headers=auth_headers(user),
+        json={"categories": ["History"], "user_type": user_type, "limit": 10},
+    )
+    assert response.status_code == 200
+    return [p["place_id"] for places in response.json().values() for p in places]
+
+
+def test_new_users_are_served_from_the_precomputed_ranking(client, db):
+    user = models.User(first_name="New", last_name="User", email="new@example.com", password_hash="x")
+    city = models.City(name="Lahore", province="Punjab")
+    fort = models.Place(city=city, place_name="Fort", category="History")
+    db.add_all([user, city, fort])
+    db.commit()
+
+    # No batch rows yet: scored live
+    assert _recommended_ids(client, user, "new") == [fort.place_id]
+
+    precompute_recommendations(db)
+    assert db.query(models.PlaceRecommendation).filter(
+        models.PlaceRecommendation.user_id.is_(None)
+    ).count() == 1
+
+    # Places added after the batch run only show up after the next one
+    museum = models.Place(city=city, place_name="Museum", category="History")
+    db.add(museum)
+    db.commit()
+    assert _recommended_ids(client, user, "new") == [fort.place_id]
+
+    precompute_recommendations(db)
+    assert sorted(_recommended_ids(client, user, "new")) == sorted([fort.place_id, museum.place_id])
+
+
+def test_ranking_follows_the_review_summaries(client, db):
+    user = models.User(first_name="New", last_name="User", email="new@example.com", password_hash="x")
+    city = models.City(name="Lahore", province="Punjab")
+    fort = models.Place(city=city, place_name="Fort", category="History")
+    museum = models.Place(city=city, place_name="Museum", category="History")
+    db.add_all([user, city, fort, museum])
+    db.commit()
+    for place, rating in ((fort, 1), (museum, 5)):
+        response = client.post(
+            "/reviews/",
+            headers=auth_headers(user),
+            json={"user_id": user.user_id, "place_id": place.place_id, "rating": rating},
+        )
+        assert response.status_code == 201
+
+    assert _recommended_ids(client, user, "new") == [museum.place_id, fort.place_id]
@@ -0,0 +1,44 @@
+from datetime import date
+
+from app import models
+
+from conftest import auth_headers
+
+
+def test_deleting_a_user_updates_review_summaries(client, db):
+    admin = models.User(
+        first_name="Admin", last_name="User", email="admin@example.com",
+        password_hash="x", user_type="admin",
+    )
+    author = models.User(
+        first_name="Gone", last_name="User", email="gone@example.com", password_hash="x"
+    )
+    other = models.User(
+        first_name="Kept", last_name="User", email="kept@example.com", password_hash="x"
+    )
+    city = models.City(name="Lahore", province="Punjab")
+    place = models.Place(city=city, place_name="Fort", category="History")
+    db.add_all([admin, author, other, city, place])
+    db.commit()
+    for user, rating in ((author, 1), (author, 1), (other, 5)):
+        response = client.post(
+            "/reviews/",
+            headers=auth_headers(user),
+            json={
+                "user_id": user.user_id,
+                "place_id": place.place_id,
+                "rating": rating,
+                "review_date": str(date(2024, 1, 1)),
+            },
+        )
+        assert response.status_code == 201
+
+    response = client.delete(f"/users/{author.user_id}", headers=auth_headers(admin))
+    assert response.status_code == 204
+
+    summary = client.get(
+        f"/reviews/places/{place.place_id}/summary", headers=auth_headers(other)
+    ).json()
+    assert summary["review_count"] == 1
+    assert summary["histogram"]["1"] == 0
+    assert summary["histogram"]["5"] == 1
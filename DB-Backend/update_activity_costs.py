@@ -1,32 +1,24 @@
 """
-Script to update existing activities with random estimated costs.
+Script to fill in missing activity costs: the place's entry fee where known,
+otherwise a random estimate. Runs as the resumable ``activity-costs``
+backfill; see backfill.py for chunk size, rate and restart options.
 """
 import sys
 import os
-import random
 
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from app.database import SessionLocal
+from app.database import SessionLocal, Base, engine
 from app import models
+from app.backfill import ActivityCostBackfill, run_backfill
 
 def update_activity_costs():
+    Base.metadata.create_all(bind=engine, tables=[models.BackfillCheckpoint.__table__])
     db = SessionLocal()
     try:
-        # Get all activities
-        activities = db.query(models.Activity).all()
-        
-        updated_count = 0
-        for activity in activities:
-            if activity.estimated_cost is None or activity.estimated_cost == 0:
-                # Assign random cost between 500 and 5000
-                activity.estimated_cost = float(random.randint(500, 5000))
-                updated_count += 1
-                print(f"Updated activity {activity.activity_id}: {activity.notes} -> PKR {activity.estimated_cost}")
-        
-        db.commit()
-        print(f"\nSuccessfully updated {updated_count} out of {len(activities)} activities!")
+        progress = run_backfill(db, ActivityCostBackfill())
+        print(f"\nSuccessfully updated {progress.changed} activities!")
         
     except Exception as e:
         print(f"Error: {e}")
@@ -1,5 +1,16 @@
 from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
 from app.config import settings
+from app.database import Base
+from app import models  # noqa: F401  (registers tables on Base.metadata)
+from app.search import ensure_sqlite_fts
+from app.backfill import (
+    BudgetTotalsBackfill,
+    ClimatologyBackfill,
+    PlaceCoordinatesBackfill,
+    ReviewSummaryBackfill,
+    run_backfill,
+)
 
 def update_schema():
     engine = create_engine(settings.database_url)
@@ -15,6 +26,21 @@ def update_schema():
         except Exception as e:
             print(f"Column 'duration' might already exist or error: {e}")
 
+        # Add entry_fee to places (already in full_schema.sql)
+        try:
+            conn.execute(text("ALTER TABLE places ADD COLUMN entry_fee NUMERIC(10, 2) DEFAULT 0.00"))
+            print("Added 'entry_fee' column to 'places' table.")
+        except Exception as e:
+            print(f"Column 'entry_fee' might already exist or error: {e}")
+
+        # Add latitude/longitude to places (filled from location below)
+        for column in ("latitude", "longitude"):
+            try:
+                conn.execute(text(f"ALTER TABLE places ADD COLUMN {column} DOUBLE PRECISION"))
+                print(f"Added '{column}' column to 'places' table.")
+            except Exception as e:
+                print(f"Column '{column}' might already exist or error: {e}")
+
         # Add end_time to activities
         try:
             conn.execute(text("ALTER TABLE activities ADD COLUMN end_time TIME"))
@@ -22,6 +48,64 @@ def update_schema():
         except Exception as e:
             print(f"Column 'end_time' might already exist or error: {e}")
 
+        # place_recommendations rows with no user hold the ranking for new users
+        try:
+            conn.execute(text("ALTER TABLE place_recommendations ALTER COLUMN user_id DROP NOT NULL"))
+            print("Made 'place_recommendations.user_id' nullable.")
+        except Exception as e:
+            print(f"Could not make 'place_recommendations.user_id' nullable: {e}")
+
+        # The unique (city_id, date) index below needs duplicate forecasts
+        # gone first; keep the most recently inserted row of each.
+        try:
+            result = conn.execute(text(
+                "DELETE FROM weather WHERE weather_id NOT IN ("
+                "SELECT MAX(weather_id) FROM weather GROUP BY city_id, date)"
+            ))
+            print(f"Removed {result.rowcount} duplicate weather rows.")
+        except Exception as e:
+            print(f"Could not remove duplicate weather rows: {e}")
+
+        # create_all() skips existing tables, so indexes added to the models
+        # later (e.g. the pagination sort keys) are created here.
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                try:
+                    index.create(bind=conn, checkfirst=True)
+                    print(f"Index '{index.name}' is present.")
+                except Exception as e:
+                    print(f"Could not create index '{index.name}': {e}")
+
+    # SQLite full-text table for /places/search (PostgreSQL uses idx_places_search)
+    with engine.begin() as conn:
+        ensure_sqlite_fts(conn)
+
+    # Derived tables: create them if missing, then recompute them in chunks
+    # (one short transaction per chunk, resumable if interrupted).
+    with engine.begin() as conn:
+        for model in (
+            models.ItineraryTotals,
+            models.ItineraryCategoryTotal,
+            models.WeatherClimatology,
+            models.PlaceRatingSummary,
+            models.CatalogVersion,
+            models.BackfillCheckpoint,
+        ):
+            model.__table__.create(bind=conn, checkfirst=True)
+    db = Session(bind=engine)
+    try:
+        run_backfill(db, PlaceCoordinatesBackfill())
+        print("Copied place coordinates out of location.")
+        run_backfill(db, BudgetTotalsBackfill())
+        print("Rebuilt itinerary budget totals.")
+        run_backfill(db, ReviewSummaryBackfill())
+        print("Rebuilt place review summaries.")
+        # Weekly weather normals used by the planner for dates without forecasts
+        run_backfill(db, ClimatologyBackfill())
+        print("Rebuilt weather climatology.")
+    finally:
+        db.close()
+
 if __name__ == "__main__":
     print("Updating database schema...")
     update_schema()
@@ -1,21 +1,29 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import func
 from app.database import SessionLocal
 from app import models
 
 def verify_data():
     db = SessionLocal()
     try:
-        cities = db.query(models.City).all()
-        print(f"Total Cities: {len(cities)}")
-        for city in cities:
-            place_count = db.query(models.Place).filter(models.Place.city_id == city.city_id).count()
-            print(f" - {city.name} ({city.province}): {place_count} places")
-            
-        places = db.query(models.Place).all()
-        print(f"\nTotal Places: {len(places)}")
-        if len(places) > 0:
+        # One grouped query instead of loading every city and place
+        place_counts = (
+            db.query(models.City.name, models.City.province, func.count(models.Place.place_id))
+            .outerjoin(models.Place, models.Place.city_id == models.City.city_id)
+            .group_by(models.City.city_id, models.City.name, models.City.province)
+            .order_by(models.City.city_id)
+            .yield_per(1000)
+        )
+        total_cities = 0
+        for name, province, place_count in place_counts:
+            total_cities += 1
+            print(f" - {name} ({province}): {place_count} places")
+        print(f"Total Cities: {total_cities}")
+
+        total_places = db.query(func.count(models.Place.place_id)).scalar()
+        print(f"\nTotal Places: {total_places}")
+        if total_places > 0:
             print("Sample Places:")
-            for p in places[:5]:
+            for p in db.query(models.Place).order_by(models.Place.place_id).limit(5):
                 print(f" - {p.place_name} ({p.category})")
                 
     except Exception as e:
@@ -22,6 +22,25 @@ function decodeUserIdFromToken(token) {
   }
 }
 
+// List endpoints return one page at a time (100 rows by default) and send
+// the cursor for the next page in the X-Next-Cursor header. Follows it and
+// returns every row; throws if any page fails to load.
+async function fetchAllPages(url, options = {}) {
+  const rows = [];
+  let cursor = null;
+  do {
+    const separator = url.includes("?") ? "&" : "?";
+    const pageUrl = cursor
+      ? `${url}${separator}cursor=${encodeURIComponent(cursor)}`
+      : url;
+    const res = await fetch(pageUrl, options);
+    if (!res.ok) throw new Error(`Request failed: ${res.status}`);
+    rows.push(...(await res.json()));
+    cursor = res.headers.get("X-Next-Cursor");
+  } while (cursor);
+  return rows;
+}
+
 function logout() {
   localStorage.removeItem("access_token");
   localStorage.removeItem("current_itinerary");
@@ -166,7 +166,8 @@ async function loadUserReviews() {
     const userId = decodeUserIdFromToken(token);
 
     try {
-        const res = await fetch(`${API_BASE}/reviews?user_id=${userId}`, {
+        // Newest first; only the latest five are shown, so one small page will do
+        const res = await fetch(`${API_BASE}/reviews?user_id=${userId}&limit=5`, {
             headers: { Authorization: `Bearer ${token}` },
         });
 
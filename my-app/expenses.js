@@ -36,11 +36,12 @@ async function loadExpensesPage() {
         const totalBudget = itinerary.total_budget || 0;
 
         // 2. Fetch Activities for Estimated Cost
-        const actRes = await fetch(`${API_BASE}/activities?itinerary_id=${currentItineraryId}`, {
-            headers: { Authorization: `Bearer ${token}` },
+        const activities = await fetchAllPages(
+            `${API_BASE}/activities?itinerary_id=${currentItineraryId}`,
+            { headers: { Authorization: `Bearer ${token}` } }
+        ).catch(() => {
+            throw new Error("Failed to load activities");
         });
-        if (!actRes.ok) throw new Error("Failed to load activities");
-        const activities = await actRes.json();
 
         // Calculate total activity cost and create detailed list
         let activityCost = 0;
@@ -59,11 +60,12 @@ async function loadExpensesPage() {
         });
 
         // 3. Fetch Manual Expenses
-        const expRes = await fetch(`${API_BASE}/expenses?itinerary_id=${currentItineraryId}`, {
-            headers: { Authorization: `Bearer ${token}` },
+        const expenses = await fetchAllPages(
+            `${API_BASE}/expenses?itinerary_id=${currentItineraryId}`,
+            { headers: { Authorization: `Bearer ${token}` } }
+        ).catch(() => {
+            throw new Error("Failed to load expenses");
         });
-        if (!expRes.ok) throw new Error("Failed to load expenses");
-        const expenses = await expRes.json();
         let manualCost = 0;
 
         // Render Activity Cost List
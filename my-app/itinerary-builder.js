@@ -47,14 +47,25 @@ if (citiesSelect) {
       activitiesList.innerHTML = '<p style="color:#8d656a; font-size:0.9rem;">Loading activities...</p>';
 
       try {
-        // Fetch places for each selected city
+        // Fetch places for all selected cities (grouped by city), following
+        // X-Next-Cursor: a city's places may continue on the next page
         const allPlaces = [];
-        for (const cityId of selectedCityIds) {
-          const res = await fetch(`${API_BASE}/places?city_id=${cityId}`);
-          if (res.ok) {
-            const places = await res.json();
-            allPlaces.push(...places);
+        const placesByCity = {};
+        let cursor = null;
+        do {
+          const params = new URLSearchParams();
+          selectedCityIds.forEach(cityId => params.append("city_ids", cityId));
+          params.set("limit", "500");
+          if (cursor) params.set("cursor", cursor);
+          const res = await fetch(`${API_BASE}/places/by-city?${params}`);
+          if (!res.ok) break;
+          for (const [cityId, places] of Object.entries(await res.json())) {
+            (placesByCity[cityId] ||= []).push(...places);
           }
+          cursor = res.headers.get("X-Next-Cursor");
+        } while (cursor);
+        for (const cityId of selectedCityIds) {
+          allPlaces.push(...(placesByCity[cityId] || []));
         }
 
         currentPlaces = allPlaces;
@@ -21,8 +21,8 @@ async function loadItineraryDetails() {
   if (!token) return;
 
   try {
-    // Fetch full itinerary with cities
-    const res = await fetch(`${API_BASE}/itineraries/${currentItineraryId}`, {
+    // Fetch itinerary, cities, activities and expense totals in one request
+    const res = await fetch(`${API_BASE}/itineraries/${currentItineraryId}/full`, {
       headers: {
         Authorization: `Bearer ${token}`,
       },
@@ -66,8 +66,8 @@ async function loadItineraryDetails() {
     // Cities list removed from UI, so no need to populate it.
     // We will use the cities data for title.
 
-    // Load activities for timeline
-    await loadActivities();
+    // Activities arrive already grouped by day
+    renderTimeline((itinerary.days || []).flatMap((day) => day.activities));
   } catch (err) {
     if (titleEl) titleEl.textContent = "Error loading itinerary";
     if (subtitleEl) subtitleEl.textContent = err.message;
@@ -75,24 +75,10 @@ async function loadItineraryDetails() {
   }
 }
 
-async function loadActivities() {
-  if (!currentItineraryId || !timelineEl) return;
-  const token = getToken();
-  if (!token) return;
+function renderTimeline(activities) {
+  if (!timelineEl) return;
 
   try {
-    const res = await fetch(
-      `${API_BASE}/activities?itinerary_id=${currentItineraryId}`,
-      {
-        headers: {
-          Authorization: `Bearer ${token}`,
-        },
-      }
-    );
-
-    if (!res.ok) return;
-
-    const activities = await res.json();
     timelineEl.innerHTML = "";
 
     if (activities.length === 0) {
@@ -212,8 +198,8 @@ if (autoPlanBtn) {
       const result = await res.json();
       autoPlanError.textContent = `Success! Created ${result.count || 0} activities.`;
 
-      // Reload activities to show them
-      await loadActivities();
+      // Reload the itinerary to show the new activities
+      await loadItineraryDetails();
 
       // Also reload place reviews since new activities may have places
       if (window.initPlaceReviewsForItinerary) {
@@ -37,14 +37,12 @@ async function fetchActivitiesForItinerary() {
       '<p class="card-meta">Sign in to see and write place reviews.</p>';
     return [];
   }
-  const res = await fetch(
+  return fetchAllPages(
     `${API_BASE}/activities?itinerary_id=${currentItineraryId}`,
     {
       headers: { Authorization: `Bearer ${token}` },
     }
-  );
-  if (!res.ok) return [];
-  return res.json();
+  ).catch(() => []);
 }
 
 async function fetchPlace(placeId) {
@@ -56,11 +54,9 @@ async function fetchPlace(placeId) {
 async function fetchReviews(placeId) {
   const token = getToken();
   if (!token) return [];
-  const res = await fetch(`${API_BASE}/reviews?place_id=${placeId}`, {
+  return fetchAllPages(`${API_BASE}/reviews?place_id=${placeId}`, {
     headers: { Authorization: `Bearer ${token}` },
-  });
-  if (!res.ok) return [];
-  return res.json();
+  }).catch(() => []);
 }
 
 function renderPlaceBlock(place, reviews) {